@@ -0,0 +1,75 @@
+"""Compares parsing the BOTA announcements page the old way (BeautifulSoup with
+html.parser over the whole document) with parseBOTA, and the cost of an
+unchanged page (hash only). Chrome itself isn't measured: rendering the page
+takes several seconds on top of the parse, which the plain HTTP path skips.
+Run from the repository root: python bench/bench_bota.py [FIXTURE]"""
+
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import data_centralisation as dc  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+# The pre-fast-path parse of the page source returned by Selenium
+def legacy(page):
+    soup = BeautifulSoup(page, "html.parser")
+    forthcoming = soup.find("div", {"class": "view-header"}).find(
+        "h2", string="Forthcoming"
+    )
+    table = forthcoming.find_parent("div").find_next_sibling("div").find("table")
+    headers = [th.text.strip() for th in table.find("thead").find_all("th")]
+    rows = []
+    for row in table.find_all("tr"):
+        cells = [cell.text.strip() for cell in row.find_all("td")]
+        if cells:
+            rows.append(cells)
+    col = {name: headers.index(name) for name in ("Activation", "Activator", "UTC")}
+    return [
+        (row[col["Activator"]], row[col["Activation"]].split(" by")[0], row[col["UTC"]])
+        for row in rows
+    ]
+
+
+def current(page):
+    return [(s.activator, s.ref_name, s.timestamp) for s in dc.parseBOTA(page)]
+
+
+def unchanged(page):
+    return hashlib.sha1(page.encode()).hexdigest()
+
+
+def measure(fn, page, rounds=20):
+    fn(page)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(page)
+    return (time.perf_counter() - start) / rounds
+
+
+if __name__ == "__main__":
+    dc.logger.disabled = True
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        FIXTURES, "bota_announcements.html"
+    )
+    with open(path, encoding="utf-8") as f:
+        page = f.read()
+
+    assert legacy(page) == current(page), "parsers disagree"
+    with open(os.path.join(FIXTURES, "bota_js_shell.html"), encoding="utf-8") as f:
+        assert dc.parseBOTA(f.read()) is None, "JS shell not detected"
+
+    print(f"{os.path.basename(path)}, {len(page) / 1024:.0f} KiB, {len(current(page))} activations:")
+    for name, fn in (
+        ("BeautifulSoup", legacy),
+        ("parseBOTA", current),
+        ("unchanged", unchanged),
+    ):
+        print(f"  {name:<14} {measure(fn, page) * 1000:8.2f} ms/page")
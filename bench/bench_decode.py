@@ -0,0 +1,96 @@
+"""Compares decoding a poll and building its spots the old way (stdlib json,
+like response.json(), then Spot construction from every item) with the
+declared schemas, decoded by msgspec straight into their structs, per 1k
+spots, and how cheaply a malformed payload is rejected.
+Run from the repository root: python bench/bench_decode.py [N_SPOTS]"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import schemas  # noqa: E402
+from spot import Spot  # noqa: E402
+
+GRIDS = ["KN24", "KN25", "KN34", "KN35", "JN58", "JO62", "FN31", "EM12"]
+MODES = ["CW", "SSB", "FT8", "FT4"]
+
+
+def payload(n):
+    rng = random.Random(42)
+    return [
+        {
+            "spotId": i,
+            "spotTime": "2026-01-01T12:00:00",
+            "source": "RBN",
+            "spotter": "YO3ABC",
+            "parkName": "",
+            "invalid": None,
+            "grid6": rng.choice(GRIDS) + "aa",
+            "count": 1,
+            "expire": 600,
+            "activator": f"YO{i % 10}AB{i}",
+            "frequency": str(rng.choice([7032, 14062, 14285, 21074])),
+            "reference": f"RO-{i:04d}",
+            "mode": rng.choice(MODES),
+            "name": "Some Park",
+            "locationDesc": "RO-BV",
+            "comments": "QRV",
+            "grid4": rng.choice(GRIDS),
+            "latitude": 45.6,
+            "longitude": 25.6,
+            "highlightColor": None,
+        }
+        for i in range(n)
+    ]
+
+
+# The pre-schema path: json.loads of the body and a Spot for every item
+def legacy(body):
+    return [
+        Spot(
+            "POTA",
+            item.get("activator"),
+            reference=item.get("reference"),
+            frequency=item.get("frequency"),
+            mode=item.get("mode"),
+            comment=item.get("comments"),
+            ref_name=item.get("name"),
+            region=item.get("locationDesc"),
+            grid=item.get("grid4"),
+            expire=item.get("expire"),
+            timestamp=item.get("spotTime"),
+        )
+        for item in json.loads(body)
+    ]
+
+
+def current(body):
+    return schemas.POTA.spots(schemas.POTA.decode(body))
+
+
+def measure(fn, body, rounds=50):
+    fn(body)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(body)
+    return (time.perf_counter() - start) / rounds
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    body = json.dumps(payload(n)).encode()
+    assert [s.key() for s in legacy(body)] == [s.key() for s in current(body)]
+
+    malformed = json.dumps({"error": "x" * len(body)}).encode()
+    schemas.logger.disabled = True
+    assert current(malformed) is None
+
+    print(f"{n} POTA spots, {len(body) / 1024:.0f} KiB:")
+    for name, fn in (("json + Spot", legacy), ("schema", current)):
+        per_k = measure(fn, body) * 1000 / n * 1000
+        print(f"  {name:<14} {per_k:8.2f} ms per 1k spots")
+    print(f"  {'malformed':<14} {measure(current, malformed) * 1000:8.2f} ms/payload")
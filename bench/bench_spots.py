@@ -0,0 +1,91 @@
+"""Compares the old DataFrame + iterrows path with the Spot list path for one
+POTA poll. Run from the repository root: python bench/bench_spots.py [N_SPOTS]"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+import pandas as pd  # noqa: E402
+
+import data_centralisation as dc  # noqa: E402
+
+GRIDS = ["KN24", "KN25", "KN34", "KN35", "JN58", "JO62", "FN31", "EM12"]
+MODES = ["CW", "SSB", "FT8", "FT4"]
+
+
+def payload(n):
+    rng = random.Random(42)
+    return [
+        {
+            "spotId": i,
+            "spotTime": "2026-01-01T12:00:00",
+            "source": "RBN",
+            "spotter": "YO3ABC",
+            "parkName": "",
+            "invalid": None,
+            "grid6": rng.choice(GRIDS) + "aa",
+            "count": 1,
+            "expire": 600,
+            "activator": f"YO{i % 10}AB{i}",
+            "frequency": str(rng.choice([7032, 14062, 14285, 21074])),
+            "reference": f"RO-{i:04d}",
+            "mode": rng.choice(MODES),
+            "name": "Some Park",
+            "locationDesc": "RO-BV",
+            "comments": "QRV",
+            "grid4": rng.choice(GRIDS),
+        }
+        for i in range(n)
+    ]
+
+
+# The pre-Spot pipeline: DataFrame construction, column drops, prefix filter,
+# drop_duplicates and iterrows over the result
+def legacy(data, filterPOTA):
+    df = pd.DataFrame(data)
+    df.drop(
+        ["spotId", "spotTime", "source", "spotter", "parkName", "invalid", "grid6", "count", "expire"],
+        axis=1,
+        inplace=True,
+    )
+    prefixes = filterPOTA.split()
+    mask = df["grid4"].apply(lambda x: any(x.startswith(grid) for grid in prefixes))
+    df = df[mask].reset_index(drop=True)
+    df.drop_duplicates(inplace=True)
+    for _, row in df.iterrows():
+        (row["activator"], row["frequency"], row["reference"], row["comments"])
+
+
+def current(data, filterPOTA):
+    dc.fetchData = lambda url, decode=None: data
+    _, spots = dc.centralisePOTA(filterPOTA)
+    for spot in spots:
+        (spot.activator, spot.frequency, spot.reference, spot.comment)
+
+
+def measure(fn, data, filterPOTA, rounds=20):
+    fn(data, filterPOTA)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(data, filterPOTA)
+    elapsed = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    fn(data, filterPOTA)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+if __name__ == "__main__":
+    dc.logger.disabled = True
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    data = payload(n)
+    print(f"{n} spots, FILTER_POTA='KN JN JO':")
+    for name, fn in (("DataFrame", legacy), ("Spot", current)):
+        elapsed, peak = measure(fn, data, "KN JN JO")
+        print(f"  {name:<10} {elapsed * 1000:8.2f} ms/poll  {peak / 1024:8.1f} KiB peak")
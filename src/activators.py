@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+
+
+class ActivatorState:
+    """Last announced (reference, kHz, status) per activator, used by the
+    auto-spot change detection.
+
+    Behaves like a dict, but every entry has a deadline and at most
+    `max_size` entries are kept (least recently seen first out). Call
+    `seen(call, ttl)` for every spot of an activator before looking at its
+    state: it drops the entry if it already expired and pushes its deadline
+    `ttl` seconds ahead, so the state lives as long as the upstream keeps
+    spotting the activator.
+    """
+
+    def __init__(self, ttl=3600.0, max_size=5000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.expired = 0
+        self.evicted = 0
+        self._next_ttl = None
+
+    def _drop_expired(self, call, now):
+        entry = self.entries.get(call)
+        if entry is not None and entry[1] <= now:
+            del self.entries[call]
+            self.expired += 1
+
+    def seen(self, call, ttl=None):
+        now = time.monotonic()
+        ttl = self.ttl if ttl is None else ttl
+        self._drop_expired(call, now)
+        if call in self.entries:
+            self.entries[call] = (self.entries[call][0], now + ttl)
+            self.entries.move_to_end(call)
+        self._next_ttl = (call, ttl)
+
+    def __contains__(self, call):
+        self._drop_expired(call, time.monotonic())
+        return call in self.entries
+
+    def __getitem__(self, call):
+        return self.entries[call][0]
+
+    def get(self, call, default=None):
+        return self[call] if call in self else default
+
+    def __setitem__(self, call, value):
+        ttl = self.ttl
+        if self._next_ttl is not None and self._next_ttl[0] == call:
+            ttl = self._next_ttl[1]
+        self.entries[call] = (value, time.monotonic() + ttl)
+        self.entries.move_to_end(call)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evicted += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Drops every expired entry, returns how many were removed
+    def prune(self):
+        now = time.monotonic()
+        stale = [call for call, (_, until) in self.entries.items() if until <= now]
+        for call in stale:
+            del self.entries[call]
+        self.expired += len(stale)
+        return len(stale)
+
+
+# Seconds the state of a POTA spot should outlive it: the upstream `expire`
+# (seconds until the spot is dropped) plus a grace period for polling gaps
+def pota_ttl(spot, grace=300.0, default=1800.0):
+    try:
+        return float(spot.expire) + grace
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,100 @@
+import bisect
+
+import numpy as np
+
+# Amateur band edges in kHz (lower, upper, name). Edges are the widest of the
+# three IARU regions so that spots from anywhere end up in the right band.
+BANDS = [
+    (1800, 2000, "160m"),
+    (3500, 4000, "80m"),
+    (5250, 5450, "60m"),
+    (7000, 7300, "40m"),
+    (10100, 10150, "30m"),
+    (14000, 14350, "20m"),
+    (18068, 18168, "17m"),
+    (21000, 21450, "15m"),
+    (24890, 24990, "12m"),
+    (28000, 29700, "10m"),
+    (50000, 54000, "6m"),
+    (70000, 71000, "4m"),
+    (144000, 148000, "2m"),
+    (420000, 450000, "70cm"),
+]
+
+_LOWER_EDGES = [band[0] for band in BANDS]
+
+BAND_NAMES = [band[2] for band in BANDS]
+_LOWER = np.array(_LOWER_EDGES, dtype=float)
+_UPPER = np.array([band[1] for band in BANDS], dtype=float)
+_NAMES = np.array(BAND_NAMES + [None], dtype=object)
+
+# Mode -> mode family. Modes that are not listed are their own family.
+MODE_FAMILIES = {
+    "CW": "CW",
+    "SSB": "PHONE",
+    "USB": "PHONE",
+    "LSB": "PHONE",
+    "AM": "PHONE",
+    "FM": "PHONE",
+    "PHONE": "PHONE",
+    "DV": "PHONE",
+    "DMR": "PHONE",
+    "DSTAR": "PHONE",
+    "C4FM": "PHONE",
+    "FT8": "DATA",
+    "FT4": "DATA",
+    "JS8": "DATA",
+    "RTTY": "DATA",
+    "PSK": "DATA",
+    "PSK31": "DATA",
+    "OLIVIA": "DATA",
+    "SSTV": "DATA",
+    "JT65": "DATA",
+    "JT9": "DATA",
+    "MSK144": "DATA",
+    "Q65": "DATA",
+    "DATA": "DATA",
+    "DIGI": "DATA",
+}
+MODE_NAMES = set(MODE_FAMILIES) | set(MODE_FAMILIES.values())
+
+
+# Spots come in either kHz (POTA, WWBOTA) or MHz (SOTA, some LLOTA spots).
+# Nothing we care about is above 1000 MHz or below 1000 kHz, so the magnitude
+# tells us the unit.
+def to_khz(freq) -> float | None:
+    try:
+        value = float(freq)
+    except (TypeError, ValueError):
+        return None
+    if value <= 0:
+        return None
+    if value < 1000:
+        value *= 1000
+    return value
+
+
+def band_of(freq) -> str | None:
+    khz = to_khz(freq)
+    if khz is None:
+        return None
+    i = bisect.bisect_right(_LOWER_EDGES, khz) - 1
+    if i >= 0 and khz <= BANDS[i][1]:
+        return BANDS[i][2]
+    return None
+
+
+def mode_family(mode) -> str | None:
+    if not isinstance(mode, str) or not mode.strip():
+        return None
+    mode = mode.strip().upper()
+    return MODE_FAMILIES.get(mode, mode)
+
+
+# Vectorised version of band_of over an array of kHz values
+def classify_bands(khz) -> np.ndarray:
+    khz = np.asarray(khz, dtype=float)
+    idx = np.searchsorted(_LOWER, khz, side="right") - 1
+    safe = np.clip(idx, 0, len(BANDS) - 1)
+    inside = (idx >= 0) & (khz <= _UPPER[safe])
+    return _NAMES[np.where(inside, safe, len(BANDS))]
@@ -0,0 +1,174 @@
+import hashlib
+import html
+import json
+import logging
+import os
+import time
+
+from telegram.error import BadRequest, RetryAfter
+
+from status import QRT
+
+logger = logging.getLogger("BotLogger")
+
+
+class LiveBoard:
+    """Current state of the watched activators of one source, rendered into a
+    single message. Updates only touch the entries; the message is edited
+    by BoardManager when the rendered text actually changes."""
+
+    def __init__(self, source, stale_after=1800.0):
+        self.source = source
+        self.stale_after = stale_after
+        self.entries = {}
+        self.message_id = None
+        self.last_hash = None
+        self.next_edit = 0.0
+
+    def _entry(self, spot, now):
+        state = "QRT" if spot.qcodes & QRT else "QRV"
+        return (spot.reference, spot.frequency, spot.mode, state, now)
+
+    # Replaces the entries of a polled source with the latest watched spots
+    def update(self, spots):
+        now = time.time()
+        self.entries = {spot.activator: self._entry(spot, now) for spot in spots}
+
+    # Adds a single spot coming from a stream
+    def upsert(self, spot):
+        now = time.time()
+        self.entries[spot.activator] = self._entry(spot, now)
+        self.prune(now)
+
+    def prune(self, now):
+        for call in [
+            call
+            for call, entry in self.entries.items()
+            if now - entry[4] > self.stale_after
+        ]:
+            del self.entries[call]
+
+    def body(self):
+        if not self.entries:
+            return "No watched activators on the air."
+        lines = []
+        for call in sorted(self.entries):
+            reference, frequency, mode, state, _ = self.entries[call]
+            icon = "🔴" if state == "QRT" else "🟢"
+            lines.append(
+                f"{icon} <b>{html.escape(call)}</b> - {html.escape(reference)} · "
+                f"{html.escape(frequency)} · {html.escape(mode)} · {state}"
+            )
+        return "\n".join(lines)
+
+
+class BoardManager:
+    """Keeps one pinned message per source in sync with its LiveBoard.
+
+    `flush` is called periodically; each board is edited at most once every
+    `min_interval` seconds and only when the hash of its body changed, so
+    bursts of updates are coalesced into a single edit. Message ids are kept
+    in `state_path` so a restart edits the same messages.
+    """
+
+    def __init__(self, sources, min_interval=30.0, state_path="data/board.json"):
+        self.boards = {source: LiveBoard(source) for source in sources}
+        self.min_interval = min_interval
+        self.state_path = state_path
+        self.edits = 0
+        self.skipped = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_path) as f:
+                ids = json.load(f)
+        except (OSError, ValueError):
+            return
+        for source, message_id in ids.items():
+            if source in self.boards:
+                self.boards[source].message_id = message_id
+
+    def _save(self):
+        ids = {s: b.message_id for s, b in self.boards.items() if b.message_id}
+        try:
+            if os.path.dirname(self.state_path):
+                os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            with open(self.state_path, "w") as f:
+                json.dump(ids, f)
+        except OSError as e:
+            logger.error(f"Could not save live board state: {e}")
+
+    def update(self, source, spots):
+        if source in self.boards:
+            self.boards[source].update(spots)
+
+    def upsert(self, spot):
+        if spot.source in self.boards:
+            self.boards[spot.source].upsert(spot)
+
+    async def flush(self, bot, chat_id, topic_id):
+        now = time.time()
+        for board in self.boards.values():
+            board.prune(now)
+            body = board.body()
+            digest = hashlib.sha1(body.encode()).hexdigest()
+            if digest == board.last_hash:
+                continue
+            if now < board.next_edit:
+                self.skipped += 1
+                continue
+
+            stamp = time.strftime("%H:%M UTC", time.gmtime(now))
+            text = f"<b><u>{board.source} live board</u></b> (updated {stamp})\n\n{body}"
+            try:
+                if board.message_id is None:
+                    message = await bot.send_message(
+                        chat_id=chat_id,
+                        message_thread_id=topic_id,
+                        text=text,
+                        parse_mode="HTML",
+                    )
+                    board.message_id = message.message_id
+                    self._save()
+                    try:
+                        await bot.pin_chat_message(
+                            chat_id=chat_id,
+                            message_id=board.message_id,
+                            disable_notification=True,
+                        )
+                    except Exception as e:
+                        logger.warning(f"Could not pin {board.source} board: {e}")
+                else:
+                    await bot.edit_message_text(
+                        text,
+                        chat_id=chat_id,
+                        message_id=board.message_id,
+                        parse_mode="HTML",
+                    )
+                board.last_hash = digest
+                board.next_edit = now + self.min_interval
+                self.edits += 1
+            except RetryAfter as e:
+                seconds = (
+                    e.retry_after
+                    if isinstance(e.retry_after, (int, float))
+                    else e.retry_after.total_seconds()
+                )
+                board.next_edit = now + seconds
+                logger.warning(f"Board edits rate limited for {seconds} seconds.")
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    board.last_hash = digest
+                elif "not found" in str(e).lower():
+                    # The message was deleted, post a new one next time
+                    board.message_id = None
+                    self._save()
+                else:
+                    logger.error(f"Failed to update {board.source} board: {e}")
+            except Exception as e:
+                logger.error(f"Failed to update {board.source} board: {e}")
+
+
+def enabled() -> bool:
+    return os.getenv("LIVE_BOARD", "").lower() in ("1", "true", "yes", "on")
@@ -1,6 +1,10 @@
 import asyncio
+import hashlib
+import html
 import json
+import math
 import os
+import time
 from time import sleep
 
 import aiohttp
@@ -9,14 +13,36 @@ import requests
 import telegram
 import telegram.ext
 from aiohttp_sse_client import client as sse_client
-from httpx import ConnectError, ConnectTimeout
-from telegram.error import NetworkError, RetryAfter, TimedOut
+from telegram.error import BadRequest, NetworkError, RetryAfter
 
+import board
+import callbook as cb
 import data_centralisation as dc
+import digest as digestlib
+import maidenhead as mh
+import refs
+import schemas
+import spot as spotlib
+import status
+from activators import ActivatorState, pota_ttl
+from bands import BAND_NAMES, MODE_NAMES
+from capture import recorder
+from config import ConfigStore
 from logging_config import setup_logger
+from merge import SpotMerger, base_call
+from outbox import Journal, Outbox
+from pagination import PageStore
+from perf import perf, sampler
+from snapshots import SnapshotStore
+from spot import filter_band_mode
+from stats import SpotStats
+from supervisor import Supervisor, serve_health
+from throttle import CommandThrottle, Throttled
+from transport import transport
+from workers import pool as workers
 
 # Wait for OS to connect to internet
-sleep(30)
+sleep(float(os.getenv("STARTUP_DELAY", "30")))
 
 logger = setup_logger()
 
@@ -46,35 +72,27 @@ if not USER_ID_LIST:
     logger.warning("USER_ID_LIST not provided. Private chats may fail.")
     USER_ID_LIST = ""
 
+QTH = os.getenv("QTH")
+if QTH and not mh.is_grid(QTH):
+    logger.warning(f"QTH '{QTH}' is not a valid grid locator, ignoring it.")
+    QTH = None
+
+config_store = ConfigStore(os.getenv("CONFIG_FILE", ".env"))
+
 logger.info("Environmental variables loaded successfully.")
 
 # path_to_dir = os.path.dirname(os.path.abspath(__file__))
 
 # Load callbook
 logger.info("Loading callbook...")
-path_to_callbook = os.path.join(
-    os.path.dirname(os.path.abspath(__file__)), "../res/callbook.csv"
-)
-path_to_callbook = os.path.normpath(path_to_callbook)
-try:
-    callbook = pd.read_csv(path_to_callbook)
-except FileNotFoundError:
-    logger.error("Could not find the file 'callbook.csv'")
-except pd.errors.EmptyDataError:
-    logger.error("The file is empty.")
-except pd.errors.ParserError:
-    logger.error("Error: There was an issue parsing the CSV file.")
-except UnicodeDecodeError:
-    logger.error(
-        "Error: Could not decode the file. Try specifying a different encoding."
-    )
-except Exception as e:
-    logger.error(f"An unexpected error occurred: {e}")
-else:
-    logger.info("Callbook successfully loaded.")
-    callbook.drop(
-        columns=["SUFIXUL", "E-MAIL", "DATA LIMITA A REZERVARII"], inplace=True
-    )
+callbook_store = cb.CallbookStore(os.getenv("CALLBOOK_SOURCE") or cb.DEFAULT_SOURCE)
+callbook_store.load_initial()
+CALLBOOK_REFRESH = float(os.getenv("CALLBOOK_REFRESH", "86400"))
+
+# Reference database
+refdb = refs.ReferenceStore(os.getenv("REF_DB", "data/refs.db"))
+logger.info(f"Reference database opened ({len(refdb)} references).")
+REF_REFRESH = float(os.getenv("REF_REFRESH", "604800"))
 
 # Load POTA database
 logger.info("Loading POTA database...")
@@ -119,43 +137,6 @@ def getTime(ts):
     return (str(ts), "??")
 
 
-async def send_message_with_retry(
-    app, chat_id, message_thread_id, text, parse_mode="HTML", max_retries=5
-):
-    for attempt in range(max_retries):
-        try:
-            await app.bot.send_message(
-                chat_id=chat_id,
-                message_thread_id=message_thread_id,
-                text=text,
-                parse_mode=parse_mode,
-            )
-            logger.info(
-                f"Message sent successfully to chat_id={chat_id} on attempt {attempt + 1}."
-            )
-            return
-        except (ConnectTimeout, ConnectError, NetworkError, TimedOut) as e:
-            logger.warning(
-                f"Network error on attempt {attempt + 1}/{max_retries}: {e}. Retrying..."
-            )
-            await asyncio.sleep(2**attempt)
-        except RetryAfter as e:
-            seconds = (
-                e.retry_after
-                if isinstance(e.retry_after, (int, float))
-                else e.retry_after.total_seconds()
-            )
-            retry_after = int(seconds)
-            logger.warning(f"Rate limited. Retrying after {retry_after} seconds.")
-            await asyncio.sleep(retry_after)
-        except Exception as e:
-            logger.error(
-                f"Unexpected error on attempt {attempt + 1}/{max_retries}: {e}. Retrying..."
-            )
-            await asyncio.sleep(2**attempt)
-    logger.error(f"Failed to send message after {max_retries} attempts. Giving up.")
-
-
 def most_recent(count=30):
     r = requests.get("https://api.pota.app/program/parks/RO")
     data = r.json()
@@ -176,6 +157,163 @@ def most_recent(count=30):
     return message
 
 
+def format_callbook(row, callsign):
+    name = row["TITULARUL"]
+    cls = row["CLASA"]
+    loc = row["LOCALITATEA"]
+    exp = row["DATA EXPIRARII"]
+    url = "https://www.ancom.ro/radioamatori_2899"
+
+    return (
+        f"Showing information about operator: <b>{name} - [ {callsign} ]</b>\n"
+        f"Class: <b>{cls}</b>\n"
+        f"Location: <b>{loc}</b>\n"
+        f"Expiration date: <b>{exp}</b>\n"
+        f"Source: <a href='{url}'><b>ANCOM</b></a>"
+    )
+
+
+# Parses "[GRID] [RADIUS[km]]" (the arguments after "near"), grid defaults to QTH
+def parse_near(args):
+    grid = QTH
+    radius = None
+    for arg in args:
+        value = arg.lower().removesuffix("km")
+        if not value:
+            continue
+        if mh.is_grid(arg):
+            grid = arg.upper()
+        elif value.replace(".", "", 1).isdigit():
+            radius = float(value)
+        else:
+            return None
+    if not grid:
+        return None
+    return (grid, radius)
+
+
+# Splits band ("20m") and mode ("CW", "FT8", "PHONE") arguments from the others
+def split_band_mode_args(args):
+    bands, modes, rest = set(), set(), []
+    for arg in args:
+        if arg.lower() in BAND_NAMES:
+            bands.add(arg.lower())
+        elif arg.upper() in MODE_NAMES:
+            modes.add(arg.upper())
+        else:
+            rest.append(arg)
+    return bands, modes, rest
+
+
+# Pagination
+
+page_store = PageStore(ttl=float(os.getenv("PAGE_TTL", "1800")))
+
+
+def page_keyboard(token, page, n_pages):
+    if n_pages <= 1:
+        return None
+    buttons = []
+    if page > 0:
+        buttons.append(
+            telegram.InlineKeyboardButton("« Prev", callback_data=f"pg:{token}:{page - 1}")
+        )
+    buttons.append(
+        telegram.InlineKeyboardButton(f"{page + 1}/{n_pages}", callback_data="pg:noop")
+    )
+    if page < n_pages - 1:
+        buttons.append(
+            telegram.InlineKeyboardButton("Next »", callback_data=f"pg:{token}:{page + 1}")
+        )
+    return telegram.InlineKeyboardMarkup([buttons])
+
+
+# Replies with the first page of the spots; the rest is served by page_callback
+async def send_paginated(update, spots, title):
+    token = page_store.create(spots, format_spot, per_page=5, title=title)
+    session = page_store.get(token)
+    try:
+        await update.message.reply_text(
+            session.page(0),
+            parse_mode="HTML",
+            reply_markup=page_keyboard(token, 0, session.n_pages),
+            disable_web_page_preview=True,
+        )
+    except Exception as e:
+        logger.info(f"Failed to send message: {e}")
+
+
+async def page_callback(
+    update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE
+):
+    query = update.callback_query
+    if not query or not query.data:
+        return
+
+    _, _, rest = query.data.partition(":")
+    token, _, page = rest.partition(":")
+    session = page_store.get(token)
+    if session is None or not page.isdigit():
+        try:
+            await query.answer(
+                "This list has expired, run the command again."
+                if page
+                else None
+            )
+        except Exception as e:
+            logger.info(f"Failed to answer callback query: {e}")
+        return
+
+    page = min(int(page), session.n_pages - 1)
+    try:
+        await query.answer()
+        await query.edit_message_text(
+            session.page(page),
+            parse_mode="HTML",
+            reply_markup=page_keyboard(token, page, session.n_pages),
+            disable_web_page_preview=True,
+        )
+    except Exception as e:
+        logger.info(f"Failed to edit message: {e}")
+
+
+# Throttling
+
+throttle = CommandThrottle(
+    limits={
+        "get_BOTA": (2, 300.0),
+        "get_POTA": (4, 60.0),
+        "get_SOTA": (4, 60.0),
+        "get_WWBOTA": (4, 60.0),
+        "get_LLOTA": (4, 60.0),
+    },
+    default=(10, 60.0),
+    expensive=("get_BOTA",),
+    concurrency=int(os.getenv("EXPENSIVE_CONCURRENCY", "1")),
+)
+
+
+# Wraps a command handler with the per-user limits of the command
+def throttled(command, handler):
+    async def wrapper(
+        update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE
+    ):
+        user = update.effective_user.id if update.effective_user else None
+        try:
+            with perf.span("cmd " + command):
+                await throttle.run(user, command, lambda: handler(update, context))
+        except Throttled as err:
+            logger.info(f"Throttled /{command} for user {user}, {err}.")
+            try:
+                await update.effective_message.reply_text(
+                    f"You're sending commands too fast, {err}."
+                )
+            except Exception as e:
+                logger.info(f"Failed to send message: {e}")
+
+    return wrapper
+
+
 # Commands
 
 
@@ -192,11 +330,16 @@ async def help_command(
                 "-- /help - Provides a list of usable commands\n"
                 "-- /get_bota [FILTER] - Provides a list of the future BOTA activations\n"
                 "-- /get_llota [FILTER] - Provides a list of the future LLOTA activations\n"
-                "-- /get_pota [FILTER] - Provides a list of the most recent spotted POTA activators\n"
-                "-- /get_sota [FILTER] - Provides a list of the most recent spotted SOTA activators\n"
+                "-- /get_pota [FILTER] [BAND] [MODE] - Provides a list of the most recent spotted POTA activators\n"
+                "-- /get_pota near [GRID] [RADIUS km] - Provides POTA activators sorted by distance, optionally within a radius\n"
+                "-- /get_sota [FILTER] [BAND] [MODE] - Provides a list of the most recent spotted SOTA activators\n"
                 "-- /get_wwbota - Provides a list of the most recent spotted WWBOTA activators\n"
                 "-- /callsign [CALLSIGN] - Provides information about the specified operator. Only works for Romanian operators!\n"
-                "-- /latest - Provides the latest 30 parks added\n\n"
+                "-- /search [TEXT] - Searches the callbook by callsign, name or town, tolerating typos\n"
+                "-- /ref [REFERENCE|TEXT] - Looks up a park, summit, bunker or lake by code, name or region\n"
+                "-- /latest - Provides the latest 30 parks added\n"
+                "-- /stats [activators|refs|bands|modes] [1h|24h|7d|now] - Provides spotting statistics, /stats limits shows command usage\n\n"
+                "<b>/get_pota and /get_sota can also be narrowed down by band (e.g. 20m) and mode or mode family (e.g. CW, FT8, PHONE, DATA).</b>\n"
                 "<b>/get_pota and /get_sota can be used with filters. If no filter is provided, it will default to Europe activators. Filters can be typed in lowercase or uppercase.</b>\n"
                 "<b>Available filters:</b>\n"
                 "-- EU - Europe\n"
@@ -238,7 +381,7 @@ async def get_BOTA_command(
         update.message.message_thread_id == TOPIC_ID
         or str(update.message.from_user.id) in USER_ID_LIST
     ):
-        ok, df = dc.centraliseBOTA(
+        ok, spots = await dc.fetchBOTA(
             "https://www.beachesontheair.com/activations/announcements"
         )
 
@@ -249,29 +392,13 @@ async def get_BOTA_command(
                 logger.info("Failed to send message: " + e)
             return
 
-        if df.empty:
+        if not spots:
             try:
                 await update.message.reply_text("No activators found.")
             except Exception as e:
                 logger.info("Failed to send message: " + e)
         else:
-            for index, row in df.iterrows():
-                logger.info("Sending message...")
-                activator = row["Activator"]
-                location = row["Activation"].split(" by")[0]
-                date = row["UTC"]
-
-                urlActivator = "https://www.qrz.com/db/" + activator
-
-                try:
-                    await update.message.reply_text(
-                        f"<a href='{urlActivator}'><b>[ {activator} ]</b></a> will be activating beach <b>[ {location} ]</b>\n\n"
-                        f"Date and time: <b>{date}</b>\n",
-                        parse_mode="HTML",
-                    )
-                except Exception as e:
-                    logger.info("Failed to send message: " + e)
-                sleep(0.5)
+            await send_paginated(update, spots, "Forthcoming BOTA activations")
 
     logger.info("All messages have been sent.")
 
@@ -293,19 +420,32 @@ async def get_POTA_command(
         update.message.message_thread_id == TOPIC_ID
         or str(update.message.from_user.id) in USER_ID_LIST
     ):
-        if context.args:
-            filterPOTA = os.getenv(context.args[0].upper() + "_POTA")
+        sel_bands, sel_modes, args = split_band_mode_args(context.args or [])
+        if args and args[0].lower() == "near":
+            near = parse_near(args[1:])
+            if not near:
+                try:
+                    await update.message.reply_text(
+                        "Usage: /get_pota near [GRID] [RADIUS km]. "
+                        "GRID can be left out if a QTH is configured."
+                    )
+                except Exception as e:
+                    logger.info(f"Failed to send message: {e}")
+                return
+            ok, spots = dc.centralisePOTA(None, near)
+        elif args:
+            filterPOTA = config_store.current.pota_filters.get(args[0].upper())
             if not filterPOTA:
                 try:
                     await update.message.reply_text(
-                        f"Argument {context.args[0]} not recognised."
+                        f"Argument {args[0]} not recognised."
                     )
                 except Exception as e:
                     logger.info("Failed to send message: " + e)
                 return
-            ok, df = dc.centralisePOTA(filterPOTA)
+            ok, spots = dc.centralisePOTA(filterPOTA)
         else:
-            ok, df = dc.centralisePOTA()
+            ok, spots = dc.centralisePOTA(config_store.current.default_pota)
 
         if ok == 0:
             try:
@@ -314,34 +454,15 @@ async def get_POTA_command(
                 logger.info("Failed to send message: " + e)
             return
 
-        if df.empty:
+        spots = filter_band_mode(spots, sel_bands, sel_modes)
+
+        if not spots:
             try:
                 await update.message.reply_text("No activators found.")
             except Exception as e:
                 logger.info("Failed to send message: " + e)
         else:
-            for index, row in df.iterrows():
-                logger.info("Sending message...")
-                activator = row["activator"]
-                frequency = row["frequency"]
-                reference = row["reference"]
-                mode = row["mode"]
-                name = row["name"]
-                locationDesc = row["locationDesc"]
-                comment = row["comments"]
-
-                urlPark = "https://pota.app/#/park/" + reference
-                urlActivator = "https://www.qrz.com/db/" + activator
-
-                await update.message.reply_text(
-                    f"<a href='{urlActivator}'><b>[ {activator} ]</b></a> is now activating park <a href='{urlPark}'><b>[ {reference} ]</b></a> - <i>{name}</i>\n\n"
-                    f"Frequency: <b>{frequency}</b>\n"
-                    f"Mode: <b>{mode}</b>\n"
-                    f"Region: <b>{locationDesc}</b>\n"
-                    f"Info: <b>{comment}</b>",
-                    parse_mode="HTML",
-                )
-                sleep(0.5)
+            await send_paginated(update, spots, "Latest POTA spots")
 
     logger.info("All messages have been sent.")
 
@@ -363,19 +484,20 @@ async def get_SOTA_command(
         update.message.message_thread_id == TOPIC_ID
         or str(update.message.from_user.id) in USER_ID_LIST
     ):
-        if context.args:
-            filterSOTA = os.getenv(context.args[0].upper() + "_SOTA")
+        sel_bands, sel_modes, args = split_band_mode_args(context.args or [])
+        if args:
+            filterSOTA = config_store.current.sota_filters.get(args[0].upper())
             if not filterSOTA:
                 try:
                     await update.message.reply_text(
-                        f"Argument {context.args[0]} not recognised."
+                        f"Argument {args[0]} not recognised."
                     )
                 except Exception as e:
                     logger.info("Failed to send message: " + e)
                 return
-            ok, df = dc.centraliseSOTA(filterSOTA)
+            ok, spots = dc.centraliseSOTA(filterSOTA)
         else:
-            ok, df = dc.centraliseSOTA()
+            ok, spots = dc.centraliseSOTA(config_store.current.default_sota)
 
         if ok == 0:
             try:
@@ -384,36 +506,15 @@ async def get_SOTA_command(
                 logger.info("Failed to send message: " + e)
             return
 
-        if df.empty:
+        spots = filter_band_mode(spots, sel_bands, sel_modes)
+
+        if not spots:
             try:
                 await update.message.reply_text("No activators found.")
             except Exception as e:
                 logger.info("Failed to send message: " + e)
         else:
-            for index, row in df.iterrows():
-                logger.info("Sending message...")
-                timestamp = getTime(row["timeStamp"])
-                activator = row["activatorCallsign"]
-                actName = row["activatorName"]
-                comment = row["comments"]
-                summitCode = row["summitCode"]
-                summitDetails = row["summitDetails"]
-                frequency = row["frequency"]
-                mode = row["mode"]
-                urlActivator = "https://www.qrz.com/db/" + row["activatorCallsign"]
-
-                try:
-                    await update.message.reply_text(
-                        f"<a href='{urlActivator}'><b>[ {activator} ]</b></a> - <i>{actName}</i> is now activating summit <b>[ {summitCode} ]</b> - <i>{summitDetails}</i>\n\n"
-                        f"Posted at: <b>{timestamp[0]} - {timestamp[1]}</b>\n"
-                        f"Frequency: <b>{frequency}</b>\n"
-                        f"Mode: <b>{mode}</b>\n"
-                        f"Activator's comment: <b>{comment}</b>",
-                        parse_mode="HTML",
-                    )
-                except Exception as e:
-                    logger.info("Failed to send message: " + e)
-                sleep(0.5)
+            await send_paginated(update, spots, "Latest SOTA spots")
 
         logger.info("All messages have been sent.")
 
@@ -435,7 +536,7 @@ async def get_WWBOTA_command(
         update.message.message_thread_id == TOPIC_ID
         or str(update.message.from_user.id) in USER_ID_LIST
     ):
-        ok, df = dc.centraliseWWBOTA()
+        ok, spots = dc.centraliseWWBOTA()
 
         if ok == 0:
             try:
@@ -444,34 +545,13 @@ async def get_WWBOTA_command(
                 logger.info("Failed to send message: " + e)
             return
 
-        if df.empty:
+        if not spots:
             try:
                 await update.message.reply_text("No activators found.")
             except Exception as e:
                 logger.info("Failed to send message: " + e)
         else:
-            for index, row in df.iterrows():
-                logger.info("Sending message...")
-                timestamp = getTime(row["time"])
-                activator = row["call"]
-                comment = row["comment"]
-                ref = row["reference"]
-                frequency = row["freq"]
-                mode = row["mode"]
-                urlActivator = "https://www.qrz.com/db/" + row["call"]
-
-                try:
-                    await update.message.reply_text(
-                        f"<a href='{urlActivator}'><b>[ {activator} ]</b></a> is now activating bunker <b>[ {ref} ]</b>\n\n"
-                        f"Posted at: <b>{timestamp[0]} - {timestamp[1]}</b>\n"
-                        f"Frequency: <b>{frequency}</b>\n"
-                        f"Mode: <b>{mode}</b>\n"
-                        f"Activator's comment: <b>{comment}</b>",
-                        parse_mode="HTML",
-                    )
-                except Exception as e:
-                    logger.info("Failed to send message: " + e)
-                sleep(0.5)
+            await send_paginated(update, spots, "Latest WWBOTA spots")
 
         logger.info("All messages have been sent.")
 
@@ -496,7 +576,7 @@ async def get_LLOTA_command(
         or str(update.message.from_user.id) in USER_ID_LIST
     ):
         url = "https://llota.app/api/spots"
-        ok, df = dc.centraliseLLOTA(url)
+        ok, spots = dc.centraliseLLOTA(url)
 
         if ok == 0:
             try:
@@ -506,17 +586,17 @@ async def get_LLOTA_command(
             return
 
         # 3. Apply Filter if arguments exist
-        if context.args and not df.empty:
+        if context.args and spots:
             search_term = context.args[0].upper()
             # Filter by Callsign OR Country (e.g. "RO" matches YO calls or Romania)
-            mask = df.apply(
-                lambda x: search_term in str(x["callsign"]).upper()
-                or search_term in str(x["country_name"]).upper(),
-                axis=1,
-            )
-            df = df[mask].reset_index(drop=True)
-
-        if df.empty:
+            spots = [
+                spot
+                for spot in spots
+                if search_term in spot.activator.upper()
+                or search_term in spot.region.upper()
+            ]
+
+        if not spots:
             try:
                 msg = (
                     f"No activators found matching '{context.args[0]}'."
@@ -527,40 +607,7 @@ async def get_LLOTA_command(
             except Exception as e:
                 logger.info(f"Failed to send message: {e}")
         else:
-            for index, row in df.iterrows():
-                logger.info("Sending message...")
-
-                raw_ts = str(row["timestamp"])
-                if " " in raw_ts and "T" not in raw_ts:
-                    raw_ts = raw_ts.replace(" ", "T")
-
-                timestamp = (
-                    getTime(raw_ts) if raw_ts and raw_ts != "None" else ("??", "??")
-                )
-
-                activator = row["callsign"]
-                frequency = row["frequency"]
-                mode = row["mode"]
-                reference = row["reference"]
-                refName = row["reference_name"]
-                country = row["country_name"]
-                comment = row["comment"]
-
-                urlActivator = "https://www.qrz.com/db/" + activator
-
-                try:
-                    await update.message.reply_text(
-                        f"<a href='{urlActivator}'><b>[ {activator} ]</b></a> is now activating "
-                        f"<b>[ {reference} ]</b> - <i>{refName}</i> ({country})\n\n"
-                        f"Posted at: <b>{timestamp[0]} - {timestamp[1]}</b>\n"
-                        f"Frequency: <b>{frequency}</b>\n"
-                        f"Mode: <b>{mode}</b>\n"
-                        f"Info: <b>{comment}</b>",
-                        parse_mode="HTML",
-                    )
-                except Exception as e:
-                    logger.info(f"Failed to send message: {e}")
-                sleep(0.5)
+            await send_paginated(update, spots, "Latest LLOTA spots")
 
     logger.info("All messages have been sent.")
 
@@ -568,7 +615,7 @@ async def get_LLOTA_command(
 async def callsign_info_command(
     update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE
 ):
-    global callbook
+    callbook = callbook_store.current
     if callbook is None:
         try:
             await update.message.reply_text("Callbook could not be loaded.")
@@ -603,35 +650,161 @@ async def callsign_info_command(
                 logger.info("Failed to send message: " + e)
         else:
             callsign = context.args[0].strip().upper()
-            index = callbook[
-                callbook["INDICATIVUL"].str.strip().str.upper() == callsign
-            ].index
-            if len(index) == 0:
+            row = callbook.lookup(callsign)
+            if row is None:
                 try:
                     await update.message.reply_text("Callsign not found.")
                 except Exception as e:
                     logger.info("Failed to send message: " + e)
             else:
-                row = callbook.loc[index[0]]
-                name = row["TITULARUL"]
-                cls = row["CLASA"]
-                loc = row["LOCALITATEA"]
-                exp = row["DATA EXPIRARII"]
-                url = "https://www.ancom.ro/radioamatori_2899"
-
                 try:
                     await update.message.reply_text(
-                        f"Showing information about operator: <b>{name} - [ {callsign} ]</b>\n"
-                        f"Class: <b>{cls}</b>\n"
-                        f"Location: <b>{loc}</b>\n"
-                        f"Expiration date: <b>{exp}</b>\n"
-                        f"Source: <a href='{url}'><b>ANCOM</b></a>",
+                        format_callbook(row, callsign),
                         parse_mode="HTML",
                     )
                 except Exception as e:
                     logger.info("Failed to send message: " + e)
 
 
+async def search_command(
+    update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE
+):
+    callbook = callbook_store.current
+    if callbook is None:
+        try:
+            await update.message.reply_text("Callbook could not be loaded.")
+        except Exception as e:
+            logger.info(f"Failed to send message: {e}")
+        return
+    if (
+        update.effective_chat.type == "private"
+        and str(update.message.from_user.id) not in USER_ID_LIST
+    ):
+        try:
+            await update.message.reply_text("Bot does not work in private chat.")
+        except Exception as e:
+            logger.info(f"Failed to send message: {e}")
+        return
+
+    if (
+        update.message.message_thread_id == TOPIC_ID
+        or str(update.message.from_user.id) in USER_ID_LIST
+    ):
+        if not context.args:
+            try:
+                await update.message.reply_text(
+                    "Please provide a callsign, name or town to search for."
+                )
+            except Exception as e:
+                logger.info(f"Failed to send message: {e}")
+            return
+
+        query = " ".join(context.args)
+        results = callbook.search(query, n=10)
+        if not results:
+            try:
+                await update.message.reply_text("No matches found.")
+            except Exception as e:
+                logger.info(f"Failed to send message: {e}")
+            return
+
+        message = f"<b><u>Callbook matches for '{html.escape(query)}':</u></b>\n\n"
+        for row, _ in results:
+            message += (
+                f"<b>[ {row['INDICATIVUL']} ]</b> - {row['TITULARUL']}\n"
+                f"   📍 {row['LOCALITATEA']} | Class: {row['CLASA']}\n"
+            )
+        try:
+            await update.message.reply_text(message, parse_mode="HTML")
+        except Exception as e:
+            logger.info(f"Failed to send message: {e}")
+
+
+def format_reference_info(ref):
+    header = f"<b>[ {ref.reference} ]</b> {ref.program}"
+    if ref.program in REFERENCE_URLS:
+        header = (
+            f"<a href='{REFERENCE_URLS[ref.program] + ref.reference}'>"
+            f"<b>[ {ref.reference} ]</b></a> {ref.program}"
+        )
+    if ref.name:
+        header += f" - <i>{html.escape(ref.name)}</i>"
+    details = [html.escape(ref.region), ref.grid]
+    if ref.lat is not None and ref.lon is not None:
+        details.append(f"{ref.lat:.4f}, {ref.lon:.4f}")
+    details = " | ".join(detail for detail in details if detail)
+    return header + (f"\n   📍 {details}" if details else "")
+
+
+# Spots of a reference in the current snapshots, without asking the upstream
+def spots_on_reference(reference):
+    return [
+        spot
+        for source in ("POTA", "SOTA", "WWBOTA", "LLOTA")
+        for spot in snapshot_store.spots(source)
+        if spot.reference == reference
+    ]
+
+
+async def ref_command(
+    update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE
+):
+    if (
+        update.effective_chat.type == "private"
+        and str(update.message.from_user.id) not in USER_ID_LIST
+    ):
+        try:
+            await update.message.reply_text("Bot does not work in private chat.")
+        except Exception as e:
+            logger.info(f"Failed to send message: {e}")
+        return
+
+    if (
+        update.message.message_thread_id == TOPIC_ID
+        or str(update.message.from_user.id) in USER_ID_LIST
+    ):
+        if not context.args:
+            try:
+                await update.message.reply_text(
+                    "Please provide a reference, or a name or region to search for."
+                )
+            except Exception as e:
+                logger.info(f"Failed to send message: {e}")
+            return
+
+        query = " ".join(context.args)
+        with perf.span("ref lookup"):
+            results = refdb.lookup(query) if len(context.args) == 1 else []
+            exact = bool(results)
+            if not exact:
+                results = refdb.search(query, n=10)
+        if not results:
+            try:
+                await update.message.reply_text("No matching reference found.")
+            except Exception as e:
+                logger.info(f"Failed to send message: {e}")
+            return
+
+        if exact:
+            message = ""
+            for ref in results:
+                message += format_reference_info(ref) + "\n"
+                for spot in spots_on_reference(ref.reference):
+                    message += (
+                        f"   📡 On air: <b>{spot.activator}</b> {spot.frequency} "
+                        f"{spot.mode}\n"
+                    )
+        else:
+            message = f"<b><u>References matching '{html.escape(query)}':</u></b>\n\n"
+            message += "\n".join(format_reference_info(ref) for ref in results)
+        try:
+            await update.message.reply_text(
+                message, parse_mode="HTML", disable_web_page_preview=True
+            )
+        except Exception as e:
+            logger.info(f"Failed to send message: {e}")
+
+
 async def potadate_command(
     update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE
 ):
@@ -659,27 +832,220 @@ async def potadate_command(
             )
 
 
+async def stats_command(
+    update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE
+):
+    if (
+        update.effective_chat.type == "private"
+        and str(update.message.from_user.id) not in USER_ID_LIST
+    ):
+        try:
+            await update.message.reply_text("Bot does not work in private chat.")
+        except Exception as e:
+            logger.info(f"Failed to send message: {e}")
+        return
+
+    if (
+        update.message.message_thread_id == TOPIC_ID
+        or str(update.message.from_user.id) in USER_ID_LIST
+    ):
+        args = [arg.lower() for arg in context.args] if context.args else []
+        dims = {
+            "activators": ("activators", "Top activators"),
+            "refs": ("references", "Busiest references"),
+            "references": ("references", "Busiest references"),
+            "bands": ("bands", "Band distribution"),
+            "modes": ("modes", "Mode distribution"),
+        }
+
+        if args == ["limits"]:
+            metrics = throttle.metrics()
+            message = (
+                "<b><u>Command limits:</u></b>\n"
+                f"Running: <b>{metrics['running']}</b>, queued: <b>{metrics['queued']}</b>, "
+                f"longest wait: <b>{metrics['max_wait']} s</b>\n"
+                f"Active users: <b>{metrics['users']}</b>\n\n"
+            )
+            for command in sorted(set(metrics["allowed"]) | set(metrics["rejected"])):
+                message += (
+                    f"/{command} - {metrics['allowed'].get(command, 0)} allowed, "
+                    f"{metrics['rejected'].get(command, 0)} rejected\n"
+                )
+            try:
+                await update.message.reply_text(message, parse_mode="HTML")
+            except Exception as e:
+                logger.info(f"Failed to send message: {e}")
+            return
+
+        if not args:
+            # Overview
+            sections = [
+                ("activators", "24h", "Top activators"),
+                ("references", "24h", "Busiest references"),
+                ("bands", "now", "Band distribution"),
+                ("modes", "now", "Mode distribution"),
+            ]
+            limit = 5
+        elif args[0] in dims and len(args) <= 2:
+            dim, title = dims[args[0]]
+            window = args[1] if len(args) > 1 else "24h"
+            sections = [(dim, window, title)]
+            limit = 10
+        else:
+            try:
+                await update.message.reply_text(
+                    "Usage: /stats [activators|refs|bands|modes] [1h|24h|7d|now] or /stats limits"
+                )
+            except Exception as e:
+                logger.info(f"Failed to send message: {e}")
+            return
+
+        message = ""
+        for dim, window, title in sections:
+            try:
+                top = spot_stats.top(dim, window, limit)
+            except ValueError as err:
+                try:
+                    await update.message.reply_text(str(err))
+                except Exception as e:
+                    logger.info(f"Failed to send message: {e}")
+                return
+            message += f"<b><u>{title} ({window}):</u></b>\n"
+            if not top:
+                message += "   No data yet.\n"
+            for i, (key, count) in enumerate(top, start=1):
+                message += f"{i}. <b>{key}</b> - {count}\n"
+            message += "\n"
+
+        try:
+            await update.message.reply_text(message, parse_mode="HTML")
+        except Exception as e:
+            logger.info(f"Failed to send message: {e}")
+
+
+async def debug_command(
+    update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE
+):
+    if str(update.message.from_user.id) not in USER_ID_LIST:
+        return
+
+    args = [arg.lower() for arg in context.args] if context.args else []
+
+    if args == ["perf"]:
+        if not perf.enabled:
+            message = "Timing is disabled, start the bot with PERF=1."
+        else:
+            uptime = (time.time() - perf.started) / 3600
+            message = f"<b><u>Timings since startup ({uptime:.1f} h), ms:</u></b>\n<pre>"
+            message += f"{'stage':<24}{'calls':>7}{'p50':>8}{'p95':>8}{'p99':>8}\n"
+            for name, calls, p50, p95, p99 in perf.summary():
+                message += f"{name[:24]:<24}{calls:>7}{p50:>8.1f}{p95:>8.1f}{p99:>8.1f}\n"
+            message += "</pre>"
+        message += (
+            f"\nOutbox: <b>{outbox.sent}</b> sent, <b>{outbox.dead}</b> dead, "
+            f"<b>{outbox.duplicates}</b> duplicates, "
+            f"<b>{sum(len(lane) for lane in outbox.lanes.values())}</b> queued\n"
+            f"Event loop lag: <b>{supervisor.loop_lag * 1000:.0f}</b> ms "
+            f"(max <b>{supervisor.max_lag * 1000:.0f}</b> ms, "
+            f"<b>{supervisor.stalls}</b> stalls), task restarts: "
+            + (
+                ", ".join(
+                    f"{info.name} <b>{info.restarts}</b>"
+                    for info in supervisor.tasks.values()
+                )
+                or "none"
+            )
+            + "\nWorkers: "
+            + ", ".join(
+                f"{name} <b>{value}</b>" for name, value in workers.stats().items()
+            )
+            + "".join(
+                f"\n{host} ({stats['http_version']}): <b>{stats['requests']}</b> "
+                f"polls, <b>{stats['not_modified']}</b> not modified, "
+                f"<b>{stats['wire_bytes'] / 1e6:.1f}</b> MB transferred "
+                f"({stats['body_bytes'] / 1e6:.1f} MB decoded), "
+                f"<b>{stats['saved_bytes'] / 1e6:.1f}</b> MB and "
+                f"<b>{stats['saved_ms'] / 1000:.0f}</b> s saved"
+                for host, stats in transport.stats().items()
+            )
+            + "\nActivator state: "
+            + ", ".join(
+                f"{name} <b>{len(state)}</b> ({state.expired} expired, "
+                f"{state.evicted} evicted)"
+                for name, state in (
+                    ("POTA", act_pota),
+                    ("SOTA", act_sota),
+                    ("WWBOTA", act_wwbota),
+                    ("LLOTA", act_llota),
+                )
+            )
+        )
+    elif args == ["profile", "start"]:
+        if sampler.start():
+            message = "Sampling profiler started."
+        else:
+            message = "The profiler is already running."
+    elif args == ["profile", "stop"]:
+        path, samples = sampler.stop()
+        if path:
+            message = f"Profiler stopped, {samples} samples written to {path}."
+        else:
+            message = "The profiler is not running."
+    else:
+        message = "Usage: /debug perf or /debug profile start|stop"
+
+    try:
+        await update.message.reply_text(message, parse_mode="HTML")
+    except Exception as e:
+        logger.info(f"Failed to send message: {e}")
+
+
+async def reload_command(
+    update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE
+):
+    if str(update.message.from_user.id) not in USER_ID_LIST:
+        return
+
+    try:
+        cfg = config_store.reload()
+        message = (
+            f"Configuration reloaded: <b>{len(cfg.watch.calls)}</b> watched callsigns, "
+            f"<b>{len(cfg.near_rules)}</b> distance rules, "
+            f"<b>{len(cfg.pota_filters)}</b> POTA and "
+            f"<b>{len(cfg.sota_filters)}</b> SOTA filters."
+        )
+    except Exception as e:
+        logger.error(f"Failed to reload the configuration: {e}")
+        message = "Failed to reload the configuration, the old one is still in use."
+
+    try:
+        await update.message.reply_text(message, parse_mode="HTML")
+    except Exception as e:
+        logger.info(f"Failed to send message: {e}")
+
+
 # Automatic Spotting
 
 
-async def send_msg_POTA(
-    activator, frequency, reference, mode, name, locationDesc, comment
+def format_msg_POTA(
+    activator, frequency, reference, mode, name, locationDesc, comment, distance=None
 ):
-    urlPark = "https://pota.app/#/park/" + reference
-    urlActivator = "https://www.qrz.com/db/" + activator
+    urlPark = "https://pota.app/#/park/" + html.escape(reference)
+    urlActivator = "https://www.qrz.com/db/" + html.escape(activator)
+    distance = f"Distance: <b>{int(distance)} km</b>\n" if distance is not None else ""
 
     message = (
-        f"<a href='{urlActivator}'><b>[ {activator} ]</b></a> is now activating park <a href='{urlPark}'><b>[ {reference} ]</b></a> - <i>{name}</i>\n\n"
-        f"Frequency: <b>{frequency}</b>\n"
-        f"Mode: <b>{mode}</b>\n"
-        f"Region: <b>{locationDesc}</b>\n"
-        f"Info: <b>{comment}</b>"
+        f"<a href='{urlActivator}'><b>[ {html.escape(activator)} ]</b></a> is now activating park <a href='{urlPark}'><b>[ {html.escape(reference)} ]</b></a> - <i>{html.escape(name)}</i>\n\n"
+        f"Frequency: <b>{html.escape(frequency)}</b>\n"
+        f"Mode: <b>{html.escape(mode)}</b>\n"
+        f"Region: <b>{html.escape(locationDesc)}</b>\n"
+        f"{distance}"
+        f"Info: <b>{html.escape(comment)}</b>"
     )
-    await send_message_with_retry(app, CHAT_ID, TOPIC_ID, message)
-    await asyncio.sleep(0.5)
+    return message
 
 
-async def send_msg_SOTA(
+def format_msg_SOTA(
     timeStamp,
     activatorCallsign,
     activatorName,
@@ -689,34 +1055,32 @@ async def send_msg_SOTA(
     frequency,
     mode,
 ):
-    urlActivator = "https://www.qrz.com/db/" + activatorCallsign
+    urlActivator = "https://www.qrz.com/db/" + html.escape(activatorCallsign)
 
     message = (
-        f"<a href='{urlActivator}'><b>[ {activatorCallsign} ]</b></a> - <i>{activatorName}</i> is now activating summit <b>[ {summitCode} ]</b> - <i>{summitDetails}</i>\n\n"
+        f"<a href='{urlActivator}'><b>[ {html.escape(activatorCallsign)} ]</b></a> - <i>{html.escape(activatorName)}</i> is now activating summit <b>[ {html.escape(summitCode)} ]</b> - <i>{html.escape(summitDetails)}</i>\n\n"
         f"Posted at: <b>{timeStamp[0]} - {timeStamp[1]}</b>\n"
-        f"Frequency: <b>{frequency}</b>\n"
-        f"Mode: <b>{mode}</b>\n"
-        f"Activator's comment: <b>{comments}</b>"
+        f"Frequency: <b>{html.escape(frequency)}</b>\n"
+        f"Mode: <b>{html.escape(mode)}</b>\n"
+        f"Activator's comment: <b>{html.escape(comments)}</b>"
     )
-    await send_message_with_retry(app, CHAT_ID, TOPIC_ID, message)
-    await asyncio.sleep(0.5)
+    return message
 
 
-async def send_msg_WWBOTA(timestamp, activator, comment, ref, frequency, mode):
-    urlActivator = "https://www.qrz.com/db/" + activator
+def format_msg_WWBOTA(timestamp, activator, comment, ref, frequency, mode):
+    urlActivator = "https://www.qrz.com/db/" + html.escape(activator)
 
     message = (
-        f"<a href='{urlActivator}'><b>[ {activator} ]</b></a> is now activating bunker <b>[ {ref} ]</b>\n\n"
+        f"<a href='{urlActivator}'><b>[ {html.escape(activator)} ]</b></a> is now activating bunker <b>[ {html.escape(ref)} ]</b>\n\n"
         f"Posted at: <b>{timestamp[0]} - {timestamp[1]}</b>\n"
-        f"Frequency: <b>{frequency}</b>\n"
-        f"Mode: <b>{mode}</b>\n"
-        f"Activator's comment: <b>{comment}</b>"
+        f"Frequency: <b>{html.escape(frequency)}</b>\n"
+        f"Mode: <b>{html.escape(mode)}</b>\n"
+        f"Activator's comment: <b>{html.escape(comment)}</b>"
     )
-    await send_message_with_retry(app, CHAT_ID, TOPIC_ID, message)
-    await asyncio.sleep(0.5)
+    return message
 
 
-async def send_msg_LLOTA(
+def format_msg_LLOTA(
     timestamp, activator, frequency, mode, reference, refName, country, comment
 ):
     if timestamp:
@@ -725,125 +1089,472 @@ async def send_msg_LLOTA(
     else:
         ts = ("??", "??")
 
-    urlActivator = "https://www.qrz.com/db/" + activator
+    urlActivator = "https://www.qrz.com/db/" + html.escape(activator)
 
     message = (
-        f"<a href='{urlActivator}'><b>[ {activator} ]</b></a> is now activating "
-        f"<b>[ {reference} ]</b> - <i>{refName}</i> ({country})\n\n"
+        f"<a href='{urlActivator}'><b>[ {html.escape(activator)} ]</b></a> is now activating "
+        f"<b>[ {html.escape(reference)} ]</b> - <i>{html.escape(refName)}</i> ({html.escape(country)})\n\n"
         f"Posted at: <b>{ts[0]} - {ts[1]}</b>\n"
+        f"Frequency: <b>{html.escape(frequency)}</b>\n"
+        f"Mode: <b>{html.escape(mode)}</b>\n"
+        f"Info: <b>{html.escape(comment)}</b>"
+    )
+    return message
+
+
+# Formats one spot with its program's message format
+def format_spot(spot):
+    if spot.source == "POTA":
+        return format_msg_POTA(
+            spot.activator,
+            spot.frequency,
+            spot.reference,
+            spot.mode,
+            spot.ref_name,
+            spot.region,
+            spot.comment,
+            spot.distance,
+        )
+    if spot.source == "SOTA":
+        return format_msg_SOTA(
+            getTime(spot.timestamp),
+            spot.activator,
+            spot.activator_name,
+            spot.comment,
+            spot.reference,
+            spot.ref_name,
+            spot.frequency,
+            spot.mode,
+        )
+    if spot.source == "WWBOTA":
+        return format_msg_WWBOTA(
+            getTime(spot.timestamp) if spot.timestamp else ("", ""),
+            spot.activator,
+            spot.comment if spot.comment else spot.status.upper(),
+            spot.reference,
+            spot.frequency,
+            spot.mode,
+        )
+    if spot.source == "LLOTA":
+        khz = spot.freq_khz
+        return format_msg_LLOTA(
+            spot.timestamp,
+            spot.activator,
+            f"{khz / 1000:.3f}" if not math.isnan(khz) else spot.frequency,
+            spot.mode,
+            spot.reference,
+            spot.ref_name,
+            spot.region,
+            spot.comment,
+        )
+    urlActivator = "https://www.qrz.com/db/" + html.escape(spot.activator)
+    return (
+        f"<a href='{urlActivator}'><b>[ {html.escape(spot.activator)} ]</b></a> will be activating beach <b>[ {html.escape(spot.ref_name)} ]</b>\n\n"
+        f"Date and time: <b>{html.escape(spot.timestamp)}</b>\n"
+    )
+
+
+# Delivery
+
+journal = Journal(os.getenv("OUTBOX_PATH", "data/outbox.db"))
+
+
+async def deliver(chat_id, thread_id, text, parse_mode):
+    with perf.span("telegram send"):
+        await app.bot.send_message(
+            chat_id=chat_id,
+            message_thread_id=thread_id,
+            text=text,
+            parse_mode=parse_mode,
+        )
+
+
+# Only network errors and flood limits go away by waiting; a BadRequest (bad
+# HTML, a deleted topic) or Forbidden (the bot was removed) fails every time
+def retryable(error):
+    if isinstance(error, RetryAfter):
+        return True
+    return isinstance(error, NetworkError) and not isinstance(error, BadRequest)
+
+
+outbox = Outbox(
+    journal,
+    deliver,
+    workers=int(os.getenv("OUTBOX_WORKERS", "4")),
+    retryable=retryable,
+)
+
+
+# Supervision
+
+HEALTH_HOST = os.getenv("HEALTH_HOST", "127.0.0.1")
+HEALTH_PORT = int(os.getenv("HEALTH_PORT", "8080"))
+READY_MAX_AGE = float(os.getenv("READY_MAX_AGE", "600"))
+
+supervisor = Supervisor(stall_after=float(os.getenv("WATCHDOG_STALL", "10")))
+
+
+DEDUP_WINDOW = float(os.getenv("DEDUP_WINDOW", "180")) * 60
+
+
+# What a spot was announced for. Updates (QSY, QRV, QRT) only follow a new
+# activation seen by this run, so they keep the whole spot and two QSYs are
+# two messages
+def transition(spot):
+    if spot.event in (None, status.NEW, status.REFERENCE):
+        return (status.NEW,)
+    return (spot.event,) + spot.key()
+
+
+# Idempotency key of the announcement of these spots. After a restart the
+# activator state is empty and every activation still on the air is detected
+# again as new, so for new activations the key leaves out what changes
+# between polls (spot time, comment, frequency) and keeps source, base call
+# and reference, within a DEDUP_WINDOW time bucket. A return to the park in a
+# later bucket is a new message
+def message_key(spots, now=None):
+    bucket = int((time.time() if now is None else now) // DEDUP_WINDOW)
+    activations = sorted(
+        (spot.source, base_call(spot.activator), spot.reference) + transition(spot)
+        for spot in spots
+    )
+    return hashlib.sha1(repr((activations, bucket)).encode()).hexdigest()
+
+
+async def send_spot(spot):
+    outbox.put(message_key([spot]), CHAT_ID, TOPIC_ID, format_spot(spot))
+
+
+REFERENCE_URLS = {
+    "POTA": "https://pota.app/#/park/",
+    "SOTA": "https://www.sotadata.org.uk/en/summit/",
+}
+
+
+# "POTA [ RO-0001 ] - Park name", linked to the reference page when known
+def format_reference(spot):
+    reference = html.escape(spot.reference)
+    ref = f"<b>[ {reference} ]</b>"
+    if spot.source in REFERENCE_URLS:
+        ref = f"<a href='{REFERENCE_URLS[spot.source] + reference}'>{ref}</a>"
+    name = f" - <i>{html.escape(spot.ref_name)}</i>" if spot.ref_name else ""
+    return f"{spot.source} {ref}{name}"
+
+
+# Sends the spots of one activation, combining several programs in one message
+async def send_merged(spots):
+    if len(spots) == 1:
+        await send_spot(spots[0])
+        return
+
+    first = spots[0]
+    activator = html.escape(first.activator)
+    urlActivator = "https://www.qrz.com/db/" + activator
+    references = ""
+    for spot in spots:
+        references += f"   • {format_reference(spot)}\n"
+    comments = html.escape(
+        " | ".join(dict.fromkeys(s.comment for s in spots if s.comment))
+    )
+    frequency = (
+        f"{first.freq_khz / 1000:.3f} MHz"
+        if not math.isnan(first.freq_khz)
+        else html.escape(first.frequency)
+    )
+
+    message = (
+        f"<a href='{urlActivator}'><b>[ {activator} ]</b></a> is now activating:\n"
+        f"{references}\n"
         f"Frequency: <b>{frequency}</b>\n"
-        f"Mode: <b>{mode}</b>\n"
-        f"Info: <b>{comment}</b>"
+        f"Mode: <b>{html.escape(first.mode)}</b>\n"
+        f"Info: <b>{comments}</b>"
+    )
+    outbox.put(message_key(spots), CHAT_ID, TOPIC_ID, message)
+
+
+# Digest mode
+
+DIGEST_INTERVAL = float(os.getenv("DIGEST_INTERVAL", "0")) * 60
+
+
+def format_hhmm(ts):
+    return time.strftime("%H:%M", time.gmtime(ts))
+
+
+def format_khz(khz):
+    return f"{khz / 1000:.3f}"
+
+
+# Builds one digest message: an entry per activator with its references,
+# frequencies, mode, number of updates and first/last times
+def format_digest(groups, started, ended, overflow, limit=4000):
+    message = (
+        f"<b><u>Activity {format_hhmm(started)}–{format_hhmm(ended)} UTC</u></b> "
+        f"({len(groups)} activators)\n"
     )
-    await send_message_with_retry(app, CHAT_ID, TOPIC_ID, message)
-    await asyncio.sleep(0.5)
+    for i, entries in enumerate(groups):
+        latest = max(entries, key=lambda entry: entry.last)
+        spot = latest.spot
+        freqs = [format_khz(khz) for khz in latest.freqs if not math.isnan(khz)]
+        if len(freqs) > 3:
+            freqs[1:-2] = ["…"]
+        frequency = (
+            " → ".join(freqs) + " MHz" if freqs else html.escape(spot.frequency)
+        )
+        updates = sum(entry.count for entry in entries)
+        first = min(entry.first for entry in entries)
+        times = format_hhmm(first)
+        if latest.last - first >= 60:
+            times += f"–{format_hhmm(latest.last)}"
+        details = [frequency, html.escape(spot.mode), times]
+        if updates > 1:
+            details.append(f"{updates} updates")
+        if latest.qrt:
+            details.append("<b>QRT</b>")
+
+        activator = html.escape(spot.activator)
+        urlActivator = "https://www.qrz.com/db/" + activator
+        block = (
+            f"\n<a href='{urlActivator}'><b>[ {activator} ]</b></a> "
+            + " · ".join(part for part in details if part)
+            + "\n"
+            + "".join(f"   • {format_reference(entry.spot)}\n" for entry in entries)
+        )
+        if len(message) + len(block) > limit:
+            overflow += sum(len(rest) for rest in groups[i:])
+            break
+        message += block
+    if overflow:
+        message += f"\n… and {overflow} more references."
+    return message
+
+
+# Chats in digest mode: CHAT_ID when DIGEST_INTERVAL is set, plus DIGEST_CHATS
+digest_chats = digestlib.parse_chats(
+    os.getenv("DIGEST_CHATS"), DIGEST_INTERVAL or 1800.0
+)
+if DIGEST_INTERVAL > 0:
+    digest_chats[(CHAT_ID, TOPIC_ID)] = digestlib.Schedule(DIGEST_INTERVAL)
+digest = digestlib.Digest(
+    digest_chats,
+    format_digest,
+    outbox.put,
+    max_entries=int(os.getenv("DIGEST_MAX", "100")),
+)
+
+
+# Feeds the digests and, unless CHAT_ID is in digest mode, announces straight away
+async def announce(spots):
+    refdb.enrich(spots)
+    digest.add(spots)
+    if (CHAT_ID, TOPIC_ID) not in digest.chats:
+        await send_merged(spots)
+
+
+merger = SpotMerger(announce, hold=float(os.getenv("MERGE_HOLD", "15")))
+
 
+# Live boards
+
+LIVE_BOARD = board.enabled()
+boards = board.BoardManager(
+    ("POTA", "SOTA", "LLOTA", "WWBOTA"),
+    min_interval=float(os.getenv("BOARD_INTERVAL", "30")),
+    state_path=os.getenv("BOARD_STATE", "data/board.json"),
+)
+
+
+# Frequency and status changes of a known activation only edit the live
+# board when it is enabled; new activations are still announced
+async def announce_update(spot):
+    if not LIVE_BOARD:
+        await merger.submit(spot)
+
+
+async def board_job(app):
+    while True:
+        with perf.span("board flush"):
+            await boards.flush(app.bot, CHAT_ID, TOPIC_ID)
+        supervisor.beat("board")
+        await asyncio.sleep(5)
+
+
+# Inline mode
+
+INLINE_CACHE_TTL = float(os.getenv("INLINE_CACHE_TTL", "10"))
+INLINE_BUDGET = float(os.getenv("INLINE_BUDGET", "0.5"))
+
+
+def render_inline_spot(spot):
+    details = " · ".join(
+        part for part in (spot.source, spot.frequency, spot.mode, spot.ref_name) if part
+    )
+    return telegram.InlineQueryResultArticle(
+        id=hashlib.md5(repr(spot.key()).encode()).hexdigest(),
+        title=f"{spot.activator} @ {spot.reference or spot.ref_name}",
+        description=details,
+        input_message_content=telegram.InputTextMessageContent(
+            format_spot(spot), parse_mode="HTML"
+        ),
+    )
 
-act_pota = {}
-act_sota = {}
-act_wwbota = {}
-act_llota = {}
 
+snapshot_store = SnapshotStore(render_inline_spot, ttl=INLINE_CACHE_TTL)
 
+
+# Answers an inline query from the spot snapshots and the callbook index only,
+# never from upstream. Callbook matches are skipped once the budget is spent.
+def inline_results(query):
+    query = " ".join(query.upper().split())
+    cached = snapshot_store.cached(query)
+    if cached is not None:
+        return cached
+
+    start = time.perf_counter()
+    results = snapshot_store.search(query, limit=50)
+
+    callbook = callbook_store.current
+    if (
+        callbook is not None
+        and len(query) >= 2
+        and len(results) < 50
+        and time.perf_counter() - start < INLINE_BUDGET
+    ):
+        seen = set()
+        for row, _ in callbook.search(query, n=min(10, 50 - len(results))):
+            callsign = str(row["INDICATIVUL"]).strip().upper()
+            if callsign in seen:
+                continue
+            seen.add(callsign)
+            results.append(
+                telegram.InlineQueryResultArticle(
+                    id=f"callbook:{callsign}",
+                    title=f"{callsign} - {row['TITULARUL']}",
+                    description=f"{row['LOCALITATEA']} · Class {row['CLASA']}",
+                    input_message_content=telegram.InputTextMessageContent(
+                        format_callbook(row, callsign), parse_mode="HTML"
+                    ),
+                )
+            )
+
+    elapsed = time.perf_counter() - start
+    if elapsed > INLINE_BUDGET:
+        logger.warning(f"Inline query '{query}' took {elapsed * 1000:.0f} ms.")
+    snapshot_store.store(query, results)
+    return results
+
+
+@perf.timed("inline query")
+async def inline_query_handler(
+    update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE
+):
+    inline_query = update.inline_query
+    if not inline_query:
+        return
+
+    try:
+        await inline_query.answer(
+            inline_results(inline_query.query),
+            cache_time=int(INLINE_CACHE_TTL),
+        )
+    except Exception as e:
+        logger.info(f"Failed to answer inline query: {e}")
+
+
+ACTIVATOR_STATE_MAX = int(os.getenv("ACTIVATOR_STATE_MAX", "5000"))
+act_pota = ActivatorState(max_size=ACTIVATOR_STATE_MAX)
+act_sota = ActivatorState(max_size=ACTIVATOR_STATE_MAX)
+act_wwbota = ActivatorState(max_size=ACTIVATOR_STATE_MAX)
+act_llota = ActivatorState(max_size=ACTIVATOR_STATE_MAX)
+
+spot_stats = SpotStats()
+
+
+# The most recent spot of every activator. An activator spotted on two
+# frequencies at once would otherwise flip between them on every poll
+def latest_per_activator(spots):
+    latest = {}
+    for spot in sorted(spots, key=lambda s: s.timestamp):
+        latest[spot.activator] = spot
+    return list(latest.values())
+
+
+# Feed the polled spots (before the AUTO_SPOT filter) into the statistics and
+# the reference database. The statistics get one spot per activator, so two
+# concurrent spots don't count as a band or mode change on every poll
+def record_stats(spots):
+    try:
+        for spot in latest_per_activator(spots):
+            spot_stats.observe(
+                spot.source, spot.activator, spot.reference, spot.band, spot.mode
+            )
+    except Exception as e:
+        logger.error(f"Failed to record statistics: {e}")
+    try:
+        refdb.learn(spots)
+    except Exception as e:
+        logger.error(f"Failed to record references: {e}")
+
+
+# Keeps the spots matched by the AUTO_SPOT callsigns or one of the distance
+# rules, restricted to AUTO_SPOT_BANDS
+def watch_filter(spots, cfg, near=False):
+    keep = [cfg.watch(spot.activator) for spot in spots]
+    if near:
+        for grid, radius in cfg.near_rules:
+            distance = mh.distances_km(grid, [spot.grid for spot in spots])
+            keep = [k or d <= radius for k, d in zip(keep, distance)]
+    return [
+        spot
+        for spot, k in zip(spots, keep)
+        if k and (not cfg.bands or spot.band in cfg.bands)
+    ]
+
+
+# Runs a spot through its activator's status state machine and announces the
+# transition: new activations always, updates (QSY, QRV, QRT) through
+# announce_update. Returns whether anything was announced
+async def track(state, spot, min_qsy_khz, ttl=None):
+    call = spot.activator
+    state.seen(call, ttl)
+    previous = state.get(call)
+    entry, event = status.step(previous, spot, min_qsy_khz)
+    if entry is not previous:
+        state[call] = entry
+    spot.event = event
+    if event in (status.NEW, status.REFERENCE):
+        await merger.submit(spot)
+    elif event is not None:
+        await announce_update(spot)
+    return event is not None
+
+
+@perf.timed("auto_spot")
 async def auto_spot(app):
     global act_pota
     global act_sota
     global act_wwbota
     sent = False
 
+    # The whole poll works on one configuration snapshot, a reload only
+    # applies from the next poll
+    cfg = config_store.current
+
     try:
-        _, df = dc.centralisePOTA()
-        flt = os.getenv("AUTO_SPOT")
-        if flt:
-            flt = flt.split()
-            mask = df["activator"].apply(
-                lambda x: any(activator in x for activator in flt)
-            )
-            df = df[mask].reset_index(drop=True)
-
-            for index, row in df.iterrows():
-                if row["activator"] not in act_pota:
-                    act_pota[row["activator"]] = (
-                        row["reference"],
-                        row["frequency"],
-                        row["comments"],
-                    )
-                    await send_msg_POTA(
-                        row["activator"],
-                        row["frequency"],
-                        row["reference"],
-                        row["mode"],
-                        row["name"],
-                        row["locationDesc"],
-                        row["comments"],
-                    )
-                    sent = True
-                    continue
-                if act_pota[row["activator"]][0] != row["reference"]:
-                    act_pota[row["activator"]] = (
-                        row["reference"],
-                        row["frequency"],
-                        row["comments"],
-                    )
-                    await send_msg_POTA(
-                        row["activator"],
-                        row["frequency"],
-                        row["reference"],
-                        row["mode"],
-                        row["name"],
-                        row["locationDesc"],
-                        row["comments"],
-                    )
-                    sent = True
-                    continue
-                if (
-                    abs(int(act_pota[row["activator"]][1]) - int(row["frequency"]))
-                    >= 999
-                ):
-                    act_pota[row["activator"]] = (
-                        row["reference"],
-                        row["frequency"],
-                        row["comments"],
-                    )
-                    await send_msg_POTA(
-                        row["activator"],
-                        row["frequency"],
-                        row["reference"],
-                        row["mode"],
-                        row["name"],
-                        row["locationDesc"],
-                        row["comments"],
-                    )
-                    sent = True
-                    continue
-                if (
-                    (
-                        "QRT" in row["comments"].upper()
-                        and "QRT" not in act_pota[row["activator"]][2].upper()
-                    )
-                    or (
-                        "QRV" in row["comments"].upper()
-                        and "QRV" not in act_pota[row["activator"]][2].upper()
-                    )
-                    or (
-                        "QSY" in row["comments"].upper()
-                        and "QSY" not in act_pota[row["activator"]][2].upper()
-                    )
-                ):
-                    act_pota[row["activator"]] = (
-                        row["reference"],
-                        row["frequency"],
-                        row["comments"],
-                    )
-                    await send_msg_POTA(
-                        row["activator"],
-                        row["frequency"],
-                        row["reference"],
-                        row["mode"],
-                        row["name"],
-                        row["locationDesc"],
-                        row["comments"],
-                    )
+        ok, spots = dc.centralisePOTA(cfg.default_pota)
+        if ok:
+            supervisor.success("POTA")
+            record_stats(spots)
+            snapshot_store.update("POTA", spots)
+        if cfg.watch or cfg.near_rules:
+            spots = watch_filter(spots, cfg, near=True)
+            # A failed poll leaves the board as it was instead of clearing it
+            latest = latest_per_activator(spots)
+            if ok:
+                boards.update("POTA", latest)
+
+            for spot in latest:
+                if await track(act_pota, spot, 999, pota_ttl(spot)):
                     sent = True
             if sent:
                 logger.info("Auto spot messages sent successfully.")
@@ -853,105 +1564,19 @@ async def auto_spot(app):
     sent = False
 
     try:
-        _, df = dc.centraliseSOTA()
-        flt = os.getenv("AUTO_SPOT")
-        if flt:
-            flt = flt.split()
-            mask = df["activatorCallsign"].apply(
-                lambda x: any(activator in x for activator in flt)
-            )
-            df = df[mask].reset_index(drop=True)
-
-            for index, row in df.iterrows():
-                if row["activatorCallsign"] not in act_sota:
-                    act_sota[row["activatorCallsign"]] = (
-                        row["summitCode"],
-                        row["frequency"],
-                        row["comments"],
-                    )
-                    await send_msg_SOTA(
-                        row["timeStamp"],
-                        row["activatorCallsign"],
-                        row["activatorName"],
-                        row["comments"],
-                        row["summitCode"],
-                        row["summitDetails"],
-                        row["frequency"],
-                        row["mode"],
-                    )
-                    sent = True
-                    continue
-                if act_sota[row["activatorCallsign"]][0] != row["summitCode"]:
-                    act_sota[row["activatorCallsign"]] = (
-                        row["summitCode"],
-                        row["frequency"],
-                        row["comments"],
-                    )
-                    await send_msg_SOTA(
-                        row["timeStamp"],
-                        row["activatorCallsign"],
-                        row["activatorName"],
-                        row["comments"],
-                        row["summitCode"],
-                        row["summitDetails"],
-                        row["frequency"],
-                        row["mode"],
-                    )
-                    sent = True
-                    continue
-                if (
-                    abs(
-                        int(act_sota[row["activatorCallsign"]][1])
-                        - int(row["frequency"])
-                    )
-                    >= 999
-                ):
-                    act_sota[row["activatorCallsign"]] = (
-                        row["summitCode"],
-                        row["frequency"],
-                        row["comments"],
-                    )
-                    await send_msg_SOTA(
-                        row["timeStamp"],
-                        row["activatorCallsign"],
-                        row["activatorName"],
-                        row["comments"],
-                        row["summitCode"],
-                        row["summitDetails"],
-                        row["frequency"],
-                        row["mode"],
-                    )
-                    sent = True
-                    continue
-                if (
-                    (
-                        "QRT" in row["comments"].upper()
-                        and "QRT" not in act_sota[row["activatorCallsign"]][2].upper()
-                    )
-                    or (
-                        "QRV" in row["comments"].upper()
-                        and "QRV" not in act_sota[row["activatorCallsign"]][2].upper()
-                    )
-                    or (
-                        "QSY" in row["comments"].upper()
-                        and "QSY" not in act_sota[row["activatorCallsign"]][2].upper()
-                    )
-                ):
-                    act_sota[row["activatorCallsign"]] = (
-                        row["summitCode"],
-                        row["frequency"],
-                        row["comments"],
-                    )
-                    await send_msg_SOTA(
-                        row["timeStamp"],
-                        row["activatorCallsign"],
-                        row["activatorName"],
-                        row["comments"],
-                        row["summitCode"],
-                        row["summitDetails"],
-                        row["frequency"],
-                        row["mode"],
-                    )
+        ok, spots = dc.centraliseSOTA(cfg.default_sota)
+        if ok:
+            supervisor.success("SOTA")
+            record_stats(spots)
+            snapshot_store.update("SOTA", spots)
+        if cfg.watch:
+            spots = watch_filter(spots, cfg)
+            latest = latest_per_activator(spots)
+            if ok:
+                boards.update("SOTA", latest)
+
+            for spot in latest:
+                if await track(act_sota, spot, 999):
                     sent = True
             if sent:
                 logger.info("Auto spot messages sent successfully.")
@@ -960,133 +1585,23 @@ async def auto_spot(app):
 
     try:
         url = "https://llota.app/api/spots"
-        _, df = dc.centraliseLLOTA(url)
-        flt = os.getenv("AUTO_SPOT")
+        ok, spots = dc.centraliseLLOTA(url)
+        if ok:
+            supervisor.success("LLOTA")
+            record_stats(spots)
+            snapshot_store.update("LLOTA", spots)
 
-        if flt and not df.empty:
-            flt = flt.split()
+        if cfg.watch and spots:
             # 1. Filter by callsign first
-            mask = df["callsign"].apply(
-                lambda x: any(activator in x for activator in flt)
-            )
-            df = df[mask].reset_index(drop=True)
+            spots = watch_filter(spots, cfg)
 
-            if not df.empty and "timestamp" in df.columns:
-                df = df.sort_values("timestamp", ascending=True)
-                df = df.drop_duplicates(subset=["callsign"], keep="last")
+            # Keep only the most recent spot per callsign
+            latest = latest_per_activator(spots)
+            if ok:
+                boards.update("LLOTA", latest)
 
-            for index, row in df.iterrows():
-                callsign = row["callsign"]
-
-                try:
-                    raw_freq = float(row["frequency"])
-                    if raw_freq > 200:
-                        current_freq = f"{raw_freq / 1000:.3f}"
-                    else:
-                        current_freq = str(row["frequency"])
-                except ValueError:
-                    current_freq = str(row["frequency"])
-
-                # Check for new spot
-                if callsign not in act_llota:
-                    act_llota[callsign] = (
-                        row["reference"],
-                        current_freq,
-                        row["comment"] if row["comment"] else "",
-                    )
-                    await send_msg_LLOTA(
-                        row["timestamp"],
-                        callsign,
-                        current_freq,
-                        row["mode"],
-                        row["reference"],
-                        row["reference_name"],
-                        row["country_name"],
-                        row["comment"],
-                    )
-                    sent = True
-                    continue
-
-                # Check for reference change
-                if act_llota[callsign][0] != row["reference"]:
-                    act_llota[callsign] = (
-                        row["reference"],
-                        current_freq,
-                        row["comment"] if row["comment"] else "",
-                    )
-                    await send_msg_LLOTA(
-                        row["timestamp"],
-                        callsign,
-                        current_freq,
-                        row["mode"],
-                        row["reference"],
-                        row["reference_name"],
-                        row["country_name"],
-                        row["comment"],
-                    )
-                    sent = True
-                    continue
-
-                # Check for frequency change (MHz)
-                try:
-                    old_freq_float = float(act_llota[callsign][1])
-                    new_freq_float = float(current_freq)
-
-                    if abs(old_freq_float - new_freq_float) >= 0.001:
-                        act_llota[callsign] = (
-                            row["reference"],
-                            current_freq,
-                            row["comment"] if row["comment"] else "",
-                        )
-                        await send_msg_LLOTA(
-                            row["timestamp"],
-                            callsign,
-                            current_freq,
-                            row["mode"],
-                            row["reference"],
-                            row["reference_name"],
-                            row["country_name"],
-                            row["comment"],
-                        )
-                        sent = True
-                        continue
-                except ValueError:
-                    # Fallback if frequency isn't a valid float
-                    pass
-
-                # Check for Q-codes in comments
-                current_comment = row["comment"] if row["comment"] else ""
-                old_comment = act_llota[callsign][2]
-
-                if (
-                    (
-                        "QRT" in current_comment.upper()
-                        and "QRT" not in old_comment.upper()
-                    )
-                    or (
-                        "QRV" in current_comment.upper()
-                        and "QRV" not in old_comment.upper()
-                    )
-                    or (
-                        "QSY" in current_comment.upper()
-                        and "QSY" not in old_comment.upper()
-                    )
-                ):
-                    act_llota[callsign] = (
-                        row["reference"],
-                        current_freq,
-                        current_comment,
-                    )
-                    await send_msg_LLOTA(
-                        row["timestamp"],
-                        callsign,
-                        current_freq,
-                        row["mode"],
-                        row["reference"],
-                        row["reference_name"],
-                        row["country_name"],
-                        row["comment"],
-                    )
+            for spot in latest:
+                if await track(act_llota, spot, 1):
                     sent = True
 
             if sent:
@@ -1097,14 +1612,31 @@ async def auto_spot(app):
     # WWBOTA auto-spotting is now handled by SSE listener (wwbota_sse_listener)
 
 
+# Handles one event of the WWBOTA SSE stream
+async def handle_wwbota_event(data):
+    spot = dc.spotFromWWBOTA(schemas.loads(data))
+    if spot is None:
+        return
+    spotlib.classify([spot])
+    call = spot.activator
+    record_stats([spot])
+    snapshot_store.upsert(spot)
+
+    # Check if callsign is in AUTO_SPOT filter
+    if not watch_filter([spot], config_store.current):
+        return
+    boards.upsert(spot)
+
+    if await track(act_wwbota, spot, 999):
+        logger.info(f"WWBOTA SSE: Queued spot for {call}")
+
+
 async def wwbota_sse_listener(app):
     """Listen to WWBOTA SSE stream for real-time spots."""
     global act_wwbota
-    flt = os.getenv("AUTO_SPOT")
-    if not flt:
+    if not config_store.current.watch:
         logger.info("AUTO_SPOT not set, WWBOTA SSE listener disabled.")
         return
-    flt = flt.split()
 
     url = "https://api.wwbota.net/spots/"
     headers = {"Accept": "text/event-stream"}
@@ -1119,75 +1651,10 @@ async def wwbota_sse_listener(app):
                     logger.info("Connected to WWBOTA SSE stream.")
                     async for event in event_source:
                         if event.data:
+                            supervisor.success("WWBOTA")
+                            recorder.record("sse", url, event.data)
                             try:
-                                spot = json.loads(event.data)
-                                call = spot.get("call", "")
-
-                                # Check if callsign is in AUTO_SPOT filter
-                                if not any(activator in call for activator in flt):
-                                    continue
-
-                                # Extract data
-                                ref = (
-                                    spot.get("references", [{}])[0].get("reference", "")
-                                    if spot.get("references")
-                                    else ""
-                                )
-                                freq = spot.get("freq", 0)
-                                mode = spot.get("mode", "")
-                                spot_type = spot.get("type", "").upper()
-                                comment = spot.get("comment", "")
-                                time_str = spot.get("time", "")
-
-                                # Parse timestamp
-                                if time_str and "T" in time_str:
-                                    timestamp = (
-                                        time_str.split("T")[0],
-                                        time_str.split("T")[1].split(".")[0],
-                                    )
-                                else:
-                                    timestamp = ("", "")
-
-                                # Check if we should send notification
-                                should_send = False
-
-                                if call not in act_wwbota:
-                                    act_wwbota[call] = (ref, freq, spot_type)
-                                    should_send = True
-                                elif act_wwbota[call][0] != ref:
-                                    act_wwbota[call] = (ref, freq, spot_type)
-                                    should_send = True
-                                elif abs(int(act_wwbota[call][1]) - int(freq)) >= 999:
-                                    act_wwbota[call] = (ref, freq, spot_type)
-                                    should_send = True
-                                elif (
-                                    (
-                                        "QRT" in spot_type
-                                        and "QRT" not in act_wwbota[call][2]
-                                    )
-                                    or (
-                                        "QRV" in spot_type
-                                        and "QRV" not in act_wwbota[call][2]
-                                    )
-                                    or (
-                                        "QSY" in spot_type
-                                        and "QSY" not in act_wwbota[call][2]
-                                    )
-                                ):
-                                    act_wwbota[call] = (ref, freq, spot_type)
-                                    should_send = True
-
-                                if should_send:
-                                    await send_msg_WWBOTA(
-                                        timestamp,
-                                        call,
-                                        comment if comment else spot_type,
-                                        ref,
-                                        freq,
-                                        mode,
-                                    )
-                                    logger.info(f"WWBOTA SSE: Sent spot for {call}")
-
+                                await handle_wwbota_event(event.data)
                             except json.JSONDecodeError as e:
                                 logger.debug(f"SSE non-JSON data: {event.data[:100]}")
                             except Exception as e:
@@ -1205,29 +1672,138 @@ async def wwbota_sse_listener(app):
 async def scheduler(app):
     while True:
         await auto_spot(app)
+        for state in (act_pota, act_sota, act_wwbota, act_llota):
+            state.prune()
+        supervisor.beat("scheduler")
         await asyncio.sleep(5)
 
 
-if __name__ == "__main__":
-    logger.info("Starting bot...")
-    app = telegram.ext.Application.builder().token(TOKEN).build()
+# The application with every command, inline and callback handler. base_url
+# points it at another Bot API server (see loadtest.py)
+def build_app(base_url=None):
+    # Updates are handled concurrently, otherwise one slow command (a /get_bota
+    # rendered in Chrome) holds up everyone and the fair queue never fills
+    builder = (
+        telegram.ext.Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(int(os.getenv("CONCURRENT_UPDATES", "32")))
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    app = builder.build()
 
     # Commands
-    app.add_handler(telegram.ext.CommandHandler("help", help_command))
-    app.add_handler(telegram.ext.CommandHandler("latest", get_latest_park_command))
-    app.add_handler(telegram.ext.CommandHandler("get_BOTA", get_BOTA_command))
-    app.add_handler(telegram.ext.CommandHandler("get_LLOTA", get_LLOTA_command))
-    app.add_handler(telegram.ext.CommandHandler("get_POTA", get_POTA_command))
-    app.add_handler(telegram.ext.CommandHandler("get_SOTA", get_SOTA_command))
-    app.add_handler(telegram.ext.CommandHandler("get_WWBOTA", get_WWBOTA_command))
-    app.add_handler(telegram.ext.CommandHandler("callsign", callsign_info_command))
-    app.add_handler(telegram.ext.CommandHandler("potadate", potadate_command))
+    app.add_handler(
+        telegram.ext.CommandHandler("help", throttled("help", help_command))
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler(
+            "latest", throttled("latest", get_latest_park_command)
+        )
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler("get_BOTA", throttled("get_BOTA", get_BOTA_command))
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler(
+            "get_LLOTA", throttled("get_LLOTA", get_LLOTA_command)
+        )
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler("get_POTA", throttled("get_POTA", get_POTA_command))
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler("get_SOTA", throttled("get_SOTA", get_SOTA_command))
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler(
+            "get_WWBOTA", throttled("get_WWBOTA", get_WWBOTA_command)
+        )
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler(
+            "callsign", throttled("callsign", callsign_info_command)
+        )
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler("search", throttled("search", search_command))
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler("ref", throttled("ref", ref_command))
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler("potadate", throttled("potadate", potadate_command))
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler("stats", throttled("stats", stats_command))
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler("debug", throttled("debug", debug_command))
+    )
+    app.add_handler(
+        telegram.ext.CommandHandler("reload", throttled("reload", reload_command))
+    )
+
+    # Inline mode and pagination
+    app.add_handler(telegram.ext.InlineQueryHandler(inline_query_handler))
+    app.add_handler(telegram.ext.CallbackQueryHandler(page_callback, pattern=r"^pg:"))
+
+    return app
+
+
+if __name__ == "__main__":
+    logger.info("Starting bot...")
+    app = build_app()
 
     # Automatic spotting
     loop = asyncio.get_event_loop()
-    loop.create_task(scheduler(app))
-    loop.create_task(wwbota_sse_listener(app))
+    config_store.install_signal_handler(loop)
+    # Background tasks are restarted when they fail; the scheduler and the
+    # board are also restarted when they stop beating
+    loop.create_task(supervisor.supervise("outbox", outbox.run))
+    loop.create_task(
+        supervisor.supervise("scheduler", lambda: scheduler(app), stale_after=300)
+    )
+    loop.create_task(supervisor.supervise("wwbota", lambda: wwbota_sse_listener(app)))
+    if LIVE_BOARD:
+        loop.create_task(
+            supervisor.supervise("board", lambda: board_job(app), stale_after=300)
+        )
+
+    if digest.chats:
+        loop.create_task(supervisor.supervise("digest", digest.run))
+
+    # Callbook refresh
+    if CALLBOOK_REFRESH > 0:
+        loop.create_task(
+            supervisor.supervise(
+                "callbook", lambda: cb.refresh_job(callbook_store, CALLBOOK_REFRESH)
+            )
+        )
+
+    # Reference database refresh
+    if REF_REFRESH > 0:
+        loop.create_task(
+            supervisor.supervise(
+                "references", lambda: refs.refresh_job(refdb, REF_REFRESH)
+            )
+        )
+
+    # Watchdog and health endpoint
+    loop.create_task(supervisor.watchdog())
+    if HEALTH_PORT:
+        loop.create_task(
+            serve_health(
+                supervisor,
+                HEALTH_HOST,
+                HEALTH_PORT,
+                ready_sources=("POTA", "SOTA", "LLOTA"),
+                ready_max_age=READY_MAX_AGE,
+            )
+        )
 
     # Polling
     logger.info("Polling...")
     app.run_polling(poll_interval=3)
+    workers.close()
+    transport.close()
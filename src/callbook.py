@@ -0,0 +1,177 @@
+import asyncio
+import io
+import logging
+import os
+import time
+
+import pandas as pd
+
+import data_centralisation as dc
+from search import TrigramIndex
+
+logger = logging.getLogger("BotLogger")
+
+DEFAULT_SOURCE = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../res/callbook.csv")
+)
+
+REQUIRED_COLUMNS = ["INDICATIVUL", "TITULARUL", "CLASA", "LOCALITATEA", "DATA EXPIRARII"]
+DROPPED_COLUMNS = ["SUFIXUL", "E-MAIL", "DATA LIMITA A REZERVARII"]
+
+# A reload that shrinks the callbook below this fraction of the current one is
+# most likely a truncated download, so it is rejected instead of swapped in.
+MIN_KEEP_RATIO = 0.5
+
+
+class Callbook:
+    """Immutable callbook snapshot with an exact callsign index and a trigram
+    index over callsign, holder name and town for fuzzy search."""
+
+    def __init__(self, df: pd.DataFrame, source: str):
+        self.df = df
+        self.source = source
+        self.loaded_at = time.time()
+        self.keys = df["INDICATIVUL"].astype(str).str.strip().str.upper().tolist()
+        self.index = {}
+        for pos, key in enumerate(self.keys):
+            # Keep the first entry for duplicated callsigns
+            self.index.setdefault(key, pos)
+        self.search_index = TrigramIndex(
+            [
+                self.keys,
+                df["TITULARUL"].tolist(),
+                df["LOCALITATEA"].tolist(),
+            ]
+        )
+
+    def __len__(self):
+        return len(self.index)
+
+    def lookup(self, callsign: str) -> pd.Series | None:
+        pos = self.index.get(callsign.strip().upper())
+        if pos is None:
+            return None
+        return self.df.iloc[pos]
+
+    def search(self, text: str, n: int = 10) -> list[tuple[pd.Series, float]]:
+        return [
+            (self.df.iloc[pos], score)
+            for pos, score in self.search_index.query(text, n)
+        ]
+
+    def records(self) -> dict:
+        rows = self.df.itertuples(index=False, name=None)
+        records = {}
+        for key, row in zip(self.keys, rows):
+            records.setdefault(key, row)
+        return records
+
+
+def read_source(source: str) -> pd.DataFrame:
+    if source.startswith(("http://", "https://")):
+        response = dc.sessionRetries().get(source, timeout=30)
+        response.raise_for_status()
+        return pd.read_csv(io.StringIO(response.content.decode("utf-8-sig")))
+    return pd.read_csv(source, encoding="utf-8-sig")
+
+
+# Validates a freshly read callbook and builds its lookup index
+def build(df: pd.DataFrame, source: str) -> Callbook:
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Callbook is missing columns: {', '.join(missing)}")
+    df = df.drop(columns=[col for col in DROPPED_COLUMNS if col in df.columns])
+    df = df[df["INDICATIVUL"].notna()].reset_index(drop=True)
+    if df.empty:
+        raise ValueError("Callbook has no entries.")
+    return Callbook(df, source)
+
+
+def load(source: str = DEFAULT_SOURCE) -> Callbook:
+    return build(read_source(source), source)
+
+
+# Returns (added, removed, changed) callsign counts between two snapshots
+def diff(old: Callbook | None, new: Callbook) -> tuple[int, int, int]:
+    if old is None:
+        return (len(new), 0, 0)
+    old_records = old.records()
+    new_records = new.records()
+    added = new_records.keys() - old_records.keys()
+    removed = old_records.keys() - new_records.keys()
+    changed = sum(
+        1
+        for key in new_records.keys() & old_records.keys()
+        if new_records[key] != old_records[key]
+    )
+    return (len(added), len(removed), changed)
+
+
+class CallbookStore:
+    """Holds the current callbook and swaps in reloaded snapshots.
+
+    Readers grab `store.current` once and keep using that snapshot; a reload
+    builds the new one in a worker thread and replaces the reference in a
+    single assignment, so lookups never wait on a reload.
+    """
+
+    def __init__(self, source: str = DEFAULT_SOURCE):
+        self.source = source
+        self.current: Callbook | None = None
+        self._lock = asyncio.Lock()
+
+    def load_initial(self) -> bool:
+        try:
+            self.current = load(self.source)
+        except FileNotFoundError:
+            logger.error(f"Could not find the callbook at '{self.source}'")
+        except pd.errors.EmptyDataError:
+            logger.error("The callbook file is empty.")
+        except pd.errors.ParserError:
+            logger.error("Error: There was an issue parsing the callbook CSV file.")
+        except UnicodeDecodeError:
+            logger.error(
+                "Error: Could not decode the callbook. Try specifying a different encoding."
+            )
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while loading the callbook: {e}")
+        else:
+            logger.info(f"Callbook successfully loaded ({len(self.current)} callsigns).")
+            return True
+        return False
+
+    def _prepare(self) -> tuple[Callbook, tuple[int, int, int]]:
+        new = load(self.source)
+        old = self.current
+        if old is not None and len(new) < len(old) * MIN_KEEP_RATIO:
+            raise ValueError(
+                f"Reloaded callbook has {len(new)} callsigns, "
+                f"down from {len(old)}; keeping the current one."
+            )
+        return new, diff(old, new)
+
+    async def reload(self) -> bool:
+        if self._lock.locked():
+            logger.info("Callbook reload already in progress, skipping.")
+            return False
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            try:
+                new, (added, removed, changed) = await loop.run_in_executor(
+                    None, self._prepare
+                )
+            except Exception as e:
+                logger.error(f"Callbook reload from '{self.source}' failed: {e}")
+                return False
+            self.current = new
+            logger.info(
+                f"Callbook reloaded from '{self.source}': {len(new)} callsigns, "
+                f"{added} added, {removed} removed, {changed} changed."
+            )
+            return True
+
+
+async def refresh_job(store: CallbookStore, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        await store.reload()
@@ -0,0 +1,40 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger("BotLogger")
+
+
+class Recorder:
+    """Appends upstream responses to `<directory>/capture.jsonl` when
+    RECORD_DIR is set, one {"t", "kind", "url", "data"} object per line.
+    `kind` is "poll" for a decoded JSON response (the fields its schema
+    reads) and "sse" for the raw data of a stream event. src/replay.py plays a capture back."""
+
+    def __init__(self, directory=None):
+        self.file = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, "capture.jsonl")
+            self.file = open(path, "a", encoding="utf-8")
+            logger.info(f"Recording upstream responses to {path}.")
+
+    @property
+    def enabled(self):
+        return self.file is not None
+
+    def record(self, kind, url, data):
+        if self.file is None:
+            return
+        try:
+            self.file.write(
+                json.dumps({"t": time.time(), "kind": kind, "url": url, "data": data})
+                + "\n"
+            )
+            self.file.flush()
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Failed to record {url}: {e}")
+
+
+recorder = Recorder(os.getenv("RECORD_DIR"))
@@ -0,0 +1,136 @@
+import logging
+import os
+import re
+import signal
+from types import MappingProxyType
+from typing import NamedTuple
+
+from dotenv import dotenv_values
+
+import maidenhead as mh
+
+logger = logging.getLogger("BotLogger")
+
+_process_env = None
+
+
+# Remembers the process environment before load_dotenv adds the .env values to
+# it. Reloads overlay the file on this snapshot, so a key removed from the file
+# doesn't keep the value it had at startup
+def snapshot_environ():
+    global _process_env
+    if _process_env is None:
+        _process_env = dict(os.environ)
+
+
+class CallsignMatcher:
+    """AUTO_SPOT callsigns compiled into one regex, so matching a spot costs
+    one search however many callsigns are watched. Like the plain list it
+    replaces, a watched callsign matches anywhere in the activator's call
+    ("YO3BEE" matches "YO3BEE/P")."""
+
+    __slots__ = ("calls", "_pattern")
+
+    def __init__(self, calls):
+        self.calls = tuple(dict.fromkeys(calls))
+        self._pattern = re.compile(
+            "|".join(re.escape(c) for c in sorted(self.calls, key=len, reverse=True))
+        )
+
+    def __call__(self, activator):
+        return bool(self.calls) and self._pattern.search(activator) is not None
+
+    def __bool__(self):
+        return bool(self.calls)
+
+
+class Config(NamedTuple):
+    """One immutable snapshot of the filter and watch settings."""
+
+    watch: CallsignMatcher
+    near_rules: tuple
+    bands: frozenset
+    pota_filters: MappingProxyType  # name -> grid prefixes
+    sota_filters: MappingProxyType  # name -> association prefixes
+    default_pota: tuple
+    default_sota: tuple
+
+
+# Parses AUTO_SPOT_NEAR, e.g. "KN34:300 KN24:150" -> (("KN34", 300.0), ("KN24", 150.0))
+def parse_near_rules(rules):
+    parsed = []
+    for rule in (rules or "").split():
+        grid, _, radius = rule.partition(":")
+        try:
+            if not mh.is_grid(grid):
+                raise ValueError
+            parsed.append((grid.upper(), float(radius.lower().removesuffix("km"))))
+        except ValueError:
+            logger.warning(f"Ignoring invalid AUTO_SPOT_NEAR rule '{rule}'.")
+    return tuple(parsed)
+
+
+def build(env) -> Config:
+    pota, sota = {}, {}
+    for key, value in env.items():
+        if not value:
+            continue
+        name, _, program = key.rpartition("_")
+        if program == "POTA" and name:
+            pota[name.upper()] = tuple(value.split())
+        elif program == "SOTA" and name:
+            sota[name.upper()] = tuple(value.split())
+
+    return Config(
+        watch=CallsignMatcher((env.get("AUTO_SPOT") or "").split()),
+        near_rules=parse_near_rules(env.get("AUTO_SPOT_NEAR")),
+        bands=frozenset((env.get("AUTO_SPOT_BANDS") or "").lower().split()),
+        pota_filters=MappingProxyType(pota),
+        sota_filters=MappingProxyType(sota),
+        default_pota=pota.get("FILTER", ()),
+        default_sota=sota.get("FILTER", ()),
+    )
+
+
+class ConfigStore:
+    """Holds the current Config. `reload` builds a new snapshot from the
+    process environment (as it was before the .env file was loaded) overlaid
+    with `path` and swaps it in; code that already took `current` keeps the
+    snapshot it started with. Empty values in the file count, `AUTO_SPOT=`
+    clears the watch list."""
+
+    def __init__(self, path=".env"):
+        self.path = path
+        self.current = build(os.environ)
+        self.reloads = 0
+
+    def reload(self):
+        env = dict(os.environ if _process_env is None else _process_env)
+        if self.path and os.path.exists(self.path):
+            env.update(
+                {k: v or "" for k, v in dotenv_values(self.path).items()}
+            )
+        config = build(env)
+        self.current = config
+        self.reloads += 1
+        logger.info(
+            f"Configuration reloaded: {len(config.watch.calls)} watched callsigns, "
+            f"{len(config.pota_filters)} POTA and {len(config.sota_filters)} SOTA "
+            "filters."
+        )
+        return config
+
+    # Reloads on SIGHUP, where the platform has it
+    def install_signal_handler(self, loop):
+        if not hasattr(signal, "SIGHUP"):
+            return
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self._reload_safely)
+        except (NotImplementedError, RuntimeError) as e:
+            logger.warning(f"Could not install the SIGHUP handler: {e}")
+
+    def _reload_safely(self):
+        try:
+            self.reload()
+        except Exception as e:
+            logger.error(f"Failed to reload the configuration: {e}")
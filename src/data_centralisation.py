@@ -1,10 +1,14 @@
+import hashlib
 import logging
 import os
 import time
+from html.parser import HTMLParser
+from urllib.parse import urlparse
 
-import pandas as pd
+import aiohttp
+import httpx
+import msgspec
 import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from requests.adapters import HTTPAdapter
 from selenium import webdriver
@@ -17,6 +21,15 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from urllib3.util.retry import Retry
 
+import config
+import schemas
+import spot as spotlib
+from capture import recorder
+from perf import perf
+from spot import Spot
+from transport import transport
+from workers import JobFailed, pool
+
 
 def get_chromedriver_path():
     """Get chromedriver path - use system driver if available (Docker), otherwise fallback to webdriver_manager."""
@@ -31,6 +44,7 @@ def get_chromedriver_path():
 
 
 logger = logging.getLogger("BotLogger")
+config.snapshot_environ()
 load_dotenv()
 
 
@@ -52,131 +66,211 @@ def sessionRetries(
     return session
 
 
-# Function to fetch the data given by the API
-def fetchData(url: str) -> dict | None:
-    session = sessionRetries()
+# Filters come either as the raw setting ("KN24 KN25") or already split
+def _prefixes(flt) -> tuple:
+    return tuple(flt.split()) if isinstance(flt, str) else tuple(flt)
+
+
+# Function to fetch the data given by the API, decoded by `decode` (a
+# schema's, so only the fields the bot uses are built)
+def fetchData(url: str, decode=schemas.loads):
     try:
-        response = session.get(url)
-        response.raise_for_status()
-        data = response.json()
+        with perf.span("fetch " + urlparse(url).netloc):
+            data = transport.fetch_json(url, decode)
+        if recorder.enabled:
+            recorder.record("poll", url, msgspec.to_builtins(data))
         return data
-    except requests.exceptions.ConnectionError as e:
+    except ValueError as e:
+        logging.error(f"Malformed JSON from {url}: {e}")
+        return None
+    except httpx.ConnectError as e:
         logging.error(f"Connection error: {e}")
         return None
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         logging.error(f"HTTPS error: {e}")
         return None
-    except requests.exceptions.Timeout as e:
+    except httpx.TimeoutException as e:
         logging.error(f"Timeout error: {e}")
         return None
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logging.error(f"Request exception: {e}")
         return None
 
 
-# Function that takes the fetched data and stores it into a Pandas DataFrame for POTA activations
-def centralisePOTA(filterPOTA=os.getenv("FILTER_POTA")):
+# Function that takes the fetched data and builds the spot list for POTA activations
+@perf.timed("centralise POTA")
+def centralisePOTA(filterPOTA=os.getenv("FILTER_POTA"), near=None):
     logger.info("Fetching data from [https://api.pota.app/spot/activator]...")
     url = "https://api.pota.app/spot/activator"
-    data = fetchData(url)
-    df = pd.DataFrame
-    if data:
-        logger.info("Fetching successful, building DataFrame...")
-
-        # Construction of DataFrame
-        df = pd.DataFrame(data)
-        df.drop(
-            [
-                "spotId",
-                "spotTime",
-                "source",
-                "spotter",
-                "parkName",
-                "invalid",
-                "grid6",
-                "count",
-                "expire",
-            ],
-            axis=1,
-            inplace=True,
-        )
+    data = fetchData(url, schemas.POTA.decode)
+    spots = schemas.POTA.spots(data) if data else None
+    if spots is not None:
+        logger.info("Fetching successful, building spots...")
 
-        # This is a filter for removing certain lines form the DataFrame
+        # This is a filter for removing certain spots from the list
         if filterPOTA:
-            filterPOTA = filterPOTA.split()
-            mask = df["grid4"].apply(
-                lambda x: any(x.startswith(grid) for grid in filterPOTA)
-            )
-            df = df[mask].reset_index(drop=True)
+            prefixes = _prefixes(filterPOTA)
+            spots = [spot for spot in spots if spot.grid.startswith(prefixes)]
+
+        spots = spotlib.classify(spotlib.dedupe(spots))
+
+        # Proximity filter, near is a (grid, radius_km) tuple, radius can be None
+        if near:
+            spots = spotlib.filter_near(spots, near[0], near[1])
 
-        df.drop_duplicates(inplace=True)
         logger.info("Operation complete.")
-        return (1, df)
+        return (1, spots)
     else:
         logger.error("Failed to fetch data.")
-        return (0, df)
+        return (0, [])
 
 
-# Function that takes the fetched data and stores it into a Pandas DataFrame for SOTA activations
+# Function that takes the fetched data and builds the spot list for SOTA activations
+@perf.timed("centralise SOTA")
 def centraliseSOTA(filterSOTA=os.getenv("FILTER_SOTA")):
     logger.info("Fetching data from [https://api2.sota.org.uk/api/spots/-1/all]...")
     url = "https://api2.sota.org.uk/api/spots/-1/all"
-    data = fetchData(url)
-    df = pd.DataFrame
-    if data:
-        logger.info("Fetching successful, building DataFrame")
-
-        # Construction of DataFrame
-        df = pd.DataFrame(data)
-        df.drop(["id", "userID", "callsign", "highlightColor"], axis=1, inplace=True)
+    data = fetchData(url, schemas.SOTA.decode)
+    spots = schemas.SOTA.spots(data) if data else None
+    if spots is not None:
+        logger.info("Fetching successful, building spots...")
 
-        # This is a filter for removing certain lines form the DataFrame
+        # This is a filter for removing certain spots from the list
         if filterSOTA:
-            filterSOTA = filterSOTA.split()
-            mask = df["associationCode"].apply(
-                lambda x: any(x.startswith(grid) for grid in filterSOTA)
-            )
-            df = df[mask].reset_index(drop=True)
+            prefixes = _prefixes(filterSOTA)
+            spots = [spot for spot in spots if spot.region.startswith(prefixes)]
 
-        df.drop_duplicates(inplace=True)
+        spots = spotlib.classify(spotlib.dedupe(spots))
         logger.info("Operation complete.")
-        return (1, df)
+        return (1, spots)
     else:
-        return (0, df)
+        return (0, [])
 
 
+# Builds a spot from a WWBOTA spot, as returned by the API or the SSE stream.
+# None when the item is malformed
+def spotFromWWBOTA(item):
+    return schemas.WWBOTA.spot(item)
+
+
+@perf.timed("centralise WWBOTA")
 def centraliseWWBOTA():
     logger.info("Fetching data from [https://api.wwbota.net/spots/]...")
     url = "https://api.wwbota.net/spots/"
-    data = fetchData(url)
-    df = pd.DataFrame
+    data = fetchData(url, schemas.WWBOTA.decode)
+    spots = schemas.WWBOTA.spots(data) if data else None
 
-    if data:
-        logger.info("Fetching successful, building DataFrame")
+    if spots is not None:
+        logger.info("Fetching successful, building spots...")
 
-        # Construction of DataFrame
-        df = pd.DataFrame(data)
-        df.drop(["spotter"], axis=1, inplace=True)
-        df["reference"] = df["references"].apply(
-            lambda refs: refs[0]["reference"] if refs else None
-        )
-        df.drop("references", axis=1, inplace=True)
-        # Convert 'time' to timestamp tuple (date, time) for compatibility
-        df["timestamp"] = df["time"].apply(
-            lambda t: (t.split("T")[0], t.split("T")[1].split(".")[0])
-            if t
-            else ("", "")
-        )
-        df.drop("time", axis=1, inplace=True)
-        df.drop_duplicates(inplace=True)
+        spots = spotlib.classify(spotlib.dedupe(spots))
 
         logger.info("Operation complete.")
-        return (1, df)
+        return (1, spots)
     else:
-        return (0, df)
+        return (0, [])
+
+
+class _BOTATableParser(HTMLParser):
+    """Streaming parser for the "Forthcoming" table of the BOTA announcements
+    page. It only keeps the header and cell texts of the first table after
+    the heading and stops caring about the rest of the document."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.in_h2 = False
+        self.h2_text = ""
+        self.found = False
+        self.state = None  # None, "table", "done"
+        self.cell = None
+        self.in_head = False
+        self.headers = []
+        self.row = []
+        self.rows = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.state == "done":
+            return
+        if tag == "h2" and not self.found:
+            self.in_h2 = True
+            self.h2_text = ""
+        elif tag == "table" and self.found and self.state is None:
+            self.state = "table"
+        elif self.state == "table":
+            if tag == "thead":
+                self.in_head = True
+            elif tag == "tr":
+                self.row = []
+            elif tag in ("td", "th"):
+                self.cell = []
+
+    def handle_endtag(self, tag):
+        if self.state == "done":
+            return
+        if tag == "h2" and self.in_h2:
+            self.in_h2 = False
+            self.found = self.h2_text.strip() == "Forthcoming"
+        elif self.state == "table":
+            if tag in ("td", "th") and self.cell is not None:
+                text = "".join(self.cell).strip()
+                if self.in_head:
+                    self.headers.append(text)
+                elif tag == "td":
+                    self.row.append(text)
+                self.cell = None
+            elif tag == "thead":
+                self.in_head = False
+            elif tag == "tr" and self.row:
+                self.rows.append(self.row)
+                self.row = []
+            elif tag == "table":
+                self.state = "done"
+
+    def handle_data(self, data):
+        if self.in_h2:
+            self.h2_text += data
+        elif self.cell is not None:
+            self.cell.append(data)
+
+
+# Builds the BOTA spots from the announcements page. Returns None when the
+# "Forthcoming" table isn't in the HTML, i.e. the page needs to be rendered
+def parseBOTA(page: str) -> list[Spot] | None:
+    start = page.find("Forthcoming")
+    if start < 0:
+        return None
+    # Only the heading and the table after it need parsing
+    start = max(page.rfind("<h2", 0, start), 0)
+    end = page.find("</table>", start)
+    end = len(page) if end < 0 else end + len("</table>")
+    parser = _BOTATableParser()
+    parser.feed(page[start:end])
+    if parser.state is None:
+        return None
+
+    # Columns are looked up by header, falling back to the page's usual
+    # order: Activation, Activator, UTC
+    headers = parser.headers
+    col = {
+        name: headers.index(name) if name in headers else i
+        for i, name in enumerate(["Activation", "Activator", "UTC"])
+    }
+    return [
+        Spot(
+            "BOTA",
+            row[col["Activator"]],
+            ref_name=row[col["Activation"]].split(" by")[0],
+            timestamp=row[col["UTC"]],
+        )
+        for row in parser.rows
+        if len(row) > max(col.values())
+    ]
 
 
+# Renders the page in headless Chrome, for when plain HTTP isn't enough
+@perf.timed("centralise BOTA")
 def centraliseBOTA(url):
+    driver = None
     try:
         # Setup Chrome Driver
         options = Options()
@@ -193,44 +287,18 @@ def centraliseBOTA(url):
         )
 
         # Get the page
-        driver.get(url)
-        time.sleep(5)
-        page_source = driver.page_source
-        soup = BeautifulSoup(page_source, "html.parser")
-
-        # Fetch the table
-        forthcoming_div = soup.find("div", {"class": "view-header"}).find(  # type: ignore
-            "h2",
-            string="Forthcoming",  # type: ignore
-        )  # type: ignore
-
-        if forthcoming_div:
-            next_div = forthcoming_div.find_parent("div").find_next_sibling("div")
-            table = next_div.find("table")
-            if table:
-                headers = []
-                data = []
-                header_row = table.find("thead")
-                if header_row:
-                    headers = [th.text.strip() for th in header_row.find_all("th")]
-                rows = table.find_all("tr")
-                for row in rows:
-                    cells = row.find_all("td")
-                    row_data = [cell.text.strip() for cell in cells]
-                    if row_data:
-                        data.append(row_data)
-                if data:
-                    df = pd.DataFrame(data, columns=headers if headers else None)
-                    df = df.iloc[:, :-1]
-                    return (1, df)
-                else:
-                    df = pd.DataFrame
-                    logger.info("No data found in table.")
-                    return (0, df)
-            else:
-                logger.error("Could not find table.")
+        with perf.span("selenium BOTA"):
+            driver.get(url)
+            time.sleep(5)
+            page_source = driver.page_source
+
+        spots = parseBOTA(page_source)
+        if spots is None:
+            logger.error("Could not find the 'Forthcoming' table.")
         else:
-            logger.error("Could not find 'Forthcoming' section.")
+            if not spots:
+                logger.info("No data found in table.")
+            return (1, spots)
     except NoSuchElementException as e:
         logger.error(f"Unable to find the table or element on the page. Details: {e}")
     except TimeoutException as e:
@@ -240,51 +308,79 @@ def centraliseBOTA(url):
     except Exception as e:
         logger.error(f"An unexpected error occurred. Details: {e}")
     finally:
-        driver.quit()  # type: ignore
+        if driver is not None:
+            driver.quit()
+    return (0, [])
 
 
+# Runs in a worker process: renders the page and returns the spots as records
+def renderBOTARecords(url):
+    ok, spots = centraliseBOTA(url)
+    return ok, [spot.record() for spot in spots]
+
+
+# Renders the page in a worker process, so a hung or bloated Chrome is killed
+# with its worker instead of stalling the bot
+async def renderBOTA(url):
+    try:
+        with perf.span("render BOTA"):
+            ok, records = await pool.run(renderBOTARecords, url)
+    except JobFailed as e:
+        logger.error(f"Rendering {url} failed: {e}")
+        return (0, [])
+    return (ok, [Spot.from_record(record) for record in records])
+
+
+_bota_page = {"hash": None, "spots": []}
+
+
+# Fetches the announcements page over plain HTTP and only falls back to
+# Chrome when the table isn't in the served HTML; when the fetch itself fails
+# (DNS, timeout, 5xx) Chrome wouldn't get the page either. An unchanged page
+# (same content hash) reuses the spots of the previous fetch
+@perf.timed("fetch BOTA")
+async def fetchBOTA(url):
+    try:
+        timeout = aiohttp.ClientTimeout(total=20)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                page = await response.read()
+    except Exception as e:
+        logger.error(f"Fetching {url} failed: {e}")
+        return (0, [])
+
+    digest = hashlib.sha1(page).hexdigest()
+    if digest == _bota_page["hash"]:
+        logger.info("BOTA page unchanged, reusing the previous spots.")
+        return (1, list(_bota_page["spots"]))
+
+    with perf.span("parse BOTA"):
+        spots = parseBOTA(page.decode("utf-8", errors="replace"))
+    if spots is None:
+        logger.info("BOTA table not in the served HTML, rendering the page.")
+        return await renderBOTA(url)
+
+    _bota_page["hash"] = digest
+    _bota_page["spots"] = spots
+    if not spots:
+        # An empty table is a successful poll with no one out right now
+        logger.info("No data found in table.")
+    return (1, list(spots))
+
+
+@perf.timed("centralise LLOTA")
 def centraliseLLOTA(url):
     logger.info(f"Fetching data from [{url}]...")
-    data = fetchData(url)
-    df = pd.DataFrame
-
-    if data:
-        logger.info("Fetching successful, building DataFrame...")
-
-        df = pd.DataFrame(data)
-
-        def parse_history(history_list):
-            if isinstance(history_list, list) and history_list:
-                try:
-                    most_recent = sorted(
-                        history_list, key=lambda x: x.get("timestamp", ""), reverse=True
-                    )[0]
-                    return most_recent.get("comment"), most_recent.get("timestamp")
-                except Exception:
-                    pass
-            return None, None
-
-        extracted = df["history"].apply(lambda x: pd.Series(parse_history(x)))
-        df["comment"] = extracted[0]
-        df["timestamp"] = extracted[1]
-
-        keep_cols = [
-            "callsign",
-            "frequency",
-            "mode",
-            "reference",
-            "reference_name",
-            "country_name",
-            "comment",
-            "timestamp",
-        ]
-
-        existing_cols = [col for col in keep_cols if col in df.columns]
-        df = df[existing_cols]
-
-        df.drop_duplicates(inplace=True)
+    data = fetchData(url, schemas.LLOTA.decode)
+    spots = schemas.LLOTA.spots(data) if data else None
+
+    if spots is not None:
+        logger.info("Fetching successful, building spots...")
+
+        spots = spotlib.classify(spotlib.dedupe(spots))
         logger.info("Operation complete.")
-        return (1, df)
+        return (1, spots)
     else:
         logger.error("Failed to fetch data.")
-        return (0, df)
+        return (0, [])
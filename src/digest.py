@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import NamedTuple
+
+from bands import BAND_NAMES
+from config import CallsignMatcher
+from merge import base_call
+from status import QRT
+
+logger = logging.getLogger("BotLogger")
+
+
+class Schedule(NamedTuple):
+    """How often a chat gets its digest and which of the auto-spots go in it.
+    An empty watch list or band set keeps everything."""
+
+    interval: float
+    watch: CallsignMatcher = CallsignMatcher(())
+    bands: frozenset = frozenset()
+
+    def match(self, spot):
+        return (not self.watch or self.watch(spot.activator)) and (
+            not self.bands or spot.band in self.bands
+        )
+
+
+# Parses DIGEST_CHATS, e.g. "-100123/45:30=YO3BEE,YO8X,20m -100999" ->
+# {(-100123, 45): Schedule(1800.0, YO3BEE/YO8X, {"20m"}), (-100999, None):
+# Schedule(default)}. Intervals are in minutes; the filters after "=" are
+# callsigns and bands, and only narrow what AUTO_SPOT already lets through
+def parse_chats(value, default):
+    chats = {}
+    for item in (value or "").split():
+        schedule, _, filters = item.partition("=")
+        target, _, minutes = schedule.partition(":")
+        chat, _, thread = target.partition("/")
+        calls, bands = [], set()
+        for token in filter(None, filters.split(",")):
+            if token.lower() in BAND_NAMES:
+                bands.add(token.lower())
+            else:
+                calls.append(token.upper())
+        try:
+            interval = float(minutes) * 60 if minutes else default
+            if interval <= 0:
+                raise ValueError
+            chats[(int(chat), int(thread) if thread else None)] = Schedule(
+                interval, CallsignMatcher(calls), frozenset(bands)
+            )
+        except ValueError:
+            logger.warning(f"Ignoring invalid DIGEST_CHATS entry '{item}'.")
+    return chats
+
+
+class _Entry:
+    __slots__ = ("spot", "first", "last", "count", "freqs", "qrt")
+
+    def __init__(self, spot, now):
+        self.spot = spot
+        self.first = now
+        self.last = now
+        self.count = 1
+        self.freqs = (spot.freq_khz,)
+        self.qrt = _is_qrt(spot)
+
+    def update(self, spot, now):
+        self.spot = spot
+        self.last = now
+        self.count += 1
+        self.qrt = _is_qrt(spot)
+        # The first frequency and the last three, in the order they were used
+        khz = spot.freq_khz
+        if not math.isnan(khz) and khz != self.freqs[-1]:
+            self.freqs = self.freqs[:1] + self.freqs[1:][-2:] + (khz,)
+
+
+def _is_qrt(spot):
+    return bool(spot.qcodes & QRT)
+
+
+class _Buffer:
+    __slots__ = ("interval", "match", "started", "entries", "overflow")
+
+    def __init__(self, schedule, now):
+        self.interval = schedule.interval
+        self.match = schedule.match
+        self.started = now
+        self.entries = {}
+        self.overflow = 0
+
+
+class Digest:
+    """Collects the announcements of the chats in digest mode and sends each
+    of them one summary per interval instead of a message per spot.
+
+    `add` takes what the merger would announce, i.e. spots that already went
+    through auto-spot change detection. Entries are keyed by base callsign,
+    program and reference, so repeated announcements of one activation only
+    update its entry (latest spot, times, frequencies, QRT). Each chat only
+    keeps the spots its `Schedule` matches. At most
+    `max_entries` are kept per chat, the rest is only counted.
+
+    `render(groups, started, ended, overflow)` builds the message from the
+    entries grouped per activator, `send(key, chat_id, thread_id, text)`
+    queues it.
+    """
+
+    def __init__(self, chats, render, send, max_entries=100):
+        self.render = render
+        self.send = send
+        self.max_entries = max_entries
+        now = time.time()
+        self.buffers = {
+            chat: _Buffer(schedule, now) for chat, schedule in chats.items()
+        }
+        self.sent = 0
+
+    @property
+    def chats(self):
+        return self.buffers.keys()
+
+    def add(self, spots):
+        now = time.time()
+        for buffer in self.buffers.values():
+            entries = buffer.entries
+            for spot in spots:
+                if not buffer.match(spot):
+                    continue
+                key = (base_call(spot.activator), spot.source, spot.reference)
+                entry = entries.get(key)
+                if entry is not None:
+                    entry.update(spot, now)
+                elif len(entries) < self.max_entries:
+                    entries[key] = _Entry(spot, now)
+                else:
+                    buffer.overflow += 1
+
+    def flush(self, chat, now=None):
+        now = time.time() if now is None else now
+        buffer = self.buffers[chat]
+        entries, overflow, started = buffer.entries, buffer.overflow, buffer.started
+        buffer.entries, buffer.overflow, buffer.started = {}, 0, now
+        if not entries:
+            return
+
+        groups = {}
+        for (call, _, _), entry in entries.items():
+            groups.setdefault(call, []).append(entry)
+        text = self.render(list(groups.values()), started, now, overflow)
+        key = hashlib.sha1(f"digest:{chat}:{started}".encode()).hexdigest()
+        self.send(key, chat[0], chat[1], text)
+        self.sent += 1
+        logger.info(
+            f"Digest for {chat[0]}/{chat[1]}: {len(groups)} activators, "
+            f"{len(entries)} references."
+        )
+
+    async def run(self):
+        while True:
+            now = time.time()
+            for chat, buffer in self.buffers.items():
+                if now - buffer.started >= buffer.interval:
+                    try:
+                        self.flush(chat, now)
+                    except Exception as e:
+                        logger.error(f"Failed to send the digest to {chat}: {e}")
+            due = min(
+                (buffer.started + buffer.interval for buffer in self.buffers.values()),
+                default=now + 60,
+            )
+            await asyncio.sleep(min(max(due - time.time(), 1.0), 60.0))
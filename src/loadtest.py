@@ -0,0 +1,410 @@
+"""Load-tests the bot: runs its telegram.ext.Application against a local fake
+Bot API server and sends it commands from simulated users at increasing
+rates.
+
+Every step offers one of --rates (commands/s, Poisson arrivals from --users
+users, each writing in TOPIC_ID of a group of its own) for --step seconds.
+The fake server answers getUpdates from the queue of simulated messages and
+takes the replies in sendMessage. A --retry-after share of the sendMessage calls is
+answered with 429 RetryAfter. Upstream polls are served from memory: a
+synthetic POTA list of --spots spots, or the last response per URL of a
+--capture, after --upstream-ms of blocking, like the real requests call.
+
+For each step it reports the handler latency (message queued to first reply)
+percentiles, the throughput, the throttled and lost commands, and the
+injected 429s. The bot is saturated at the first step whose throughput falls
+below 90% of the offered rate or whose p95 goes over --slo. With
+--spots-per-minute, announcements are also pushed through the outbox at that
+rate and their delivery is reported the same way.
+
+Usage: python src/loadtest.py [--users N] [--rates 5,10,20] [--step SECONDS]
+    [--commands /get_POTA,/get_SOTA] [--retry-after SHARE] [--capture FILE]
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import random
+import time
+from collections import Counter, OrderedDict
+
+import numpy as np
+from aiohttp import web
+
+THROTTLED = "You're sending commands too fast"
+
+
+class FakeBotAPI:
+    """Just enough of the Bot API for the bot: getMe, getUpdates fed by
+    `push`, sendMessage recording the replies, and an empty success for every
+    other method."""
+
+    def __init__(self, username, retry_after=0.0, seed=0):
+        self.username = username
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.updates = []
+        self.next_update = 1
+        self.next_message = 1
+        self.arrived = asyncio.Event()
+        # chat -> {message_id: (step, queued)}, oldest first
+        self.pending = {}
+        # (step, queued, answered, throttled) per answered command
+        self.answers = []
+        # seq -> queued and (queued, delivered) of the pushed announcements
+        self.announced = {}
+        self.delivered = []
+        self.calls = Counter()
+        self.rejected = 0
+
+    def push(self, step, user, chat, thread, text):
+        message_id = self.next_message
+        self.next_message += 1
+        command = text.split()[0]
+        self.updates.append(
+            {
+                "update_id": self.next_update,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat, "type": "supergroup", "is_forum": True},
+                    "from": {"id": user, "is_bot": False, "first_name": f"U{user}"},
+                    "message_thread_id": thread,
+                    "is_topic_message": True,
+                    "text": text,
+                    "entities": [
+                        {"type": "bot_command", "offset": 0, "length": len(command)}
+                    ],
+                },
+            }
+        )
+        self.next_update += 1
+        self.pending.setdefault(chat, OrderedDict())[message_id] = (
+            step,
+            time.perf_counter(),
+        )
+        self.arrived.set()
+
+    def lost(self):
+        return Counter(
+            step for chat in self.pending.values() for step, _ in chat.values()
+        )
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        if method == "getMe":
+            return self._ok(
+                {
+                    "id": 1,
+                    "is_bot": True,
+                    "first_name": "Load",
+                    "username": self.username,
+                }
+            )
+        if method == "getUpdates":
+            return self._ok(await self._get_updates(params))
+        if method == "sendMessage":
+            if self.rng.random() < self.retry_after:
+                self.rejected += 1
+                return web.json_response(
+                    {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": "Too Many Requests: retry after 1",
+                        "parameters": {"retry_after": 1},
+                    },
+                    status=429,
+                )
+            return self._ok(self._send_message(params))
+        return self._ok(True)
+
+    def _ok(self, result):
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        if offset:
+            self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates:
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(
+                    self.arrived.wait(), float(params.get("timeout") or 0)
+                )
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[: int(params.get("limit") or 100)]
+
+    def _send_message(self, params):
+        now = time.perf_counter()
+        chat = int(params["chat_id"])
+        text = params.get("text", "")
+        if text.startswith("load #"):
+            queued = self.announced.pop(int(text.split()[1][1:]), None)
+            if queued is not None:
+                self.delivered.append((queued, now))
+        else:
+            pending = self.pending.get(chat)
+            if pending:
+                reply = params.get("reply_parameters")
+                message_id = json.loads(reply)["message_id"] if reply else None
+                if message_id in pending:
+                    step, queued = pending.pop(message_id)
+                else:
+                    step, queued = pending.popitem(last=False)[1]
+                if not pending:
+                    del self.pending[chat]
+                self.answers.append((step, queued, now, text.startswith(THROTTLED)))
+        message_id = self.next_message
+        self.next_message += 1
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat, "type": "supergroup"},
+            "text": text,
+        }
+
+
+# A POTA list like api.pota.app's, in grids starting with the FILTER_POTA
+# prefixes when there are any
+def synthetic_pota(n, prefixes):
+    rng = random.Random(42)
+    grids = [(prefix + "24")[:4] for prefix in prefixes]
+    grids = grids or ["KN24", "KN34", "JN58", "FN31"]
+    return [
+        {
+            "spotId": i,
+            "spotTime": "2026-01-01T12:00:00",
+            "activator": f"YO{i % 10}L{i}",
+            "frequency": str(rng.choice([7032, 14062, 14285, 21074])),
+            "reference": f"RO-{i:04d}",
+            "mode": rng.choice(["CW", "SSB", "FT8"]),
+            "name": "Some Park",
+            "locationDesc": "RO-BV",
+            "comments": "QRV",
+            "grid4": rng.choice(grids),
+            "expire": 600,
+        }
+        for i in range(n)
+    ]
+
+
+class Upstream:
+    """Serves the upstream polls from memory after a blocking delay."""
+
+    def __init__(self, responses, default, delay):
+        self.responses = responses
+        self.default = default
+        self.delay = delay
+        self.served = 0
+
+    def fetch(self, url, decode=None):
+        if self.delay:
+            time.sleep(self.delay)
+        self.served += 1
+        return self.responses.get(url, self.default)
+
+
+# Open loop: arrivals are due at fixed times, so a bot that blocks the event
+# loop gets them in a burst afterwards instead of slowing the users down
+async def offer(api, step, rate, duration, users, commands, thread, rng):
+    loop = asyncio.get_running_loop()
+    due = loop.time()
+    end = due + duration
+    while True:
+        due += rng.expovariate(rate)
+        if due >= end:
+            return
+        await asyncio.sleep(due - loop.time())
+        user = 1000 + rng.randrange(users)
+        api.push(step, user, -1000000000000 - user, thread, rng.choice(commands))
+
+
+async def announce(outbox, api, chat, thread, per_minute, duration):
+    loop = asyncio.get_running_loop()
+    end = loop.time() + duration
+    interval = 60.0 / per_minute
+    while loop.time() < end:
+        seq = len(api.announced) + len(api.delivered)
+        api.announced[seq] = time.perf_counter()
+        outbox.put(f"load-{seq}", chat, thread, f"load #{seq}")
+        await asyncio.sleep(interval)
+
+
+def percentiles(values):
+    if not values:
+        return (float("nan"),) * 3
+    return tuple(np.percentile(np.asarray(values) * 1000, (50, 95, 99)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--rates", default="5,10,20,40,80")
+    parser.add_argument("--step", type=float, default=20.0)
+    parser.add_argument("--commands", default="/get_POTA")
+    parser.add_argument("--retry-after", type=float, default=0.0)
+    parser.add_argument("--spots", type=int, default=300)
+    parser.add_argument("--capture")
+    parser.add_argument("--upstream-ms", type=float, default=0.0)
+    parser.add_argument("--spots-per-minute", type=float, default=0.0)
+    parser.add_argument("--poll-interval", type=float, default=3.0)
+    parser.add_argument("--slo", type=float, default=5.0)
+    parser.add_argument("--drain", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rates = [float(rate) for rate in args.rates.split(",")]
+    commands = [command.strip() for command in args.commands.split(",")]
+
+    for key, value in {
+        "TOKEN": "0:loadtest",
+        "BOT_USERNAME": "loadtest_bot",
+        "CHAT_ID": "-1000000000000",
+        "TOPIC_ID": "1",
+    }.items():
+        os.environ.setdefault(key, value)
+    os.environ["STARTUP_DELAY"] = "0"
+    os.environ["OUTBOX_PATH"] = ":memory:"
+    os.environ["REF_DB"] = ":memory:"
+    os.environ["BOARD_STATE"] = os.devnull
+    os.environ.pop("RECORD_DIR", None)
+
+    import bot
+
+    responses = {}
+    if args.capture:
+        from replay import load
+
+        for record in load(args.capture):
+            if record["kind"] == "poll":
+                responses[record["url"]] = record["data"]
+    else:
+        responses["https://api.pota.app/spot/activator"] = synthetic_pota(
+            args.spots, bot.config_store.current.default_pota
+        )
+    upstream = Upstream(responses, [], args.upstream_ms / 1000)
+    bot.dc.fetchData = upstream.fetch
+
+    async def run():
+        api = FakeBotAPI(bot.BOT_USERNAME, args.retry_after, args.seed)
+        server = web.Application()
+        server.router.add_route("POST", "/bot{token}/{method}", api.handle)
+        runner = web.AppRunner(server, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        port = runner.addresses[0][1]
+
+        bot.app = app = bot.build_app(base_url=f"http://127.0.0.1:{port}/bot")
+        rng = random.Random(args.seed)
+        steps = []
+        async with app:
+            await app.updater.start_polling(poll_interval=args.poll_interval)
+            await app.start()
+            outbox = asyncio.create_task(bot.outbox.run())
+            for step, rate in enumerate(rates):
+                started = time.perf_counter()
+                jobs = [
+                    offer(
+                        api,
+                        step,
+                        rate,
+                        args.step,
+                        args.users,
+                        commands,
+                        bot.TOPIC_ID,
+                        rng,
+                    )
+                ]
+                if args.spots_per_minute:
+                    jobs.append(
+                        announce(
+                            bot.outbox,
+                            api,
+                            bot.CHAT_ID,
+                            bot.TOPIC_ID,
+                            args.spots_per_minute,
+                            args.step,
+                        )
+                    )
+                await asyncio.gather(*jobs)
+                steps.append((started, time.perf_counter()))
+            await asyncio.sleep(args.drain)
+            outbox.cancel()
+            await app.updater.stop()
+            await app.stop()
+        await runner.cleanup()
+        return api, steps
+
+    began = time.perf_counter()
+    api, steps = asyncio.run(run())
+    wall = time.perf_counter() - began
+    report(api, steps, rates, args.slo, upstream, wall)
+
+
+def report(api, steps, rates, slo, upstream, wall):
+    lost = api.lost()
+    offered = Counter()
+    for step, *_ in api.answers:
+        offered[step] += 1
+    for step, count in lost.items():
+        offered[step] += count
+    done = sorted(answered for _, _, answered, _ in api.answers)
+
+    print(
+        f"{'rate/s':>7}{'sent':>7}{'answered':>9}{'thrpt/s':>9}{'p50 ms':>9}"
+        f"{'p95 ms':>9}{'p99 ms':>9}{'throttled':>10}{'lost':>6}"
+    )
+    saturated = None
+    for step, (rate, (started, ended)) in enumerate(zip(rates, steps)):
+        answers = [a for a in api.answers if a[0] == step]
+        p50, p95, p99 = percentiles(
+            [answered - queued for _, queued, answered, _ in answers]
+        )
+        # Replies that went out during the step, shifted by its median latency
+        # (getUpdates polling delays them all), whichever step asked for them
+        lag = 0.0 if np.isnan(p50) else p50 / 1000
+        throughput = (
+            bisect.bisect_left(done, ended + lag)
+            - bisect.bisect_left(done, started + lag)
+        ) / (ended - started)
+        print(
+            f"{rate:>7.0f}{offered[step]:>7}{len(answers):>9}{throughput:>9.1f}"
+            f"{p50:>9.0f}{p95:>9.0f}{p99:>9.0f}"
+            f"{sum(a[3] for a in answers):>10}{lost[step]:>6}"
+        )
+        rate_seen = offered[step] / (ended - started)
+        if saturated is None and (throughput < 0.9 * rate_seen or p95 > slo * 1000):
+            saturated = (rate, throughput, p95)
+
+    if api.announced or api.delivered:
+        p50, p95, p99 = percentiles(
+            [delivered - queued for queued, delivered in api.delivered]
+        )
+        print(
+            f"Announcements: {len(api.delivered)} delivered, {len(api.announced)} "
+            f"undelivered, p50 {p50:.0f} ms, p95 {p95:.0f} ms, p99 {p99:.0f} ms."
+        )
+    print(
+        f"{api.rejected} sendMessage calls answered with 429, "
+        f"{api.calls['getUpdates']} getUpdates, {upstream.served} upstream polls, "
+        f"{wall:.0f} s."
+    )
+    if saturated:
+        rate, throughput, p95 = saturated
+        print(
+            f"Saturated at {rate:.0f} commands/s: {throughput:.1f}/s answered, "
+            f"p95 {p95:.0f} ms."
+        )
+    else:
+        print(f"Not saturated up to {rates[-1]:.0f} commands/s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from functools import lru_cache
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def is_grid(text) -> bool:
+    return to_latlon(text) is not None
+
+
+# Returns the (lat, lon) centre of a 2, 4, 6 or 8 character Maidenhead locator
+@lru_cache(maxsize=65536)
+def to_latlon(grid) -> tuple[float, float] | None:
+    if not isinstance(grid, str):
+        return None
+    g = grid.strip().upper()
+    if len(g) not in (2, 4, 6, 8):
+        return None
+
+    lon, lat = -180.0, -90.0
+    lon_size, lat_size = 360.0, 180.0
+    for i in range(0, len(g), 2):
+        pair = g[i : i + 2]
+        if i == 0:
+            base, divisions = "A", 18
+        elif i == 4:
+            base, divisions = "A", 24
+        else:
+            base, divisions = "0", 10
+        x = ord(pair[0]) - ord(base)
+        y = ord(pair[1]) - ord(base)
+        if not (0 <= x < divisions and 0 <= y < divisions):
+            return None
+        lon_size /= divisions
+        lat_size /= divisions
+        lon += x * lon_size
+        lat += y * lat_size
+
+    return (lat + lat_size / 2, lon + lon_size / 2)
+
+
+# Maps a column of locators to arrays of centroid latitudes and longitudes.
+# Each distinct locator is resolved once; unknown ones come back as NaN.
+def centroids(grids) -> tuple[np.ndarray, np.ndarray]:
+    values = np.asarray(grids, dtype=object)
+    if len(values) == 0:
+        return np.empty(0), np.empty(0)
+    unique, inverse = np.unique(values.astype(str), return_inverse=True)
+    table = np.array(
+        [to_latlon(g) or (np.nan, np.nan) for g in unique], dtype=float
+    ).reshape(-1, 2)
+    return table[inverse, 0], table[inverse, 1]
+
+
+# Vectorised great-circle distance from one point to many
+def haversine_km(lat0, lon0, lats, lons) -> np.ndarray:
+    lat0, lon0 = np.radians(lat0), np.radians(lon0)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = (
+        np.sin((lats - lat0) / 2) ** 2
+        + np.cos(lat0) * np.cos(lats) * np.sin((lons - lon0) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distances_km(origin: str, grids) -> np.ndarray:
+    centre = to_latlon(origin)
+    if centre is None:
+        raise ValueError(f"Invalid grid locator '{origin}'")
+    lats, lons = centroids(grids)
+    return haversine_km(centre[0], centre[1], lats, lons)
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger("BotLogger")
+
+
+# "DL/YO3BEE/P" -> "YO3BEE", so portable and foreign-prefix calls merge
+def base_call(call: str) -> str:
+    parts = [part for part in call.upper().split("/") if part]
+    calls = [
+        part
+        for part in parts
+        if any(c.isdigit() for c in part) and any(c.isalpha() for c in part)
+    ]
+    return max(calls or parts or [""], key=len)
+
+
+class _Group:
+    __slots__ = ("spots", "freq_khz", "updated", "task")
+
+    def __init__(self, spot, now):
+        self.spots = {spot.source: spot}
+        self.freq_khz = spot.freq_khz
+        self.updated = now
+        self.task = None
+
+
+class SpotMerger:
+    """Merges notifications for one activation reported by several programs.
+
+    Spots that pass auto-spot change detection are submitted here instead of
+    being sent straight away. A spot opens a group for its base callsign and
+    frequency; spots from other sources landing in the same group within
+    `hold` seconds are folded in and the group goes out as one announcement.
+    The group stays open for `window` seconds, so a late sibling or a status
+    update re-announces the activation with all its references.
+    """
+
+    def __init__(self, send, hold=15.0, freq_window_khz=5.0, window=600.0):
+        self.send = send
+        self.hold = hold
+        self.freq_window_khz = freq_window_khz
+        self.window = window
+        self.groups = {}
+        self.merged = 0
+
+    def _find(self, call, spot, now):
+        groups = [g for g in self.groups.get(call, []) if now - g.updated <= self.window]
+        if groups:
+            self.groups[call] = groups
+        else:
+            self.groups.pop(call, None)
+        for group in groups:
+            if (
+                math.isnan(group.freq_khz)
+                or math.isnan(spot.freq_khz)
+                or abs(group.freq_khz - spot.freq_khz) <= self.freq_window_khz
+            ):
+                return group
+        return None
+
+    async def submit(self, spot):
+        if self.hold <= 0:
+            await self.send([spot])
+            return
+
+        now = time.monotonic()
+        call = base_call(spot.activator)
+        group = self._find(call, spot, now)
+        if group is None:
+            group = _Group(spot, now)
+            self.groups.setdefault(call, []).append(group)
+        else:
+            if group.task is not None and spot.source not in group.spots:
+                self.merged += 1
+            group.spots[spot.source] = spot
+            group.updated = now
+            if not math.isnan(spot.freq_khz):
+                group.freq_khz = spot.freq_khz
+
+        if group.task is None:
+            group.task = asyncio.create_task(self._flush_later(group))
+
+    async def _flush_later(self, group):
+        try:
+            await asyncio.sleep(self.hold)
+        finally:
+            group.task = None
+        spots = list(group.spots.values())
+        if len(spots) > 1:
+            logger.info(
+                f"Merged {len(spots)} spots for {spots[0].activator}: "
+                + ", ".join(f"{s.source} {s.reference}" for s in spots)
+            )
+        try:
+            await self.send(spots)
+        except Exception as e:
+            logger.error(f"Failed to send merged spot: {e}")
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+
+logger = logging.getLogger("BotLogger")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    chat_id INTEGER NOT NULL,
+    thread_id INTEGER,
+    text TEXT NOT NULL,
+    parse_mode TEXT,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',
+    done REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_state ON outbox (state, id);
+"""
+
+
+class Journal:
+    """Append-only SQLite journal of outgoing messages.
+
+    Every message is written before it is sent and marked `sent` (or `dead`
+    after too many failures) afterwards, so pending messages survive a
+    restart. The unique `key` makes enqueueing idempotent: a message whose
+    key is already in the journal, delivered or not, is ignored.
+    """
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    # Returns the row id, or None if the key was already journaled
+    def append(self, key, chat_id, thread_id, text, parse_mode="HTML"):
+        cursor = self.db.execute(
+            "INSERT OR IGNORE INTO outbox"
+            " (key, chat_id, thread_id, text, parse_mode, created)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, chat_id, thread_id, text, parse_mode, time.time()),
+        )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def pending(self):
+        return self.db.execute(
+            "SELECT id, chat_id, thread_id, text, parse_mode, attempts FROM outbox"
+            " WHERE state = 'pending' ORDER BY id"
+        ).fetchall()
+
+    def mark(self, row_id, state):
+        self.db.execute(
+            "UPDATE outbox SET state = ?, done = ? WHERE id = ?",
+            (state, time.time(), row_id),
+        )
+
+    def failed(self, row_id):
+        self.db.execute(
+            "UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", (row_id,)
+        )
+
+    # Drops finished entries older than `retention` seconds; their keys stop
+    # deduplicating after that
+    def compact(self, retention):
+        cursor = self.db.execute(
+            "DELETE FROM outbox WHERE state != 'pending' AND done < ?",
+            (time.time() - retention,),
+        )
+        if cursor.rowcount:
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return cursor.rowcount
+
+    def counts(self):
+        return dict(
+            self.db.execute("SELECT state, COUNT(*) FROM outbox GROUP BY state")
+        )
+
+
+class Outbox:
+    """Delivers journaled messages with a pool of workers.
+
+    Messages are split into one lane per (chat, thread); a lane is drained by
+    one worker at a time, in journal order, so different chats are served in
+    parallel while each chat keeps its order. A send that fails with an
+    error `retryable` accepts stays at the head of its lane and is retried
+    with backoff (or after the RetryAfter delay); any other error, or
+    `max_attempts` failures, marks it dead and the lane moves on.
+    """
+
+    def __init__(
+        self,
+        journal,
+        send,
+        workers=4,
+        interval=0.5,
+        max_attempts=20,
+        retention=172800.0,
+        retryable=lambda error: True,
+    ):
+        self.journal = journal
+        self.send = send
+        self.retryable = retryable
+        self.workers = workers
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.lanes = {}
+        self.scheduled = set()
+        self.draining = set()
+        self.ready = asyncio.Queue()
+        self.sent = 0
+        self.duplicates = 0
+        self.dead = 0
+
+    def _wake(self, lane):
+        if lane not in self.scheduled:
+            self.scheduled.add(lane)
+            self.ready.put_nowait(lane)
+
+    def _push(self, row):
+        row_id, chat_id, thread_id, text, parse_mode, attempts = row
+        lane = (chat_id, thread_id)
+        self.lanes.setdefault(lane, deque()).append(
+            [row_id, text, parse_mode, attempts]
+        )
+        self._wake(lane)
+
+    # Journals the message and queues it, unless the key was seen before
+    def put(self, key, chat_id, thread_id, text, parse_mode="HTML"):
+        row_id = self.journal.append(key, chat_id, thread_id, text, parse_mode)
+        if row_id is None:
+            self.duplicates += 1
+            logger.info(f"Skipping already journaled message {key[:12]}.")
+            return False
+        self._push((row_id, chat_id, thread_id, text, parse_mode, 0))
+        return True
+
+    async def _drain(self, lane):
+        chat_id, thread_id = lane
+        queue = self.lanes[lane]
+        while queue:
+            entry = queue[0]
+            row_id, text, parse_mode, attempts = entry
+            try:
+                await self.send(chat_id, thread_id, text, parse_mode)
+            except Exception as e:
+                entry[3] = attempts = attempts + 1
+                self.journal.failed(row_id)
+                if not self.retryable(e) or attempts >= self.max_attempts:
+                    logger.error(
+                        f"Giving up on message {row_id} after {attempts} attempts: {e}"
+                    )
+                    self.journal.mark(row_id, "dead")
+                    self.dead += 1
+                    queue.popleft()
+                    continue
+                delay = getattr(e, "retry_after", None)
+                if delay is None:
+                    delay = min(2**attempts, 300)
+                elif not isinstance(delay, (int, float)):
+                    delay = delay.total_seconds()
+                logger.warning(
+                    f"Failed to send message {row_id} (attempt {attempts}): {e}. "
+                    f"Retrying in {delay} seconds."
+                )
+                asyncio.get_running_loop().call_later(
+                    delay, self.ready.put_nowait, lane
+                )
+                return
+            self.journal.mark(row_id, "sent")
+            self.sent += 1
+            queue.popleft()
+            await asyncio.sleep(self.interval)
+        del self.lanes[lane]
+        self.scheduled.discard(lane)
+
+    async def _worker(self):
+        while True:
+            lane = await self.ready.get()
+            # A lane woken twice (a retry timer firing after a restart already
+            # woke it) is drained by one worker only
+            if lane in self.draining or lane not in self.lanes:
+                continue
+            self.draining.add(lane)
+            try:
+                await self._drain(lane)
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}")
+                self.scheduled.discard(lane)
+            finally:
+                self.draining.discard(lane)
+
+    async def _compact(self, every):
+        while True:
+            await asyncio.sleep(every)
+            removed = self.journal.compact(self.retention)
+            if removed:
+                logger.info(f"Compacted {removed} delivered messages from the outbox.")
+
+    # Runs the workers and the journal compaction until one of them fails or
+    # the outbox is cancelled, then stops the others. A new run (after a
+    # supervisor restart) picks up the lanes the previous one left
+    async def run(self, compact_every=3600.0):
+        while not self.ready.empty():
+            self.ready.get_nowait()
+        self.scheduled.clear()
+        for lane in self.lanes:
+            self._wake(lane)
+        queued = {entry[0] for lane in self.lanes.values() for entry in lane}
+        pending = [row for row in self.journal.pending() if row[0] not in queued]
+        if pending:
+            logger.info(f"Replaying {len(pending)} undelivered messages.")
+        for row in pending:
+            self._push(row)
+
+        tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        tasks.append(asyncio.create_task(self._compact(compact_every)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
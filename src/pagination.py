@@ -0,0 +1,65 @@
+import secrets
+import time
+from collections import OrderedDict
+
+
+class PageSession:
+    """A frozen list of items shown page by page. Pages are rendered on first
+    view and memoised, so later changes to the live data never shift them."""
+
+    def __init__(self, items, render, per_page, title):
+        self.items = tuple(items)
+        self.render = render
+        self.per_page = per_page
+        self.title = title
+        self.created = time.monotonic()
+        self._pages = {}
+
+    @property
+    def n_pages(self):
+        return max(1, -(-len(self.items) // self.per_page))
+
+    def page(self, n):
+        n = min(max(n, 0), self.n_pages - 1)
+        if n not in self._pages:
+            start = n * self.per_page
+            chunk = self.items[start : start + self.per_page]
+            header = (
+                f"<b><u>{self.title}</u></b> - {start + 1}-{start + len(chunk)} "
+                f"of {len(self.items)} (page {n + 1}/{self.n_pages})\n\n"
+            )
+            self._pages[n] = header + "\n\n➖➖➖\n\n".join(
+                self.render(item) for item in chunk
+            )
+        return self._pages[n]
+
+
+class PageStore:
+    """Page sessions keyed by a short random token, evicted after `ttl`
+    seconds or when more than `max_sessions` are open."""
+
+    def __init__(self, ttl=1800.0, max_sessions=500):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+    def _evict(self):
+        now = time.monotonic()
+        while self.sessions:
+            token, session = next(iter(self.sessions.items()))
+            if (
+                now - session.created <= self.ttl
+                and len(self.sessions) <= self.max_sessions
+            ):
+                break
+            del self.sessions[token]
+
+    def create(self, items, render, per_page=5, title="Results"):
+        self._evict()
+        token = secrets.token_urlsafe(6)
+        self.sessions[token] = PageSession(items, render, per_page, title)
+        return token
+
+    def get(self, token):
+        self._evict()
+        return self.sessions.get(token)
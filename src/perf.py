@@ -0,0 +1,143 @@
+import asyncio
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger("BotLogger")
+
+
+class Perf:
+    """Timing spans per stage, enabled with PERF=1.
+
+    Every span keeps its last `keep` durations for the percentiles shown by
+    /debug perf, and spans slower than `slow_ms` are logged. When disabled,
+    `span` and `timed` cost one attribute check.
+    """
+
+    def __init__(self, enabled=False, slow_ms=1000.0, keep=2048):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.keep = keep
+        self.samples = {}
+        self.counts = Counter()
+        self.started = time.time()
+
+    def record(self, name, ms):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.keep)
+        samples.append(ms)
+        self.counts[name] += 1
+        if ms >= self.slow_ms:
+            logger.warning(f"Slow {name}: {ms:.0f} ms")
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    # Decorator timing every call of a function or coroutine function
+    def timed(self, name):
+        def wrap(func):
+            if asyncio.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await func(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return wrap
+
+    # Returns (name, calls, p50, p95, p99) per stage, slowest p95 first
+    def summary(self):
+        rows = []
+        for name, samples in self.samples.items():
+            p50, p95, p99 = np.percentile(np.fromiter(samples, float), (50, 95, 99))
+            rows.append((name, self.counts[name], p50, p95, p99))
+        return sorted(rows, key=lambda row: -row[3])
+
+
+class Sampler:
+    """Statistical profiler: a background thread records the stacks of all
+    other threads every `interval` seconds. `stop` writes the stacks in the
+    collapsed "frame;frame;frame count" format read by flamegraph tools."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stacks = Counter()
+        self.thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    filename = os.path.basename(code.co_filename)
+                    stack.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        if self.running:
+            return False
+        self.stacks.clear()
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return True
+
+    # Stops sampling and dumps the stacks, returns (path, number of samples)
+    def stop(self, directory="data"):
+        if not self.running:
+            return None, 0
+        self._stop.set()
+        self.thread.join()
+        self.thread = None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, time.strftime("profile_%Y-%m-%d_%H-%M-%S.txt"))
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path, sum(self.stacks.values())
+
+
+perf = Perf(
+    enabled=os.getenv("PERF", "").lower() in ("1", "true", "yes", "on"),
+    slow_ms=float(os.getenv("PERF_SLOW_MS", "1000")),
+)
+sampler = Sampler(float(os.getenv("PERF_SAMPLE_INTERVAL", "0.01")))
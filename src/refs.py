@@ -0,0 +1,362 @@
+import asyncio
+import csv
+import io
+import logging
+import os
+import sqlite3
+import time
+
+import data_centralisation as dc
+from workers import pool
+
+logger = logging.getLogger("BotLogger")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS refs (
+    id INTEGER PRIMARY KEY,
+    program TEXT NOT NULL,
+    reference TEXT NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    region TEXT NOT NULL DEFAULT '',
+    grid TEXT NOT NULL DEFAULT '',
+    lat REAL,
+    lon REAL,
+    updated REAL NOT NULL,
+    UNIQUE (program, reference)
+);
+CREATE INDEX IF NOT EXISTS refs_reference ON refs (reference);
+CREATE VIRTUAL TABLE IF NOT EXISTS refs_fts USING fts5(
+    reference, name, region,
+    content='refs', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS refs_ai AFTER INSERT ON refs BEGIN
+    INSERT INTO refs_fts (rowid, reference, name, region)
+    VALUES (new.id, new.reference, new.name, new.region);
+END;
+CREATE TRIGGER IF NOT EXISTS refs_ad AFTER DELETE ON refs BEGIN
+    INSERT INTO refs_fts (refs_fts, rowid, reference, name, region)
+    VALUES ('delete', old.id, old.reference, old.name, old.region);
+END;
+CREATE TRIGGER IF NOT EXISTS refs_au AFTER UPDATE ON refs BEGIN
+    INSERT INTO refs_fts (refs_fts, rowid, reference, name, region)
+    VALUES ('delete', old.id, old.reference, old.name, old.region);
+    INSERT INTO refs_fts (rowid, reference, name, region)
+    VALUES (new.id, new.reference, new.name, new.region);
+END;
+CREATE TABLE IF NOT EXISTS refreshed (
+    program TEXT PRIMARY KEY,
+    at REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+"""
+
+COLUMNS = ("reference", "name", "region", "grid", "lat", "lon")
+
+
+class Source:
+    """A bulk CSV list of one program's references: where to get it, how many
+    title lines precede the header, and which CSV column feeds which of
+    COLUMNS (region may join several columns)."""
+
+    def __init__(self, url, columns, skip=0):
+        self.url = url
+        self.columns = columns
+        self.skip = skip
+
+    def rows(self, text):
+        lines = io.StringIO(text)
+        for _ in range(self.skip):
+            lines.readline()
+        for record in csv.DictReader(lines):
+            row = {}
+            for column, names in self.columns.items():
+                if isinstance(names, tuple):
+                    row[column] = ", ".join(
+                        record[name] for name in names if record.get(name)
+                    )
+                else:
+                    row[column] = record.get(names) or ""
+            if row.get("reference"):
+                yield row
+
+
+# WWBOTA and LLOTA publish no bulk list the bot knows of; their references
+# are learned from the spots (see ReferenceStore.learn) unless
+# REF_WWBOTA_SOURCE or REF_LLOTA_SOURCE points to a CSV with reference, name
+# and region columns
+SOURCES = {
+    "POTA": Source(
+        os.getenv("REF_POTA_SOURCE", "https://pota.app/all_parks_ext.csv"),
+        {
+            "reference": "reference",
+            "name": "name",
+            "region": "locationDesc",
+            "grid": "grid",
+            "lat": "latitude",
+            "lon": "longitude",
+        },
+    ),
+    "SOTA": Source(
+        os.getenv("REF_SOTA_SOURCE", "https://storage.sota.org.uk/summitslist.csv"),
+        {
+            "reference": "SummitCode",
+            "name": "SummitName",
+            "region": ("RegionName", "AssociationName"),
+            "lat": "Latitude",
+            "lon": "Longitude",
+        },
+        skip=1,
+    ),
+}
+for _program in ("WWBOTA", "LLOTA"):
+    if os.getenv(f"REF_{_program}_SOURCE"):
+        SOURCES[_program] = Source(
+            os.getenv(f"REF_{_program}_SOURCE"),
+            {"reference": "reference", "name": "name", "region": "region"},
+        )
+
+
+def read_source(url):
+    if url.startswith(("http://", "https://")):
+        response = dc.sessionRetries().get(url, timeout=60)
+        response.raise_for_status()
+        return response.content.decode("utf-8-sig", errors="replace")
+    with open(url, encoding="utf-8-sig", errors="replace") as f:
+        return f.read()
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def connect(path, timeout=5.0):
+    if path != ":memory:" and os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path, isolation_level=None, timeout=timeout)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+# Replaces the references of one program with the rows of its bulk list, in
+# one transaction on its own connection, so readers keep the old list until
+# the commit. Returns the number of references stored
+def import_rows(path, program, rows):
+    db = connect(path)
+    now = time.time()
+    try:
+        db.execute("BEGIN")
+        count = 0
+        for row in rows:
+            db.execute(
+                "INSERT INTO refs (program, reference, name, region, grid, lat, lon,"
+                " updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (program, reference) DO UPDATE SET name = excluded.name,"
+                " region = excluded.region, grid = excluded.grid, lat = excluded.lat,"
+                " lon = excluded.lon, updated = excluded.updated",
+                (
+                    program,
+                    row["reference"].strip().upper(),
+                    row.get("name", "").strip(),
+                    row.get("region", "").strip(),
+                    row.get("grid", "").strip(),
+                    _float(row.get("lat")),
+                    _float(row.get("lon")),
+                    now,
+                ),
+            )
+            count += 1
+        if not count:
+            raise ValueError(f"The {program} reference list is empty.")
+        db.execute("DELETE FROM refs WHERE program = ? AND updated < ?", (program, now))
+        db.execute(
+            "INSERT OR REPLACE INTO refreshed (program, at, count) VALUES (?, ?, ?)",
+            (program, now, count),
+        )
+        db.execute("COMMIT")
+        return count
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    finally:
+        db.close()
+
+
+# Runs in a worker process: downloads and imports one program's bulk list
+def import_source(path, program):
+    source = SOURCES[program]
+    return import_rows(path, program, source.rows(read_source(source.url)))
+
+
+class Reference:
+    __slots__ = COLUMNS + ("program",)
+
+    def __init__(self, program, reference, name, region, grid, lat, lon):
+        self.program = program
+        self.reference = reference
+        self.name = name
+        self.region = region
+        self.grid = grid
+        self.lat = lat
+        self.lon = lon
+
+
+class ReferenceStore:
+    """Local SQLite database of park, summit, bunker and lake references with
+    an FTS5 index over code, name and region.
+
+    POTA and SOTA are imported from their bulk lists by `refresh` (in a
+    worker process, on a separate connection). References seen in spots but
+    missing from the database are added by `learn`, which is how WWBOTA and
+    LLOTA references get in. The store's own connection never waits for a
+    lock, since it is used from the event loop. `enrich` fills the name,
+    region and grid of spots from the database without asking the upstream.
+    """
+
+    def __init__(self, path="data/refs.db"):
+        self.path = path
+        self.db = connect(path, timeout=0)
+        self.known = self._known()
+        self.pending = {}
+        self.learned = 0
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.known)
+
+    def _known(self):
+        return set(self.db.execute("SELECT program, reference FROM refs"))
+
+    def _rows(self, cursor):
+        return [Reference(*row) for row in cursor]
+
+    def lookup(self, reference):
+        return self._rows(
+            self.db.execute(
+                "SELECT program, reference, name, region, grid, lat, lon FROM refs"
+                " WHERE reference = ? ORDER BY program",
+                (reference.strip().upper(),),
+            )
+        )
+
+    # Full-text search over code, name and region. Every word must match,
+    # the last one as a prefix; best matches first
+    def search(self, text, n=10):
+        words = [word.replace('"', "") for word in text.split()]
+        words = [word for word in words if word]
+        if not words:
+            return []
+        query = " ".join(f'"{word}"' for word in words[:-1])
+        query += f' "{words[-1]}"*'
+        try:
+            return self._rows(
+                self.db.execute(
+                    "SELECT r.program, r.reference, r.name, r.region, r.grid, r.lat,"
+                    " r.lon FROM (SELECT rowid, bm25(refs_fts, 10.0, 5.0, 1.0) AS score"
+                    " FROM refs_fts WHERE refs_fts MATCH ? ORDER BY score LIMIT ?) f"
+                    " JOIN refs r ON r.id = f.rowid ORDER BY f.score",
+                    (query.strip(), n),
+                )
+            )
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Reference search '{text}' failed: {e}")
+            return []
+
+    # Adds the references of these spots that aren't in the database yet.
+    # While an import holds the write lock they stay queued for the next call
+    # instead of stalling the event loop. Returns how many were stored
+    def learn(self, spots):
+        for spot in spots:
+            key = (spot.source, spot.reference)
+            if spot.reference and key not in self.known and key not in self.pending:
+                self.pending[key] = (spot.ref_name, spot.region, spot.grid)
+        if not self.pending:
+            return 0
+        try:
+            self.db.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            logger.info(f"{len(self.pending)} new references queued, {e}.")
+            return 0
+        # One transaction, rolled back when it fails; the references are only
+        # known once stored
+        now = time.time()
+        try:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO refs (program, reference, name, region, grid,"
+                " updated) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (program, reference, name, region, grid, now)
+                    for (program, reference), (name, region, grid) in (
+                        self.pending.items()
+                    )
+                ],
+            )
+            self.db.execute("COMMIT")
+        except BaseException:
+            if self.db.in_transaction:
+                self.db.execute("ROLLBACK")
+            raise
+        count = len(self.pending)
+        self.known.update(self.pending)
+        self.pending = {}
+        self.learned += count
+        return count
+
+    # Fills missing names, regions and grids of spots from the database
+    def enrich(self, spots):
+        for spot in spots:
+            if spot.ref_name and spot.region and (spot.grid or spot.source != "POTA"):
+                continue
+            if (spot.source, spot.reference) not in self.known:
+                continue
+            row = self.db.execute(
+                "SELECT name, region, grid FROM refs"
+                " WHERE program = ? AND reference = ?",
+                (spot.source, spot.reference),
+            ).fetchone()
+            if row is not None:
+                spot.ref_name = spot.ref_name or row[0]
+                spot.region = spot.region or row[1]
+                spot.grid = spot.grid or row[2]
+        return spots
+
+    def refreshed(self):
+        return {
+            program: (at, count)
+            for program, at, count in self.db.execute(
+                "SELECT program, at, count FROM refreshed"
+            )
+        }
+
+    async def refresh(self, programs=None, max_age=0.0):
+        if self._lock.locked():
+            logger.info("Reference refresh already in progress, skipping.")
+            return
+        async with self._lock:
+            refreshed = self.refreshed()
+            for program in SOURCES:
+                if programs is not None and program not in programs:
+                    continue
+                at, _ = refreshed.get(program, (0.0, 0))
+                if time.time() - at < max_age:
+                    continue
+                try:
+                    count = await pool.run(
+                        import_source, self.path, program, timeout=600
+                    )
+                except Exception as e:
+                    logger.error(f"Refreshing the {program} references failed: {e}")
+                    continue
+                self.known = self._known()
+                logger.info(f"Imported {count} {program} references.")
+
+
+# Lists older than the interval (or never imported) are fetched right away
+async def refresh_job(store: ReferenceStore, interval: float):
+    while True:
+        await store.refresh(max_age=interval)
+        await asyncio.sleep(interval)
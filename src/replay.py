@@ -0,0 +1,204 @@
+"""Replays a capture recorded with RECORD_DIR through auto_spot and the WWBOTA
+event handler, with the outbox delivering into a file instead of Telegram.
+
+The replay runs on a virtual clock: asyncio timers, time.time() and
+time.monotonic() follow the capture's timeline, so the same capture always
+gives the same announcements however fast it is pushed through. --speed 1
+paces it like the original, --speed 0 (the default) runs it as fast as
+possible. Diff the --out files of two runs to see what a change does to the
+announcements.
+
+Usage: python src/replay.py CAPTURE [--speed N] [--out FILE] [--drain SECONDS]
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import selectors
+import sys
+import time
+
+
+class VirtualClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class _ClockSelector(selectors.DefaultSelector):
+    # Instead of blocking until the next timer, jumps the clock to it
+    def __init__(self, clock, speed, real_sleep):
+        super().__init__()
+        self.clock = clock
+        self.speed = speed
+        self.real_sleep = real_sleep
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if events or not timeout:
+            return events
+        self.clock.now += timeout
+        if self.speed:
+            self.real_sleep(timeout / self.speed)
+        return events
+
+
+class VirtualLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock, speed, real_sleep):
+        super().__init__(_ClockSelector(clock, speed, real_sleep))
+        self.clock = clock
+        # Epoch timestamps are too large for the default 1 ns resolution to
+        # change them, timers due "now" would never fire
+        self._clock_resolution = 1e-3
+
+    def time(self):
+        return self.clock.now
+
+
+class Upstream:
+    """Serves the recorded responses: a poll gets the latest response
+    recorded for its URL at the current (virtual) time."""
+
+    def __init__(self, records, clock):
+        self.clock = clock
+        self.polls = {}
+        self.events = []
+        for record in records:
+            if record["kind"] == "poll":
+                self.polls.setdefault(record["url"], []).append(
+                    (record["t"], record["data"])
+                )
+            elif record["kind"] == "sse":
+                self.events.append((record["t"], record["data"]))
+        self.times = {url: [t for t, _ in polls] for url, polls in self.polls.items()}
+        self.served = 0
+
+    # Captured polls are already decoded, the schemas take them as dicts
+    def fetch(self, url, decode=None):
+        i = bisect.bisect_right(self.times.get(url, []), self.clock.now)
+        if i == 0:
+            return None
+        self.served += 1
+        return self.polls[url][i - 1][1]
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda record: record["t"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture")
+    parser.add_argument("--speed", type=float, default=0.0)
+    parser.add_argument("--out", default="replay.txt")
+    parser.add_argument("--drain", type=float, default=120.0)
+    args = parser.parse_args()
+
+    records = load(args.capture)
+    if not records:
+        sys.exit(f"{args.capture} is empty")
+    start, end = records[0]["t"], records[-1]["t"] + args.drain
+
+    real_sleep, real_clock = time.sleep, time.perf_counter
+    clock = VirtualClock(start)
+    time.time = clock.time
+    time.monotonic = clock.time
+
+    for key, value in {
+        "TOKEN": "0:replay",
+        "BOT_USERNAME": "replay",
+        "CHAT_ID": "0",
+        "TOPIC_ID": "0",
+    }.items():
+        os.environ.setdefault(key, value)
+    os.environ["STARTUP_DELAY"] = "0"
+    os.environ["OUTBOX_PATH"] = ":memory:"
+    os.environ["REF_DB"] = ":memory:"
+    os.environ["BOARD_STATE"] = os.devnull
+    os.environ.pop("RECORD_DIR", None)
+
+    import bot
+
+    upstream = Upstream(records, clock)
+    bot.dc.fetchData = upstream.fetch
+
+    out = open(args.out, "w", encoding="utf-8")
+    sent = []
+
+    def write(kind, chat_id, thread_id, text):
+        sent.append(kind)
+        out.write(
+            f"{clock.now - start:10.1f} {kind} {chat_id}/{thread_id} "
+            f"{json.dumps(text, ensure_ascii=False)}\n"
+        )
+
+    async def sink(chat_id, thread_id, text, parse_mode):
+        write("send", chat_id, thread_id, text)
+
+    class FakeBot:
+        async def send_message(self, chat_id, message_thread_id, text, **kwargs):
+            write("board", chat_id, message_thread_id, text)
+            return type("Message", (), {"message_id": len(sent)})()
+
+        async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+            write("edit", chat_id, message_id, text)
+
+        async def pin_chat_message(self, **kwargs):
+            pass
+
+    fake_app = type("App", (), {"bot": FakeBot()})()
+    bot.outbox.send = sink
+
+    async def feed_events():
+        for t, data in upstream.events:
+            await asyncio.sleep(max(0.0, t - clock.now))
+            try:
+                await bot.handle_wwbota_event(data)
+            except json.JSONDecodeError:
+                pass
+            except Exception as e:
+                bot.logger.error(f"WWBOTA replay processing error: {e}")
+
+    async def run():
+        asyncio.create_task(bot.outbox.run())
+        asyncio.create_task(bot.scheduler(fake_app))
+        if bot.LIVE_BOARD:
+            asyncio.create_task(bot.board_job(fake_app))
+        if bot.digest.chats:
+            asyncio.create_task(bot.digest.run())
+        if bot.config_store.current.watch:
+            asyncio.create_task(feed_events())
+        await asyncio.sleep(end - clock.now)
+
+    loop = VirtualLoop(clock, args.speed, real_sleep)
+    began = real_clock()
+    try:
+        loop.run_until_complete(run())
+        wall = real_clock() - began
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    finally:
+        loop.close()
+        out.close()
+
+    print(
+        f"Replayed {end - start:.0f} s of traffic ({len(records)} records, "
+        f"{upstream.served} polls served, {len(upstream.events)} stream events) "
+        f"in {wall:.2f} s, {len(records) / wall:.0f} records/s."
+    )
+    print(
+        f"{sent.count('send')} messages, {len(sent) - sent.count('send')} board "
+        f"updates written to {args.out}."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import inspect
+import logging
+import operator
+
+import msgspec
+
+from spot import Spot
+
+# Decodes JSON into plain dicts and lists, for payloads without a schema
+loads = msgspec.json.decode
+
+logger = logging.getLogger("BotLogger")
+
+_SPOT_ARGS = frozenset(inspect.signature(Spot).parameters)
+
+# Any JSON scalar; an item holding an object or array in one of these fields
+# is malformed
+Scalar = str | int | float | bool | None
+
+
+def _field(key):
+    return msgspec.field(default=None, name=key)
+
+
+class POTASpot(msgspec.Struct):
+    activator: Scalar = None
+    reference: Scalar = None
+    frequency: Scalar = None
+    mode: Scalar = None
+    comment: Scalar = _field("comments")
+    ref_name: Scalar = _field("name")
+    region: Scalar = _field("locationDesc")
+    grid: Scalar = _field("grid4")
+    expire: Scalar = None
+    timestamp: Scalar = _field("spotTime")
+
+
+class SOTASpot(msgspec.Struct):
+    activator: Scalar = _field("activatorCallsign")
+    reference: Scalar = _field("summitCode")
+    frequency: Scalar = None
+    mode: Scalar = None
+    comment: Scalar = _field("comments")
+    ref_name: Scalar = _field("summitDetails")
+    region: Scalar = _field("associationCode")
+    activator_name: Scalar = _field("activatorName")
+    timestamp: Scalar = _field("timeStamp")
+
+
+class WWBOTAReference(msgspec.Struct):
+    reference: Scalar = None
+
+
+class WWBOTASpot(msgspec.Struct):
+    activator: Scalar = _field("call")
+    frequency: Scalar = _field("freq")
+    mode: Scalar = None
+    comment: Scalar = None
+    status: Scalar = _field("type")
+    timestamp: Scalar = _field("time")
+    references: list[WWBOTAReference] | None = None
+
+
+class LLOTAHistory(msgspec.Struct):
+    comment: Scalar = None
+    timestamp: Scalar = None
+
+
+class LLOTASpot(msgspec.Struct):
+    activator: Scalar = _field("callsign")
+    reference: Scalar = None
+    frequency: Scalar = None
+    mode: Scalar = None
+    ref_name: Scalar = _field("reference_name")
+    region: Scalar = _field("country_name")
+    history: list[LLOTAHistory] | None = None
+
+
+class Schema:
+    """Declared shape of the spot objects of one source, as a msgspec Struct
+    holding only the keys the bot reads. The poll is decoded straight into a
+    list of these, so everything else in the payload (spotter, grid6,
+    invalid, ...) is skipped by the decoder and never built as Python
+    objects.
+
+    Struct fields are named after the Spot arguments they fill; `derived`,
+    if given, takes the struct and returns the Spot arguments of the other
+    fields. Items that aren't objects, have no activator or hold a container
+    where a scalar is expected are dropped and counted in `rejected`.
+    """
+
+    def __init__(self, source, struct, derived=None):
+        self.source = source
+        self.struct = struct
+        self.derived = derived
+        self.rejected = 0
+        self._decoder = msgspec.json.Decoder(list[struct])
+        self._args = tuple(
+            name
+            for name in struct.__struct_fields__
+            if name != "activator" and name in _SPOT_ARGS
+        )
+        self._build = self._builder()
+
+    # Decodes a poll into structs. A payload that doesn't fit the schema as a
+    # whole (an error object, one malformed item) is decoded generically and
+    # left to `spots`. Raises ValueError when the body isn't JSON
+    def decode(self, body):
+        try:
+            return self._decoder.decode(body)
+        except msgspec.ValidationError:
+            return loads(body)
+
+    def _builder(self):
+        source, derived = self.source, self.derived
+        args = self._args
+        values = operator.attrgetter(*args)
+
+        def build(item):
+            activator = item.activator
+            if not activator or activator.__class__ is not str:
+                return None
+            kwargs = dict(zip(args, values(item)))
+            if derived is not None:
+                kwargs.update(derived(item))
+            return Spot(source, activator, **kwargs)
+
+        return build
+
+    def _convert(self, item):
+        try:
+            return msgspec.convert(item, self.struct)
+        except msgspec.ValidationError:
+            return None
+
+    # Builds one spot from a decoded object, None when it is malformed
+    def spot(self, item) -> Spot | None:
+        item = self._convert(item)
+        spot = self._build(item) if item is not None else None
+        if spot is None:
+            self.rejected += 1
+        return spot
+
+    # Builds the spots of a decoded poll, None when it isn't a list of spots.
+    # Takes the structs of `decode` or plain dicts (captures, tests)
+    def spots(self, data) -> list[Spot] | None:
+        if data.__class__ is not list:
+            self.rejected += 1
+            logger.error(f"Unexpected {self.source} payload: {type(data).__name__}")
+            return None
+        items = data
+        if data and data[0].__class__ is not self.struct:
+            try:
+                items = msgspec.convert(data, list[self.struct])
+            except msgspec.ValidationError:
+                items = [item for item in map(self._convert, data) if item is not None]
+        spots = [spot for spot in map(self._build, items) if spot is not None]
+        self.rejected += len(data) - len(spots)
+        return spots
+
+
+# LLOTA keeps the comments of a spot in its history, the latest one wins
+def _llota_history(item):
+    if item.history:
+        try:
+            latest = max(item.history, key=lambda entry: entry.timestamp or "")
+            return {"comment": latest.comment, "timestamp": latest.timestamp}
+        except TypeError:
+            pass
+    return {}
+
+
+def _wwbota_reference(item):
+    return {"reference": item.references[0].reference if item.references else ""}
+
+
+POTA = Schema("POTA", POTASpot)
+SOTA = Schema("SOTA", SOTASpot)
+WWBOTA = Schema("WWBOTA", WWBOTASpot, derived=_wwbota_reference)
+LLOTA = Schema("LLOTA", LLOTASpot, derived=_llota_history)
@@ -0,0 +1,70 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9/]+")
+
+
+def normalize(text) -> str:
+    text = unicodedata.normalize("NFKD", str(text).upper())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+# Every word is padded with spaces so that prefixes and suffixes get their own
+# trigrams, e.g. "YO3" -> {"  Y", " YO", "YO3", "O3 "}
+def trigrams(text) -> set[str]:
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i : i + 3])
+    return grams
+
+
+class TrigramIndex:
+    """Inverted trigram index over one or more text fields per document.
+
+    Each (document, field) pair is scored with the Dice coefficient between its
+    trigrams and the query's, and a document scores as its best field. Posting
+    lists are NumPy arrays so a query is one concatenate + bincount.
+    """
+
+    def __init__(self, fields: list[list[str]]):
+        self.n_docs = len(fields[0]) if fields else 0
+        self.n_fields = len(fields)
+        sizes = np.zeros(self.n_docs * self.n_fields, dtype=np.int32)
+        postings = defaultdict(list)
+
+        for f, column in enumerate(fields):
+            for doc, text in enumerate(column):
+                entry = doc * self.n_fields + f
+                grams = trigrams(text) if isinstance(text, str) else set()
+                sizes[entry] = len(grams)
+                for gram in grams:
+                    postings[gram].append(entry)
+
+        self.sizes = sizes
+        self.postings = {
+            gram: np.asarray(entries, dtype=np.int32)
+            for gram, entries in postings.items()
+        }
+
+    def query(self, text: str, n: int = 10, min_score: float = 0.3):
+        grams = trigrams(text)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return []
+
+        hits = np.bincount(np.concatenate(lists), minlength=len(self.sizes))
+        dice = 2.0 * hits / (len(grams) + np.maximum(self.sizes, 1))
+        scores = dice.reshape(self.n_docs, self.n_fields).max(axis=1)
+
+        candidates = np.flatnonzero(scores >= min_score)
+        if len(candidates) > n:
+            top = np.argpartition(scores[candidates], -n)[-n:]
+            candidates = candidates[top]
+        order = np.argsort(-scores[candidates], kind="stable")
+        return [(int(doc), float(scores[doc])) for doc in candidates[order]]
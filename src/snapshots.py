@@ -0,0 +1,95 @@
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("BotLogger")
+
+
+class SnapshotStore:
+    """Latest spots per source, kept with their rendered inline results.
+
+    `render(spot)` is called once per spot when a snapshot is stored, so
+    answering a query is only a substring scan over precomputed keys. Query
+    answers are cached for `ttl` seconds and dropped whenever a snapshot
+    changes.
+    """
+
+    def __init__(self, render, ttl=10.0, max_cached=256, stream_ttl=3600.0):
+        self.render = render
+        self.ttl = ttl
+        self.max_cached = max_cached
+        self.stream_ttl = stream_ttl
+        self.sources = {}
+        self.streamed = {}
+        self.version = 0
+        self._cache = OrderedDict()
+
+    def _entries(self, spots):
+        entries = []
+        for spot in spots:
+            key = " ".join(
+                (
+                    spot.activator,
+                    spot.reference,
+                    spot.ref_name,
+                    spot.region,
+                    spot.band or "",
+                    spot.mode,
+                    spot.source,
+                )
+            ).upper()
+            try:
+                entries.append((key, spot, self.render(spot)))
+            except Exception as e:
+                logger.error(f"Failed to render {spot}: {e}")
+        return entries
+
+    def _changed(self):
+        self.version += 1
+        self._cache.clear()
+
+    # Replaces the snapshot of a polled source
+    def update(self, source, spots):
+        self.sources[source] = (time.time(), self._entries(spots))
+        self._changed()
+
+    # Adds a spot coming from a stream (WWBOTA SSE), one entry per activator
+    def upsert(self, spot):
+        now = time.time()
+        streamed = self.streamed.setdefault(spot.source, {})
+        streamed[spot.activator] = (now, spot)
+        for call in [c for c, (t, _) in streamed.items() if now - t > self.stream_ttl]:
+            del streamed[call]
+        self.sources[spot.source] = (
+            now,
+            self._entries(s for _, s in streamed.values()),
+        )
+        self._changed()
+
+    def spots(self, source):
+        return [spot for _, spot, _ in self.sources.get(source, (0, []))[1]]
+
+    def cached(self, query):
+        hit = self._cache.get(query)
+        if hit and hit[0] > time.monotonic():
+            self._cache.move_to_end(query)
+            return hit[1]
+        return None
+
+    def store(self, query, results):
+        self._cache[query] = (time.monotonic() + self.ttl, results)
+        self._cache.move_to_end(query)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    # Returns the rendered results of the spots matching every word of the query
+    def search(self, query, limit=50):
+        words = query.upper().split()
+        results = []
+        for _, entries in self.sources.values():
+            for key, _, rendered in entries:
+                if all(word in key for word in words):
+                    results.append(rendered)
+                    if len(results) >= limit:
+                        return results
+        return results
@@ -0,0 +1,175 @@
+import numpy as np
+
+import bands
+import maidenhead as mh
+from status import qcodes_array
+
+
+class Spot:
+    """One spot from any of the five sources, in a single compact schema.
+
+    ref_name is the park/summit/lake/beach name, region is the POTA location,
+    SOTA association or LLOTA country, grid is only known for POTA. event is
+    the status transition the spot was announced for, set by the auto-spot
+    tracking.
+    """
+
+    __slots__ = (
+        "source",
+        "activator",
+        "reference",
+        "ref_name",
+        "region",
+        "grid",
+        "activator_name",
+        "frequency",
+        "freq_khz",
+        "band",
+        "mode",
+        "mode_family",
+        "comment",
+        "status",
+        "qcodes",
+        "timestamp",
+        "expire",
+        "distance",
+        "event",
+    )
+
+    def __init__(
+        self,
+        source,
+        activator,
+        reference="",
+        frequency="",
+        mode="",
+        comment="",
+        ref_name="",
+        region="",
+        grid="",
+        activator_name="",
+        status="",
+        timestamp="",
+        expire=None,
+    ):
+        self.source = source
+        self.activator = activator or ""
+        self.reference = reference or ""
+        self.ref_name = ref_name or ""
+        self.region = region or ""
+        self.grid = grid or ""
+        self.activator_name = activator_name or ""
+        self.frequency = "" if frequency is None else str(frequency)
+        self.freq_khz = np.nan
+        self.band = None
+        self.mode = mode or ""
+        self.mode_family = bands.mode_family(mode)
+        self.comment = comment or ""
+        self.status = status or ""
+        self.qcodes = 0
+        self.timestamp = timestamp or ""
+        self.expire = expire
+        self.distance = None
+        self.event = None
+
+    def key(self):
+        return (
+            self.source,
+            self.activator,
+            self.reference,
+            self.frequency,
+            self.mode,
+            self.comment,
+            self.timestamp,
+        )
+
+    # The constructor arguments as a plain tuple, compact to pickle between
+    # processes; from_record rebuilds the spot
+    def record(self):
+        return (
+            self.source,
+            self.activator,
+            self.reference,
+            self.frequency,
+            self.mode,
+            self.comment,
+            self.ref_name,
+            self.region,
+            self.grid,
+            self.activator_name,
+            self.status,
+            self.timestamp,
+            self.expire,
+        )
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(*record)
+
+    def __repr__(self):
+        return (
+            f"Spot({self.source}, {self.activator}, {self.reference}, "
+            f"{self.frequency}, {self.mode})"
+        )
+
+
+# Fills freq_khz and band for a whole batch with one vectorised band lookup,
+# and the Q-codes of the status and comment
+def classify(spots: list[Spot]) -> list[Spot]:
+    if not spots:
+        return spots
+    khz = np.fromiter(
+        (bands.to_khz(spot.frequency) or np.nan for spot in spots),
+        dtype=float,
+        count=len(spots),
+    )
+    names = bands.classify_bands(khz)
+    codes = qcodes_array(f"{spot.status} {spot.comment}" for spot in spots)
+    for spot, value, band, mask in zip(spots, khz.tolist(), names, codes.tolist()):
+        spot.freq_khz = value
+        spot.band = band
+        spot.qcodes = mask
+    return spots
+
+
+def dedupe(spots: list[Spot]) -> list[Spot]:
+    seen = set()
+    unique = []
+    for spot in spots:
+        key = spot.key()
+        if key not in seen:
+            seen.add(key)
+            unique.append(spot)
+    return unique
+
+
+# Keeps spots on one of the given bands and in one of the given modes or mode
+# families; empty selections don't filter
+def filter_band_mode(spots: list[Spot], bands=(), modes=()) -> list[Spot]:
+    if bands:
+        spots = [spot for spot in spots if spot.band in bands]
+    if modes:
+        spots = [
+            spot
+            for spot in spots
+            if spot.mode.upper() in modes or spot.mode_family in modes
+        ]
+    return spots
+
+
+# Fills distance (km from the origin grid), keeps spots within radius_km if
+# given and sorts by distance; spots without a known grid go last
+def filter_near(spots: list[Spot], origin: str, radius_km=None) -> list[Spot]:
+    if not spots:
+        return spots
+    distance = np.round(mh.distances_km(origin, [spot.grid for spot in spots]))
+    for spot, value in zip(spots, distance.tolist()):
+        spot.distance = None if np.isnan(value) else value
+    if radius_km is not None:
+        spots = [
+            spot
+            for spot in spots
+            if spot.distance is not None and spot.distance <= radius_km
+        ]
+    return sorted(spots, key=lambda s: (s.distance is None, s.distance or 0))
+
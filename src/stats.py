@@ -0,0 +1,127 @@
+import logging
+import time
+from collections import Counter, deque
+
+logger = logging.getLogger("BotLogger")
+
+DIMENSIONS = ("activators", "references", "bands", "modes")
+
+# Window name -> (span in seconds, bucket size in seconds)
+WINDOWS = {
+    "1h": (3600, 60),
+    "24h": (86400, 900),
+    "7d": (604800, 3600),
+}
+
+
+class _Window:
+    """Sliding window made of time buckets with running totals.
+
+    Adding an event touches one bucket and the totals; expiring a bucket
+    subtracts its counts from the totals, so queries never re-sum history.
+    """
+
+    def __init__(self, span, bucket):
+        self.span = span
+        self.bucket = bucket
+        self.buckets = deque()
+        self.totals = {dim: Counter() for dim in DIMENSIONS}
+
+    def add(self, now, dim, key):
+        start = now - now % self.bucket
+        if not self.buckets or self.buckets[-1][0] != start:
+            self.buckets.append((start, {d: Counter() for d in DIMENSIONS}))
+        self.buckets[-1][1][dim][key] += 1
+        self.totals[dim][key] += 1
+
+    def expire(self, now):
+        cutoff = now - self.span
+        while self.buckets and self.buckets[0][0] + self.bucket <= cutoff:
+            _, counts = self.buckets.popleft()
+            for dim, counter in counts.items():
+                totals = self.totals[dim]
+                for key, count in counter.items():
+                    totals[key] -= count
+                    if totals[key] <= 0:
+                        del totals[key]
+
+
+class SpotStats:
+    """Incremental spot statistics fed by the auto-spot pipeline.
+
+    An activation (activator + reference) is counted once when it first shows
+    up, band/mode counts are bumped whenever an activator changes band or mode.
+    The "now" view holds the band/mode of every activator seen within
+    `live_ttl` seconds.
+    """
+
+    def __init__(self, live_ttl=1800):
+        self.windows = {name: _Window(*spec) for name, spec in WINDOWS.items()}
+        self.live_ttl = live_ttl
+        self.live = {"bands": Counter(), "modes": Counter()}
+        self.seen = {}
+        self.started = time.time()
+        self._last_prune = 0.0
+
+    def _count(self, now, dim, key):
+        for window in self.windows.values():
+            window.add(now, dim, key)
+
+    def _live_move(self, dim, old, new):
+        if old == new:
+            return
+        if old:
+            self.live[dim][old] -= 1
+            if self.live[dim][old] <= 0:
+                del self.live[dim][old]
+        if new:
+            self.live[dim][new] += 1
+
+    def observe(self, source, activator, reference, band, mode, now=None):
+        now = time.time() if now is None else now
+        mode = str(mode).upper() if mode else None
+        key = (source, activator)
+        prev = self.seen.get(key)
+        self.seen[key] = (reference, band, mode, now)
+
+        if prev is None or prev[0] != reference:
+            self._count(now, "activators", activator)
+            self._count(now, "references", reference)
+        if prev is None or prev[0] != reference or prev[1] != band:
+            if band:
+                self._count(now, "bands", band)
+        if prev is None or prev[0] != reference or prev[2] != mode:
+            if mode:
+                self._count(now, "modes", mode)
+
+        self._live_move("bands", prev[1] if prev else None, band)
+        self._live_move("modes", prev[2] if prev else None, mode)
+
+        if now - self._last_prune >= 60:
+            self.prune(now)
+
+    def prune(self, now=None):
+        now = time.time() if now is None else now
+        self._last_prune = now
+        cutoff = now - self.live_ttl
+        stale = [key for key, value in self.seen.items() if value[3] < cutoff]
+        for key in stale:
+            _, band, mode, _ = self.seen.pop(key)
+            self._live_move("bands", band, None)
+            self._live_move("modes", mode, None)
+        for window in self.windows.values():
+            window.expire(now)
+
+    def top(self, dim, window="24h", n=10, now=None):
+        if window == "now":
+            if dim not in self.live:
+                raise ValueError("'now' is only available for bands and modes")
+            self.prune(now)
+            return self.live[dim].most_common(n)
+        if window not in self.windows:
+            raise ValueError(f"Unknown window '{window}'")
+        if dim not in DIMENSIONS:
+            raise ValueError(f"Unknown statistic '{dim}'")
+        w = self.windows[window]
+        w.expire(time.time() if now is None else now)
+        return w.totals[dim].most_common(n)
@@ -0,0 +1,74 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# Q-code bits of a spot, see qcodes
+QRV, QSY, QRT = 1, 2, 4
+
+# Activator states. An activator without state (never seen, or its state
+# expired in the ActivatorState) is announced as new on its next spot
+SPOTTED, ON_AIR, MOVED, OFF_AIR = "spotted", "qrv", "qsy", "qrt"
+
+# Events returned by step. NEW and REFERENCE are new activations, the others
+# are updates of a known one
+NEW, REFERENCE = "new", "reference"
+
+# Whole tokens only: "QRT", "qrt.", "QRV/QSY" count, "SQRT" or "QRTX" don't
+_QCODE = re.compile(r"(?<![A-Z0-9])(QRV|QSY|QRT)(?![A-Z0-9])", re.IGNORECASE)
+_BITS = {"QRV": QRV, "QSY": QSY, "QRT": QRT}
+
+
+@lru_cache(maxsize=8192)
+def qcodes(text: str) -> int:
+    mask = 0
+    for code in _QCODE.findall(text):
+        mask |= _BITS[code.upper()]
+    return mask
+
+
+# qcodes over a whole snapshot, as a uint8 array of bitmasks
+def qcodes_array(texts) -> np.ndarray:
+    texts = list(texts)
+    return np.fromiter(map(qcodes, texts), dtype=np.uint8, count=len(texts))
+
+
+# The state a spot's Q-codes put the activator in, None when it has none.
+# QRT wins over QSY, QSY over QRV
+def state_of(mask: int) -> str | None:
+    if mask & QRT:
+        return OFF_AIR
+    if mask & QSY:
+        return MOVED
+    if mask & QRV:
+        return ON_AIR
+    return None
+
+
+# Transitions that are announced; any other change of state is recorded
+# silently (e.g. "QRV" after a QSY, or a repeated QRT)
+NOTIFY = {
+    SPOTTED: {ON_AIR, MOVED, OFF_AIR},
+    ON_AIR: {MOVED, OFF_AIR},
+    MOVED: {OFF_AIR},
+    OFF_AIR: {ON_AIR, MOVED},
+}
+
+
+# Advances the state machine of one activator. `entry` is the stored
+# (reference, kHz, state) or None, a move of at least `min_qsy_khz` counts as
+# a QSY. Returns the new entry and the event to announce, or None
+def step(entry, spot, min_qsy_khz):
+    state = state_of(spot.qcodes)
+    if entry is None:
+        return (spot.reference, spot.freq_khz, state or SPOTTED), NEW
+    reference, khz, current = entry
+    if reference != spot.reference:
+        return (spot.reference, spot.freq_khz, state or SPOTTED), REFERENCE
+    if abs(khz - spot.freq_khz) >= min_qsy_khz:
+        state = OFF_AIR if state == OFF_AIR else MOVED
+        return (reference, spot.freq_khz, state), state
+    if state is None or state == current:
+        return entry, None
+    event = state if state in NOTIFY[current] else None
+    return (reference, spot.freq_khz, state), event
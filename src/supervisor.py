@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from aiohttp import web
+
+logger = logging.getLogger("BotLogger")
+
+
+class TaskInfo:
+    __slots__ = (
+        "name",
+        "state",
+        "restarts",
+        "started",
+        "beat",
+        "stale_after",
+        "last_error",
+        "task",
+    )
+
+    def __init__(self, name, stale_after):
+        self.name = name
+        self.state = "starting"
+        self.restarts = 0
+        self.started = time.monotonic()
+        self.beat = self.started
+        self.stale_after = stale_after
+        self.last_error = None
+        self.task = None
+
+    def stale(self, now):
+        return (
+            self.state == "running"
+            and self.stale_after is not None
+            and now - self.beat > self.stale_after
+        )
+
+
+class Supervisor:
+    """Runs the background tasks, restarts them with backoff when they fail
+    and watches that they and the event loop keep making progress.
+
+    Tasks report progress with `beat(name)`; a task with a `stale_after` whose
+    last beat is older than that is cancelled and restarted. Pollers report
+    `success(source)` after every good poll, for /readyz. A thread watches the
+    loop itself: if it doesn't tick for `stall_after` seconds, the stack of
+    the blocked main thread is logged.
+    """
+
+    def __init__(self, stall_after=10.0, max_backoff=300.0):
+        self.stall_after = stall_after
+        self.max_backoff = max_backoff
+        self.tasks = {}
+        self.sources = {}
+        self.loop_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._tick = time.monotonic()
+        self._thread = None
+
+    def beat(self, name):
+        info = self.tasks.get(name)
+        if info is not None:
+            info.beat = time.monotonic()
+
+    def success(self, source):
+        self.sources[source] = time.time()
+
+    async def supervise(self, name, factory, stale_after=None):
+        info = self.tasks[name] = TaskInfo(name, stale_after)
+        backoff = 1.0
+        while True:
+            info.state = "running"
+            info.started = info.beat = time.monotonic()
+            info.task = asyncio.ensure_future(factory())
+            try:
+                await info.task
+            except asyncio.CancelledError:
+                if info.state != "stale":
+                    info.task.cancel()
+                    info.state = "stopped"
+                    raise
+                info.last_error = "no progress, cancelled by the watchdog"
+            except Exception as e:
+                info.last_error = f"{type(e).__name__}: {e}"
+                logger.error(f"Task {name} failed: {info.last_error}")
+            else:
+                info.state = "finished"
+                logger.info(f"Task {name} finished.")
+                return
+
+            # A task that ran for a while before failing starts over from the
+            # shortest delay
+            if time.monotonic() - info.started > 60:
+                backoff = 1.0
+            info.state = "restarting"
+            info.restarts += 1
+            logger.warning(f"Restarting task {name} in {backoff:.0f} seconds.")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def watchdog(self, interval=1.0):
+        self._start_stall_thread()
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self._tick = now
+            self.loop_lag = max(0.0, now - before - interval)
+            self.max_lag = max(self.max_lag, self.loop_lag)
+            for info in self.tasks.values():
+                if info.stale(now) and info.task is not None:
+                    logger.warning(
+                        f"Task {info.name} made no progress for "
+                        f"{now - info.beat:.0f} seconds, restarting it."
+                    )
+                    info.state = "stale"
+                    info.task.cancel()
+
+    def _start_stall_thread(self):
+        if self._thread is not None:
+            return
+        main = threading.main_thread().ident
+        self._tick = time.monotonic()
+
+        def run():
+            reported = False
+            while True:
+                time.sleep(1.0)
+                blocked = time.monotonic() - self._tick
+                if blocked > self.stall_after and not reported:
+                    reported = True
+                    self.stalls += 1
+                    frame = sys._current_frames().get(main)
+                    stack = "".join(traceback.format_stack(frame)) if frame else ""
+                    logger.warning(
+                        f"Event loop blocked for {blocked:.0f} seconds in:\n{stack}"
+                    )
+                elif blocked <= self.stall_after:
+                    reported = False
+
+        self._thread = threading.Thread(target=run, name="watchdog", daemon=True)
+        self._thread.start()
+
+    def report(self, ready_sources=(), ready_max_age=600.0):
+        now, wall = time.monotonic(), time.time()
+        tasks = {
+            info.name: {
+                "state": info.state,
+                "restarts": info.restarts,
+                "heartbeat_age": round(now - info.beat, 1),
+                "stale": info.stale(now),
+                "last_error": info.last_error,
+            }
+            for info in self.tasks.values()
+        }
+        sources = {
+            source: round(wall - t, 1) for source, t in sorted(self.sources.items())
+        }
+        blocked = now - self._tick
+        alive = blocked <= self.stall_after and all(
+            task["state"] in ("running", "finished") and not task["stale"]
+            for task in tasks.values()
+        )
+        ready = alive and all(
+            sources.get(source, float("inf")) <= ready_max_age
+            for source in ready_sources
+        )
+        return {
+            "alive": alive,
+            "ready": ready,
+            "loop_lag": round(self.loop_lag, 3),
+            "max_loop_lag": round(self.max_lag, 3),
+            "loop_stalls": self.stalls,
+            "tasks": tasks,
+            "last_success_age": sources,
+        }
+
+
+# Serves /healthz (liveness) and /readyz (liveness plus a recent successful
+# poll of every source in ready_sources) as JSON, 503 when failing
+async def serve_health(supervisor, host, port, ready_sources=(), ready_max_age=600.0):
+    async def healthz(request):
+        report = supervisor.report(ready_sources, ready_max_age)
+        return web.json_response(report, status=200 if report["alive"] else 503)
+
+    async def readyz(request):
+        report = supervisor.report(ready_sources, ready_max_age)
+        return web.json_response(report, status=200 if report["ready"] else 503)
+
+    server = web.Application()
+    server.router.add_get("/healthz", healthz)
+    server.router.add_get("/readyz", readyz)
+    runner = web.AppRunner(server, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.error(f"Could not start the health endpoint on {host}:{port}: {e}")
+        await runner.cleanup()
+        return
+    logger.info(f"Health endpoint listening on http://{host}:{port}/healthz")
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import math
+import time
+from collections import Counter, OrderedDict, deque
+
+logger = logging.getLogger("BotLogger")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = now
+
+    # Takes one token, returns 0 on success or the seconds until one is free
+    def take(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FairLimiter:
+    """Runs at most `limit` jobs at once. Waiting jobs are kept in one queue
+    per user and served round-robin, so a user with many queued commands
+    can't starve the others."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.waiting = OrderedDict()
+
+    def queued(self, user=None):
+        if user is None:
+            return sum(len(q) for q in self.waiting.values())
+        return len(self.waiting.get(user, ()))
+
+    async def acquire(self, user):
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(user, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            queue = self.waiting.get(user)
+            if queue and future in queue:
+                queue.remove(future)
+                if not queue:
+                    del self.waiting[user]
+            elif future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation
+                self.release()
+            raise
+
+    def release(self):
+        while self.waiting:
+            user, queue = next(iter(self.waiting.items()))
+            future = queue.popleft()
+            if queue:
+                self.waiting.move_to_end(user)
+            else:
+                del self.waiting[user]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class Throttled(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"try again in {math.ceil(retry_after)} s")
+        self.retry_after = retry_after
+
+
+class CommandThrottle:
+    """Per-user, per-command token buckets plus a fair concurrency limit for
+    expensive commands.
+
+    `limits` maps a command to (calls, per_seconds); commands missing from it
+    use `default`. Commands in `expensive` also go through the FairLimiter
+    and are rejected when the user already has `max_queued` of them waiting.
+    """
+
+    def __init__(
+        self,
+        limits=None,
+        default=(5, 60.0),
+        expensive=(),
+        concurrency=1,
+        max_queued=1,
+        idle=3600.0,
+    ):
+        self.limits = limits or {}
+        self.default = default
+        self.expensive = set(expensive)
+        self.limiter = FairLimiter(concurrency)
+        self.max_queued = max_queued
+        self.idle = idle
+        self.buckets = {}
+        self.allowed = Counter()
+        self.rejected = Counter()
+        self.max_wait = 0.0
+        self._last_sweep = time.monotonic()
+
+    def _sweep(self, now):
+        if now - self._last_sweep < self.idle:
+            return
+        self._last_sweep = now
+        for key in [k for k, b in self.buckets.items() if now - b.stamp > self.idle]:
+            del self.buckets[key]
+
+    # Raises Throttled if the user has no token left for this command
+    def check(self, user, command):
+        now = time.monotonic()
+        self._sweep(now)
+        bucket = self.buckets.get((user, command))
+        if bucket is None:
+            calls, per = self.limits.get(command, self.default)
+            bucket = TokenBucket(calls / per, calls, now)
+            self.buckets[(user, command)] = bucket
+        wait = bucket.take(now)
+        if wait:
+            self.rejected[command] += 1
+            raise Throttled(wait)
+        if command in self.expensive and self.limiter.queued(user) >= self.max_queued:
+            self.rejected[command] += 1
+            raise Throttled(5)
+        self.allowed[command] += 1
+
+    async def run(self, user, command, job):
+        self.check(user, command)
+        if command not in self.expensive:
+            return await job()
+
+        start = time.monotonic()
+        await self.limiter.acquire(user)
+        waited = time.monotonic() - start
+        self.max_wait = max(self.max_wait, waited)
+        try:
+            return await job()
+        finally:
+            self.limiter.release()
+
+    def metrics(self):
+        return {
+            "allowed": dict(self.allowed),
+            "rejected": dict(self.rejected),
+            "running": self.limiter.active,
+            "queued": self.limiter.queued(),
+            "max_wait": round(self.max_wait, 1),
+            "users": len({user for user, _ in self.buckets}),
+        }
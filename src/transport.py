@@ -0,0 +1,147 @@
+import importlib.util
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+import httpx
+
+import schemas
+
+# h2 comes with httpx[http2]; an environment installed without the extra
+# falls back to HTTP/1.1 rather than failing to start
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+logger = logging.getLogger("BotLogger")
+
+RETRY_STATUSES = (500, 502, 504)
+
+
+class SourceStats:
+    __slots__ = (
+        "requests",
+        "not_modified",
+        "wire_bytes",
+        "body_bytes",
+        "saved_bytes",
+        "full_ms",
+        "saved_ms",
+        "http_version",
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.not_modified = 0
+        self.wire_bytes = 0
+        self.body_bytes = 0
+        self.saved_bytes = 0
+        # Moving average of a full fetch and decode, what a 304 saves
+        self.full_ms = 0.0
+        self.saved_ms = 0.0
+        self.http_version = ""
+
+
+class _Cached:
+    __slots__ = ("etag", "last_modified", "data", "wire_bytes")
+
+    def __init__(self, etag, last_modified, data, wire_bytes):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.data = data
+        self.wire_bytes = wire_bytes
+
+
+class Transport:
+    """Fetches the polled JSON APIs over one pooled httpx client, so
+    connections are kept alive between polls.
+
+    HTTP/2 is used where the server offers it. Bodies come compressed: httpx
+    asks for gzip, deflate and brotli, and zstd when its decoder is installed. Every response's
+    ETag and Last-Modified are sent back on the next poll of the URL; a 304
+    returns the data decoded last time without downloading or parsing it
+    again. The returned data is shared between polls and must not be
+    modified.
+
+    `stats()` reports per host the polls, 304s, bytes on the wire and after
+    decompression, and the bytes and time the 304s saved.
+    """
+
+    def __init__(self, timeout=30.0, retries=3, backoff=1.0):
+        self.client = httpx.Client(
+            timeout=timeout,
+            transport=httpx.HTTPTransport(http2=HTTP2, retries=retries),
+        )
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = {}
+        self.sources = {}
+        self._lock = threading.Lock()
+
+    def _get(self, url, headers):
+        for attempt in range(self.retries + 1):
+            response = self.client.get(url, headers=headers)
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                return response
+            time.sleep(self.backoff * 2**attempt)
+
+    # The body of the URL through `decode`, JSON into plain objects by
+    # default. Raises httpx.HTTPError when the request fails and ValueError
+    # when the body isn't JSON
+    def fetch_json(self, url, decode=schemas.loads):
+        cached = self.cache.get(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        start = time.perf_counter()
+        response = self._get(url, headers)
+        if response.status_code == 304 and cached is not None:
+            self._account(url, response, start, cached)
+            return cached.data
+        response.raise_for_status()
+        data = decode(response.content)
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self.cache[url] = _Cached(
+                etag, last_modified, data, response.num_bytes_downloaded
+            )
+        else:
+            self.cache.pop(url, None)
+        self._account(url, response, start)
+        return data
+
+    def _account(self, url, response, start, cached=None):
+        ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            host = urlparse(url).netloc
+            stats = self.sources.get(host)
+            if stats is None:
+                stats = self.sources[host] = SourceStats()
+            stats.requests += 1
+            stats.wire_bytes += response.num_bytes_downloaded
+            stats.http_version = response.http_version
+            if cached is not None:
+                stats.not_modified += 1
+                stats.saved_bytes += cached.wire_bytes
+                stats.saved_ms += max(stats.full_ms - ms, 0.0)
+            else:
+                stats.body_bytes += len(response.content)
+                stats.full_ms = 0.8 * stats.full_ms + 0.2 * ms if stats.full_ms else ms
+
+    def stats(self):
+        with self._lock:
+            return {
+                host: {name: getattr(stats, name) for name in SourceStats.__slots__}
+                for host, stats in self.sources.items()
+            }
+
+    def close(self):
+        self.client.close()
+
+
+transport = Transport()
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+logger = logging.getLogger("BotLogger")
+
+
+class JobFailed(Exception):
+    pass
+
+
+class JobTimeout(JobFailed):
+    pass
+
+
+class JobMemoryExceeded(JobFailed):
+    pass
+
+
+def _serve(conn):
+    # Own process group, so killing the worker also kills what it started
+    # (Chrome and its helpers)
+    os.setsid()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            fn, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            result = (True, fn(*args))
+        except BaseException as e:
+            result = (False, f"{type(e).__name__}: {e}")
+        try:
+            conn.send(result)
+        except Exception as e:
+            conn.send((False, f"Could not send the result back: {e}"))
+
+
+_PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024 if hasattr(os, "sysconf") else 4
+
+
+# Resident memory of a process group in MB, from /proc; 0 where there is none
+def group_rss_mb(pgid):
+    total = 0
+    try:
+        pids = [pid for pid in os.listdir("/proc") if pid.isdigit()]
+    except OSError:
+        return 0.0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                fields = f.read().rpartition(b")")[2].split()
+        except OSError:
+            continue
+        # Fields after the command name: state is [0], pgrp [2], rss [21]
+        if len(fields) > 21 and int(fields[2]) == pgid:
+            total += int(fields[21])
+    return total * _PAGE_KB / 1024
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.jobs = 0
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def kill(self):
+        try:
+            if os.getpgid(self.pid) == self.pid:
+                os.killpg(self.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.close()
+
+    def close(self):
+        self.conn.close()
+        self.process.join(timeout=0.1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+
+
+class WorkerPool:
+    """Runs heavy jobs (Chrome rendering, bulk imports) in worker processes,
+    so a crash, a hang or a memory blow-up only costs the worker.
+
+    `run(fn, *args)` sends a module-level function and its arguments to an
+    idle worker and awaits the result without blocking the event loop. A job
+    is killed, with its whole process group, when it runs longer than
+    `timeout` seconds or the group's resident memory goes over `memory_mb`;
+    the worker is replaced on the next job. Workers are recycled after
+    `max_jobs` jobs. Results travel pickled, so jobs should return plain
+    tuples and lists rather than objects.
+
+    Workers are forked on first use: spawning would re-run bot.py's
+    module-level startup in every worker.
+    """
+
+    def __init__(self, processes=2, timeout=120.0, memory_mb=2048.0, max_jobs=20):
+        self.processes = processes
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.max_jobs = max_jobs
+        self._context = multiprocessing.get_context("fork")
+        self._idle = []
+        self._busy = set()
+        self._slots = None
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.memory_kills = 0
+        self.recycled = 0
+
+    async def run(self, fn, *args, timeout=None, memory_mb=None):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.processes)
+        async with self._slots:
+            worker = self._idle.pop() if self._idle else _Worker(self._context)
+            self._busy.add(worker)
+            try:
+                ok, value = await self._call(
+                    worker,
+                    fn,
+                    args,
+                    self.timeout if timeout is None else timeout,
+                    self.memory_mb if memory_mb is None else memory_mb,
+                )
+            except BaseException as e:
+                self._busy.discard(worker)
+                worker.kill()
+                if isinstance(e, JobFailed):
+                    self.failed += 1
+                raise
+            self._busy.discard(worker)
+
+            worker.jobs += 1
+            if worker.jobs >= self.max_jobs:
+                worker.close()
+                self.recycled += 1
+            else:
+                self._idle.append(worker)
+        if not ok:
+            self.failed += 1
+            raise JobFailed(value)
+        self.completed += 1
+        return value
+
+    async def _call(self, worker, fn, args, timeout, memory_mb):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        fd = worker.conn.fileno()
+        loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+        started = time.monotonic()
+        try:
+            worker.conn.send((fn, args))
+            while not ready.done():
+                await asyncio.wait([ready], timeout=1.0)
+                if ready.done() or not worker.process.is_alive():
+                    break
+                elapsed = time.monotonic() - started
+                if elapsed > timeout:
+                    self.timeouts += 1
+                    raise JobTimeout(f"{fn.__name__} timed out after {elapsed:.0f} s")
+                rss = group_rss_mb(worker.pid)
+                if memory_mb and rss > memory_mb:
+                    self.memory_kills += 1
+                    raise JobMemoryExceeded(
+                        f"{fn.__name__} used {rss:.0f} MB, over {memory_mb:.0f} MB"
+                    )
+        finally:
+            loop.remove_reader(fd)
+        try:
+            return worker.conn.recv()
+        except (EOFError, OSError):
+            worker.process.join(timeout=1)
+            raise JobFailed(
+                f"{fn.__name__}: worker exited with code {worker.process.exitcode}"
+            )
+
+    def stats(self):
+        return {
+            "workers": len(self._idle) + len(self._busy),
+            "busy": len(self._busy),
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "memory_kills": self.memory_kills,
+            "recycled": self.recycled,
+        }
+
+    def close(self):
+        for worker in self._idle + list(self._busy):
+            worker.kill()
+        self._idle.clear()
+        self._busy.clear()
+
+
+pool = WorkerPool(
+    processes=int(os.getenv("WORKER_PROCESSES", "2")),
+    timeout=float(os.getenv("WORKER_TIMEOUT", "120")),
+    memory_mb=float(os.getenv("WORKER_MEMORY_MB", "2048")),
+    max_jobs=int(os.getenv("WORKER_MAX_JOBS", "20")),
+)
@@ -0,0 +1,17 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+
+# bot reads its configuration when imported
+for key, value in {
+    "TOKEN": "0:test",
+    "BOT_USERNAME": "test_bot",
+    "CHAT_ID": "-1000000000000",
+    "TOPIC_ID": "1",
+}.items():
+    os.environ.setdefault(key, value)
+os.environ["STARTUP_DELAY"] = "0"
+os.environ["OUTBOX_PATH"] = ":memory:"
+os.environ["REF_DB"] = ":memory:"
+os.environ["BOARD_STATE"] = os.devnull
@@ -0,0 +1,35 @@
+import numpy as np
+
+import bands
+
+
+def test_units_are_guessed_from_the_magnitude():
+    assert bands.to_khz("14062") == 14062.0
+    assert bands.to_khz("14.062") == 14062.0
+    assert bands.to_khz(7.032) == 7032.0
+    assert bands.to_khz("") is None
+    assert bands.to_khz("-1") is None
+
+
+def test_band_edges():
+    assert bands.band_of("14000") == "20m"
+    assert bands.band_of("14350") == "20m"
+    assert bands.band_of("14351") is None
+    assert bands.band_of("10.120") == "30m"
+    assert bands.band_of("145.500") == "2m"
+    assert bands.band_of("12000") is None
+
+
+def test_vectorised_bands_match_band_of():
+    khz = [1800, 3573, 7032, 10136, 14285, 14400, 21074, 50313, 432100, np.nan]
+    assert list(bands.classify_bands(khz)) == [bands.band_of(k) for k in khz[:-1]] + [
+        None
+    ]
+
+
+def test_mode_families():
+    assert bands.mode_family("usb") == "PHONE"
+    assert bands.mode_family("FT8") == "DATA"
+    assert bands.mode_family("CW") == "CW"
+    assert bands.mode_family("HELL") == "HELL"
+    assert bands.mode_family(" ") is None
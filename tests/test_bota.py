@@ -0,0 +1,86 @@
+import asyncio
+import os
+
+from aiohttp import web
+
+import data_centralisation as dc
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../bench/fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parses_the_forthcoming_table():
+    page = fixture("bota_announcements.html")
+    table = page[page.find("Forthcoming") : page.find("</table>")]
+    spots = dc.parseBOTA(page)
+    assert len(spots) == table.count("<tr>") - 1
+    first = spots[0]
+    assert (first.source, first.activator, first.ref_name, first.timestamp) == (
+        "BOTA",
+        "EA1CRD",
+        "B/YO-2472 Sandy Bay & Dunes",
+        "2026-06-28 01:00",
+    )
+
+
+def test_js_shell_needs_rendering():
+    assert dc.parseBOTA(fixture("bota_js_shell.html")) is None
+
+
+def test_empty_table_has_no_spots():
+    assert dc.parseBOTA(fixture("bota_empty_table.html")) == []
+
+
+# Runs fetchBOTA against a local server answering with `page` (or `status`),
+# with rendering replaced by a stub that records the call
+def fetch(monkeypatch, page=None, status=200):
+    rendered = []
+
+    async def render(url):
+        rendered.append(url)
+        return (1, [])
+
+    monkeypatch.setattr(dc, "renderBOTA", render)
+    monkeypatch.setattr(dc, "_bota_page", {"hash": None, "spots": []})
+
+    async def run():
+        async def handler(request):
+            return web.Response(
+                text=page or "", status=status, content_type="text/html"
+            )
+
+        app = web.Application()
+        app.router.add_get("/", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            url = f"http://127.0.0.1:{port}/"
+            return await dc.fetchBOTA(url), await dc.fetchBOTA(url)
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run()), rendered
+
+
+def test_empty_table_is_a_successful_poll(monkeypatch):
+    (first, cached), rendered = fetch(monkeypatch, fixture("bota_empty_table.html"))
+    assert first == cached == (1, [])
+    assert rendered == []
+
+
+def test_js_shell_is_rendered(monkeypatch):
+    _, rendered = fetch(monkeypatch, fixture("bota_js_shell.html"))
+    assert len(rendered) == 2
+
+
+def test_failed_fetch_is_not_rendered(monkeypatch):
+    (first, _), rendered = fetch(monkeypatch, status=503)
+    assert first == (0, [])
+    assert rendered == []
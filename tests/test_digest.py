@@ -0,0 +1,37 @@
+import digest
+from spot import Spot, classify
+
+
+def spot(activator, reference, frequency):
+    return classify([Spot("POTA", activator, reference, frequency, "CW")])[0]
+
+
+def test_parse_chats():
+    chats = digest.parse_chats("-100123/45:30=yo3bee,YO8X,20m -100999 x:5", 600.0)
+    assert set(chats) == {(-100123, 45), (-100999, None)}
+    schedule = chats[(-100123, 45)]
+    assert schedule.interval == 1800.0
+    assert schedule.watch.calls == ("YO3BEE", "YO8X")
+    assert schedule.bands == {"20m"}
+    assert chats[(-100999, None)].interval == 600.0
+    assert not chats[(-100999, None)].watch
+    assert not chats[(-100999, None)].bands
+
+
+def test_each_chat_keeps_its_own_spots():
+    sent = []
+    chats = digest.parse_chats("1=YO3BEE 2=40m 3", 60.0)
+    d = digest.Digest(chats, lambda groups, *_: groups, lambda *args: sent.append(args))
+    d.add(
+        [
+            spot("YO3BEE/P", "RO-0001", "14062"),
+            spot("YO8X", "RO-0002", "7032"),
+        ]
+    )
+    counts = {chat[0]: len(buffer.entries) for chat, buffer in d.buffers.items()}
+    assert counts == {1: 1, 2: 1, 3: 2}
+
+    d.flush((1, None), now=0)
+    ((key, chat_id, thread_id, groups),) = sent
+    assert (chat_id, thread_id) == (1, None)
+    assert [entry.spot.activator for group in groups for entry in group] == ["YO3BEE/P"]
@@ -0,0 +1,30 @@
+import math
+
+import numpy as np
+import pytest
+
+import maidenhead as mh
+
+
+def test_locator_centres():
+    assert mh.to_latlon("JN") == (45.0, 10.0)
+    lat, lon = mh.to_latlon("KN34")
+    assert (lat, lon) == (44.5, 27.0)
+    lat, lon = mh.to_latlon("kn34aa")
+    assert math.isclose(lat, 44.0 + 1.25 / 60) and math.isclose(lon, 26.0 + 2.5 / 60)
+
+
+def test_invalid_locators():
+    for grid in ("", "K", "KN3", "ZZ12", "KNAA", None, 42):
+        assert mh.to_latlon(grid) is None
+    assert not mh.is_grid("KN3")
+
+
+def test_distances():
+    distance = mh.distances_km("KN34", ["KN34", "KN35", "", "JN58"])
+    assert distance[0] == 0.0
+    assert 100 < distance[1] < 120
+    assert np.isnan(distance[2])
+    assert 1200 < distance[3] < 1300
+    with pytest.raises(ValueError):
+        mh.distances_km("XX", ["KN34"])
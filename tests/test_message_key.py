@@ -0,0 +1,68 @@
+import bot
+import schemas
+import spot as spotlib
+import status
+from outbox import Journal, Outbox
+
+HOUR = 3600.0
+
+
+def pota(reference, spot_time, frequency="14062", comment="QRV", activator="YO3BEE"):
+    spot = schemas.POTA.spot(
+        {
+            "activator": activator,
+            "reference": reference,
+            "frequency": frequency,
+            "mode": "CW",
+            "comments": comment,
+            "grid4": "KN34",
+            "spotTime": spot_time,
+        }
+    )
+    return spotlib.classify([spot])[0]
+
+
+# Queues each (spot, time) announcement, returns which ones were new
+def queue(announcements):
+    outbox = Outbox(Journal(":memory:"), send=None)
+    return [
+        outbox.put(bot.message_key([spot], now), bot.CHAT_ID, bot.TOPIC_ID, "text")
+        for spot, now in announcements
+    ]
+
+
+def test_return_to_park_is_announced_again():
+    rove = [
+        (pota("RO-0001", "2026-10-19T10:00:00"), 10 * HOUR),
+        (pota("RO-0002", "2026-10-19T11:00:00"), 11 * HOUR),
+        (pota("RO-0001", "2026-10-19T15:00:00"), 15 * HOUR),
+    ]
+    assert queue(rove) == [True, True, True]
+
+
+def test_same_park_next_day_is_announced_again():
+    days = [
+        (pota("RO-0001", "2026-10-19T10:00:00"), 10 * HOUR),
+        (pota("RO-0001", "2026-10-20T10:00:00"), 34 * HOUR),
+    ]
+    assert queue(days) == [True, True]
+
+
+def test_activation_detected_again_after_restart_is_skipped():
+    # Newer spot time, another comment and a portable call: still the same
+    # activation when the restarted bot sees it
+    before = pota("RO-0001", "2026-10-19T10:00:00")
+    after = pota(
+        "RO-0001", "2026-10-19T10:40:00", "14062.5", "tnx QSO", activator="YO3BEE/P"
+    )
+    assert queue([(before, 10 * HOUR), (after, 10.7 * HOUR)]) == [True, False]
+
+
+def test_updates_are_new_messages():
+    new = pota("RO-0001", "2026-10-19T10:00:00")
+    qsy = pota("RO-0001", "2026-10-19T10:10:00", "7032")
+    qsy.event = status.MOVED
+    qrt = pota("RO-0001", "2026-10-19T10:20:00", "7032", "QRT")
+    qrt.event = status.OFF_AIR
+    updates = [(new, 10 * HOUR), (qsy, 10.2 * HOUR), (qrt, 10.3 * HOUR)]
+    assert queue(updates) == [True, True, True]
@@ -0,0 +1,127 @@
+import asyncio
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TimedOut
+
+import bot
+import schemas
+from outbox import Journal, Outbox
+
+
+# Runs the outbox until every queued message is sent or dead
+def deliver(outbox):
+    async def run():
+        task = asyncio.create_task(outbox.run())
+        # run() queues what the journal still holds first
+        await asyncio.sleep(0)
+        while outbox.lanes:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    return outbox.journal.counts()
+
+
+def test_lanes_keep_their_order():
+    sent = []
+
+    async def send(chat_id, thread_id, text, parse_mode):
+        sent.append((chat_id, text))
+
+    outbox = Outbox(Journal(":memory:"), send, workers=3, interval=0)
+    for i in range(5):
+        for chat in (1, 2, 3):
+            outbox.put(f"{chat}-{i}", chat, None, str(i))
+    assert deliver(outbox) == {"sent": 15}
+    for chat in (1, 2, 3):
+        assert [text for c, text in sent if c == chat] == ["0", "1", "2", "3", "4"]
+
+
+def test_retry_after_is_retried_in_place():
+    failures = [RetryAfter(0)]
+    sent = []
+
+    async def send(chat_id, thread_id, text, parse_mode):
+        if text == "a" and failures:
+            raise failures.pop()
+        sent.append(text)
+
+    outbox = Outbox(Journal(":memory:"), send, interval=0, retryable=bot.retryable)
+    outbox.put("a", 1, None, "a")
+    outbox.put("b", 1, None, "b")
+    assert deliver(outbox) == {"sent": 2}
+    assert sent == ["a", "b"]
+    assert outbox.dead == 0
+
+
+def test_permanent_errors_are_dead_on_the_first_failure():
+    calls = []
+
+    async def send(chat_id, thread_id, text, parse_mode):
+        calls.append(text)
+        if text == "bad":
+            raise BadRequest("Can't parse entities")
+
+    outbox = Outbox(Journal(":memory:"), send, interval=0, retryable=bot.retryable)
+    outbox.put("bad", 1, None, "bad")
+    outbox.put("next", 1, None, "next")
+    assert deliver(outbox) == {"dead": 1, "sent": 1}
+    assert calls == ["bad", "next"]
+
+
+def test_only_network_errors_and_flood_limits_are_retryable():
+    assert bot.retryable(TimedOut())
+    assert bot.retryable(RetryAfter(5))
+    assert not bot.retryable(BadRequest("Can't parse entities"))
+    assert not bot.retryable(Forbidden("bot was kicked from the group chat"))
+    assert not bot.retryable(ValueError())
+
+
+def test_upstream_text_is_escaped():
+    spot = schemas.POTA.spot(
+        {
+            "activator": "YO3BEE",
+            "reference": "RO-0001",
+            "frequency": "14062",
+            "mode": "CW",
+            "comments": "<3 tnx & 73",
+            "grid4": "KN34",
+        }
+    )
+    assert "&lt;3 tnx &amp; 73" in bot.format_spot(spot)
+
+
+def test_gives_up_after_max_attempts():
+    async def send(chat_id, thread_id, text, parse_mode):
+        raise RetryAfter(0)
+
+    outbox = Outbox(
+        Journal(":memory:"), send, interval=0, max_attempts=3, retryable=bot.retryable
+    )
+    outbox.put("a", 1, None, "a")
+    assert deliver(outbox) == {"dead": 1}
+    assert outbox.journal.db.execute("SELECT attempts FROM outbox").fetchone() == (3,)
+
+
+def test_pending_messages_are_sent_after_a_restart():
+    journal = Journal(":memory:")
+    Outbox(journal, send=None).put("a", 1, None, "a")
+    sent = []
+
+    async def send(chat_id, thread_id, text, parse_mode):
+        sent.append(text)
+
+    restarted = Outbox(journal, send, interval=0)
+    assert not restarted.put("a", 1, None, "a")
+    assert deliver(restarted) == {"sent": 1}
+    assert sent == ["a"]
+
+
+def test_compaction_forgets_old_keys():
+    journal = Journal(":memory:")
+    row = journal.append("a", 1, None, "a")
+    journal.mark(row, "sent")
+    assert journal.compact(retention=3600) == 0
+    journal.db.execute("UPDATE outbox SET done = done - 7200")
+    assert journal.compact(retention=3600) == 1
+    assert journal.append("a", 1, None, "a") is not None
@@ -0,0 +1,27 @@
+import sqlite3
+
+import refs
+from spot import Spot
+
+
+def wwbota(reference):
+    return Spot("WWBOTA", "YO3BEE", reference, "14285", "SSB")
+
+
+def test_learn_queues_while_an_import_holds_the_lock(tmp_path):
+    path = str(tmp_path / "refs.db")
+    store = refs.ReferenceStore(path)
+    importer = sqlite3.connect(path, isolation_level=None)
+    importer.execute("BEGIN IMMEDIATE")
+
+    assert store.learn([wwbota("B/YO-0001")]) == 0
+    assert store.lookup("B/YO-0001") == []
+    assert ("WWBOTA", "B/YO-0001") not in store.known
+
+    importer.execute("COMMIT")
+    assert store.learn([wwbota("B/YO-0002")]) == 2
+    assert [ref.reference for ref in store.search("B/YO")] == [
+        "B/YO-0001",
+        "B/YO-0002",
+    ]
+    assert store.learn([wwbota("B/YO-0001")]) == 0
@@ -0,0 +1,76 @@
+import msgspec
+import pytest
+
+import schemas
+
+
+def pota(**fields):
+    item = {
+        "spotId": 1,
+        "activator": "YO3BEE",
+        "reference": "RO-0001",
+        "frequency": "14062",
+        "mode": "CW",
+        "comments": "QRV",
+        "grid4": "KN34",
+        "grid6": "KN34aa",
+        "spotTime": "2026-10-19T10:00:00",
+    }
+    item.update(fields)
+    return item
+
+
+def test_poll_is_decoded_into_structs():
+    data = schemas.POTA.decode(msgspec.json.encode([pota(), pota(activator="YO8X")]))
+    assert all(item.__class__ is schemas.POTASpot for item in data)
+    spots = schemas.POTA.spots(data)
+    assert [(s.activator, s.reference, s.comment, s.grid) for s in spots] == [
+        ("YO3BEE", "RO-0001", "QRV", "KN34"),
+        ("YO8X", "RO-0001", "QRV", "KN34"),
+    ]
+
+
+def test_malformed_items_are_dropped_alone():
+    before = schemas.POTA.rejected
+    body = msgspec.json.encode(
+        [pota(), pota(comments={"text": "QRV"}), pota(activator=None), "spot"]
+    )
+    spots = schemas.POTA.spots(schemas.POTA.decode(body))
+    assert [s.activator for s in spots] == ["YO3BEE"]
+    assert schemas.POTA.rejected - before == 3
+
+
+def test_error_payload_is_rejected():
+    data = schemas.POTA.decode(b'{"error": "rate limited"}')
+    assert schemas.POTA.spots(data) is None
+
+
+def test_invalid_json_raises_value_error():
+    with pytest.raises(ValueError):
+        schemas.POTA.decode(b"<html>")
+
+
+def test_recorded_poll_builds_the_same_spots():
+    data = schemas.POTA.decode(msgspec.json.encode([pota()]))
+    recorded = msgspec.json.decode(msgspec.json.encode(msgspec.to_builtins(data)))
+    assert [s.key() for s in schemas.POTA.spots(recorded)] == [
+        s.key() for s in schemas.POTA.spots(data)
+    ]
+
+
+def test_derived_fields():
+    wwbota = schemas.WWBOTA.spot(
+        {"call": "YO3BEE", "references": [{"reference": "B/YO-0001"}], "freq": 14.285}
+    )
+    assert (wwbota.reference, wwbota.frequency) == ("B/YO-0001", "14.285")
+    llota = schemas.LLOTA.spot(
+        {
+            "callsign": "YO3BEE",
+            "reference": "L-1",
+            "history": [
+                {"comment": "QRV", "timestamp": "2026-10-19 10:00"},
+                {"comment": "QRT", "timestamp": "2026-10-19 11:00"},
+            ],
+        }
+    )
+    assert (llota.comment, llota.timestamp) == ("QRT", "2026-10-19 11:00")
@@ -0,0 +1,29 @@
+from search import TrigramIndex, normalize, trigrams
+
+
+def test_normalize_folds_case_and_diacritics():
+    assert normalize("Brașov-Ţară") == "BRASOV TARA"
+    assert normalize("yo3bee/p") == "YO3BEE/P"
+
+
+def test_trigrams_mark_word_edges():
+    assert trigrams("YO3") == {"  Y", " YO", "YO3", "O3 "}
+
+
+def test_query_tolerates_typos_and_ranks_by_best_field():
+    calls = ["YO3BEE", "YO8X", "YO9Z"]
+    names = ["Ion Popescu", "Maria Ionescu", "Brasov club"]
+    index = TrigramIndex([calls, names])
+    assert index.query("YO3BE")[0][0] == 0
+    assert index.query("ionescu")[0][0] == 1
+    assert index.query("brașov")[0][0] == 2
+    assert index.query("zzzz") == []
+
+
+def test_query_limits_the_results():
+    calls = [f"YO{i}ABC" for i in range(10)]
+    index = TrigramIndex([calls])
+    results = index.query("ABC", n=3, min_score=0.1)
+    assert len(results) == 3
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
@@ -0,0 +1,54 @@
+import pytest
+
+from stats import SpotStats
+
+T0 = 1_800_000_000.0
+
+
+def test_activation_is_counted_once():
+    stats = SpotStats()
+    for i in range(3):
+        stats.observe("POTA", "YO3BEE", "RO-0001", "20m", "CW", now=T0 + i * 60)
+    stats.observe("POTA", "YO3BEE", "RO-0002", "20m", "CW", now=T0 + 300)
+    assert stats.top("activators", "1h", now=T0 + 300) == [("YO3BEE", 2)]
+    assert dict(stats.top("references", "1h", now=T0 + 300)) == {
+        "RO-0001": 1,
+        "RO-0002": 1,
+    }
+
+
+def test_band_and_mode_changes_are_counted():
+    stats = SpotStats()
+    stats.observe("POTA", "YO3BEE", "RO-0001", "20m", "cw", now=T0)
+    stats.observe("POTA", "YO3BEE", "RO-0001", "40m", "CW", now=T0 + 60)
+    stats.observe("POTA", "YO3BEE", "RO-0001", "40m", "SSB", now=T0 + 120)
+    assert dict(stats.top("bands", "1h", now=T0 + 120)) == {"20m": 1, "40m": 1}
+    assert dict(stats.top("modes", "1h", now=T0 + 120)) == {"CW": 1, "SSB": 1}
+    assert stats.top("bands", "now", now=T0 + 120) == [("40m", 1)]
+
+
+def test_windows_expire():
+    stats = SpotStats()
+    stats.observe("POTA", "YO3BEE", "RO-0001", "20m", "CW", now=T0)
+    stats.observe("SOTA", "YO8X", "YO/BV-001", "40m", "CW", now=T0 + 1800)
+    later = T0 + 3600 + 120
+    assert stats.top("activators", "1h", now=later) == [("YO8X", 1)]
+    assert dict(stats.top("activators", "24h", now=later)) == {"YO3BEE": 1, "YO8X": 1}
+
+
+def test_live_view_drops_stale_activators():
+    stats = SpotStats(live_ttl=1800)
+    stats.observe("POTA", "YO3BEE", "RO-0001", "20m", "CW", now=T0)
+    stats.observe("POTA", "YO8X", "RO-0002", "20m", "CW", now=T0 + 1500)
+    assert stats.top("bands", "now", now=T0 + 1600) == [("20m", 2)]
+    assert stats.top("bands", "now", now=T0 + 2000) == [("20m", 1)]
+
+
+def test_unknown_window_or_statistic():
+    stats = SpotStats()
+    with pytest.raises(ValueError):
+        stats.top("activators", "1y")
+    with pytest.raises(ValueError):
+        stats.top("activators", "now")
+    with pytest.raises(ValueError):
+        stats.top("grids", "1h")
@@ -0,0 +1,76 @@
+import math
+
+import status
+from spot import Spot, classify
+
+
+def spot(reference="RO-0001", frequency="14062", comment=""):
+    return classify([Spot("POTA", "YO3BEE", reference, frequency, "CW", comment)])[0]
+
+
+# Feeds the spots through step, returns the events
+def events(*spots, min_qsy_khz=1):
+    entry, out = None, []
+    for s in spots:
+        entry, event = status.step(entry, s, min_qsy_khz)
+        out.append(event)
+    return out
+
+
+def test_first_spot_is_new():
+    assert events(spot()) == [status.NEW]
+
+
+def test_repeated_spot_is_silent():
+    assert events(spot(), spot(), spot(comment="tnx")) == [status.NEW, None, None]
+
+
+def test_new_reference():
+    assert events(spot(), spot("RO-0002")) == [status.NEW, status.REFERENCE]
+
+
+def test_frequency_change_is_a_qsy():
+    assert events(spot(), spot(frequency="7032")) == [status.NEW, status.MOVED]
+    # Below the threshold it isn't
+    assert events(spot(), spot(frequency="14063"), min_qsy_khz=5) == [
+        status.NEW,
+        None,
+    ]
+
+
+def test_qrt_after_qsy_and_back_on_air():
+    assert events(
+        spot(comment="QRV"),
+        spot(frequency="7032"),
+        spot(frequency="7032", comment="QRT"),
+        spot(frequency="7032", comment="QRT"),
+        spot(frequency="7032", comment="QRV"),
+    ) == [status.NEW, status.MOVED, status.OFF_AIR, None, status.ON_AIR]
+
+
+def test_qrt_with_a_qsy_stays_off_air():
+    entry = ("RO-0001", 14062.0, status.ON_AIR)
+    entry, event = status.step(entry, spot(frequency="7032", comment="QRT"), 1)
+    assert event == status.OFF_AIR
+    assert entry[2] == status.OFF_AIR
+
+
+def test_qrv_after_qsy_is_recorded_silently():
+    entry = ("RO-0001", 7032.0, status.MOVED)
+    new, event = status.step(entry, spot(frequency="7032", comment="QRV"), 1)
+    assert event is None
+    assert new[2] == status.ON_AIR
+
+
+def test_qcodes_are_whole_tokens():
+    assert status.qcodes("qrt.") == status.QRT
+    assert status.qcodes("QRV/QSY 7032") == status.QRV | status.QSY
+    assert status.qcodes("SQRT QRTX") == 0
+    assert status.state_of(status.QRV | status.QRT) == status.OFF_AIR
+    assert status.state_of(0) is None
+
+
+def test_unknown_frequency_never_moves():
+    entry, event = status.step(None, spot(frequency=""), 1)
+    assert math.isnan(entry[1])
+    assert status.step(entry, spot(frequency=""), 1)[1] is None
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from throttle import CommandThrottle, FairLimiter, Throttled
+
+
+def test_waiting_users_are_served_round_robin():
+    order = []
+
+    async def run():
+        limiter = FairLimiter(1)
+
+        async def job(user, name):
+            await limiter.acquire(user)
+            order.append(name)
+            await asyncio.sleep(0)
+            limiter.release()
+
+        await asyncio.gather(
+            job("a", "a1"), job("a", "a2"), job("a", "a3"), job("b", "b1")
+        )
+        assert limiter.active == 0 and limiter.queued() == 0
+
+    asyncio.run(run())
+    assert order == ["a1", "a2", "b1", "a3"]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        limiter = FairLimiter(1)
+        await limiter.acquire("a")
+        waiter = asyncio.create_task(limiter.acquire("b"))
+        await asyncio.sleep(0)
+        assert limiter.queued("b") == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert limiter.queued() == 0
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(run())
+
+
+def test_expensive_commands_queue_once_per_user():
+    async def run():
+        throttle = CommandThrottle(
+            default=(10, 60.0), expensive=("get_BOTA",), max_queued=1
+        )
+        gate = asyncio.Event()
+
+        async def slow():
+            await gate.wait()
+
+        running = asyncio.create_task(throttle.run("a", "get_BOTA", slow))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(throttle.run("a", "get_BOTA", slow))
+        await asyncio.sleep(0)
+        with pytest.raises(Throttled):
+            await throttle.run("a", "get_BOTA", slow)
+        # Another user still gets a place in the queue
+        other = asyncio.create_task(throttle.run("b", "get_BOTA", slow))
+        await asyncio.sleep(0)
+        assert throttle.metrics()["queued"] == 2
+        gate.set()
+        await asyncio.gather(running, queued, other)
+        assert throttle.metrics()["rejected"] == {"get_BOTA": 1}
+
+    asyncio.run(run())
+
+
+def test_commands_over_their_rate_are_rejected():
+    throttle = CommandThrottle(limits={"get_POTA": (2, 60.0)})
+    throttle.check("a", "get_POTA")
+    throttle.check("a", "get_POTA")
+    with pytest.raises(Throttled):
+        throttle.check("a", "get_POTA")
+    throttle.check("b", "get_POTA")